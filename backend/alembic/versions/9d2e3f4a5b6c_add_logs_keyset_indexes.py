@@ -0,0 +1,33 @@
+"""add composite indexes for logs keyset pagination
+
+Revision ID: 9d2e3f4a5b6c
+Revises: 8c1d2e3f4a5b
+Create Date: 2026-10-17 11:03:48.517240
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9d2e3f4a5b6c'
+down_revision: Union[str, None] = '8c1d2e3f4a5b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Таблица logs большая: строим индексы без блокировки записи
+    with op.get_context().autocommit_block():
+        op.create_index('ix_logs_created_at_id', 'logs', ['created_at', 'id'], unique=False, postgresql_concurrently=True, if_not_exists=True)
+        op.create_index('ix_logs_device_id_created_at_id', 'logs', ['device_id', 'created_at', 'id'], unique=False, postgresql_concurrently=True, if_not_exists=True)
+        op.create_index('ix_logs_level_created_at_id', 'logs', ['level', 'created_at', 'id'], unique=False, postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_logs_level_created_at_id', table_name='logs', postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_logs_device_id_created_at_id', table_name='logs', postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_logs_created_at_id', table_name='logs', postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,36 @@
+"""add alert SMS coalescing windows and outbox suppression columns
+
+Revision ID: a9e0f1b2c3d4
+Revises: f8d9e0a1b2c3
+Create Date: 2026-10-17 15:52:19.661407
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a9e0f1b2c3d4'
+down_revision: Union[str, None] = 'f8d9e0a1b2c3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('devices', sa.Column('sms_coalesce_window', sa.Integer(), nullable=True))
+    op.add_column('platforms', sa.Column('sms_coalesce_window', sa.Integer(), nullable=True))
+    op.add_column('sms_outbox', sa.Column('coalesced_into_id', sa.Integer(), nullable=True))
+    op.add_column('sms_outbox', sa.Column('suppressed_reason', sa.String(length=50), nullable=True))
+    op.create_foreign_key('sms_outbox_coalesced_into_id_fkey', 'sms_outbox', 'sms_outbox', ['coalesced_into_id'], ['id'], ondelete='SET NULL')
+    op.create_index('ix_sms_outbox_coalesced_into_id', 'sms_outbox', ['coalesced_into_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_sms_outbox_coalesced_into_id', table_name='sms_outbox')
+    op.drop_constraint('sms_outbox_coalesced_into_id_fkey', 'sms_outbox', type_='foreignkey')
+    op.drop_column('sms_outbox', 'suppressed_reason')
+    op.drop_column('sms_outbox', 'coalesced_into_id')
+    op.drop_column('platforms', 'sms_coalesce_window')
+    op.drop_column('devices', 'sms_coalesce_window')
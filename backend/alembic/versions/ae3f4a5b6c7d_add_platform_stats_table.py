@@ -0,0 +1,59 @@
+"""add platform_stats counters table
+
+Revision ID: ae3f4a5b6c7d
+Revises: 9d2e3f4a5b6c
+Create Date: 2026-10-17 11:41:05.238719
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'ae3f4a5b6c7d'
+down_revision: Union[str, None] = '9d2e3f4a5b6c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('platform_stats',
+    sa.Column('platform_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('device_count', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('firing_alerts', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('resolved_alerts', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('latest_alert_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.PrimaryKeyConstraint('platform_id')
+    )
+    # Начальное заполнение счётчиков по текущим данным
+    op.execute("""
+        INSERT INTO platform_stats (platform_id, device_count, firing_alerts, resolved_alerts, latest_alert_at)
+        SELECT ids.platform_id,
+               COALESCE(dc.device_count, 0),
+               COALESCE(ac.firing_alerts, 0),
+               COALESCE(ac.resolved_alerts, 0),
+               ac.latest_alert_at
+        FROM (
+            SELECT DISTINCT COALESCE(platform_id, 0) AS platform_id FROM devices
+            UNION SELECT 0
+        ) ids
+        LEFT JOIN (
+            SELECT COALESCE(platform_id, 0) AS platform_id, COUNT(*) AS device_count
+            FROM devices GROUP BY COALESCE(platform_id, 0)
+        ) dc ON dc.platform_id = ids.platform_id
+        LEFT JOIN (
+            SELECT COALESCE(d.platform_id, 0) AS platform_id,
+                   COUNT(*) FILTER (WHERE lower(a.status) LIKE 'firing%') AS firing_alerts,
+                   COUNT(*) FILTER (WHERE lower(a.status) = 'resolved') AS resolved_alerts,
+                   MAX(a.created_at) AS latest_alert_at
+            FROM alerts a LEFT JOIN devices d ON d.id = a.device_id
+            GROUP BY COALESCE(d.platform_id, 0)
+        ) ac ON ac.platform_id = ids.platform_id
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table('platform_stats')
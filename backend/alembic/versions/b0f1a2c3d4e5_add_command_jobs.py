@@ -0,0 +1,49 @@
+"""add command_jobs table and sms_outbox.job_id
+
+Revision ID: b0f1a2c3d4e5
+Revises: a9e0f1b2c3d4
+Create Date: 2026-10-17 16:37:58.214530
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b0f1a2c3d4e5'
+down_revision: Union[str, None] = 'a9e0f1b2c3d4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('command_jobs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('template_id', sa.Integer(), nullable=True),
+    sa.Column('command', sa.String(), nullable=False),
+    sa.Column('params', sa.JSON(), nullable=True),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('platform_id', sa.Integer(), nullable=True),
+    sa.Column('total', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('queued', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('skipped', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.ForeignKeyConstraint(['template_id'], ['command_templates.id'], ondelete='SET NULL'),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='SET NULL'),
+    sa.ForeignKeyConstraint(['platform_id'], ['platforms.id'], ondelete='SET NULL'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_command_jobs_id'), 'command_jobs', ['id'], unique=False)
+    op.add_column('sms_outbox', sa.Column('job_id', sa.Integer(), nullable=True))
+    op.create_foreign_key('sms_outbox_job_id_fkey', 'sms_outbox', 'command_jobs', ['job_id'], ['id'], ondelete='SET NULL')
+    op.create_index('ix_sms_outbox_job_id_status', 'sms_outbox', ['job_id', 'status'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_sms_outbox_job_id_status', table_name='sms_outbox')
+    op.drop_constraint('sms_outbox_job_id_fkey', 'sms_outbox', type_='foreignkey')
+    op.drop_column('sms_outbox', 'job_id')
+    op.drop_index(op.f('ix_command_jobs_id'), table_name='command_jobs')
+    op.drop_table('command_jobs')
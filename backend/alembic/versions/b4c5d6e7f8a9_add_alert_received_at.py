@@ -0,0 +1,31 @@
+"""add alerts.received_at (server receive time for flap detection)
+
+Revision ID: b4c5d6e7f8a9
+Revises: e3c4d5e6f7a8
+Create Date: 2026-10-17 21:04:37.518203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b4c5d6e7f8a9'
+down_revision: Union[str, None] = 'e3c4d5e6f7a8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # У существующих алертов время получения неизвестно - остаётся NULL
+    # (в подсчёт флаппинга они не попадают); значение по умолчанию - только для новых строк
+    op.add_column('alerts', sa.Column('received_at', sa.DateTime(timezone=True), nullable=True))
+    op.alter_column('alerts', 'received_at', server_default=sa.text('now()'))
+    op.create_index('ix_alerts_device_id_alert_name_received_at', 'alerts', ['device_id', 'alert_name', 'received_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_alerts_device_id_alert_name_received_at', table_name='alerts')
+    op.drop_column('alerts', 'received_at')
@@ -0,0 +1,26 @@
+"""add users.token_version
+
+Revision ID: b4f5a6c7d8e9
+Revises: ae3f4a5b6c7d
+Create Date: 2026-10-17 12:20:44.918302
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b4f5a6c7d8e9'
+down_revision: Union[str, None] = 'ae3f4a5b6c7d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('users', sa.Column('token_version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('users', 'token_version')
@@ -0,0 +1,47 @@
+"""add notification_counters table and notifications indexes
+
+Revision ID: c1a2b3c4d5e6
+Revises: b0f1a2c3d4e5
+Create Date: 2026-10-17 17:52:41.603118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c1a2b3c4d5e6'
+down_revision: Union[str, None] = 'b0f1a2c3d4e5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('notification_counters',
+    sa.Column('user_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('total', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('unread', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+    # Начальное заполнение счётчиков по текущим уведомлениям
+    op.execute("""
+        INSERT INTO notification_counters (user_id, total, unread)
+        SELECT user_id, COUNT(*), COUNT(*) FILTER (WHERE read_status = false)
+        FROM notifications
+        GROUP BY user_id
+    """)
+    op.create_index('ix_notifications_user_created_at', 'notifications', ['user_id', 'created_at'], unique=False)
+    op.create_index(
+        'ix_notifications_user_unread', 'notifications', ['user_id'],
+        unique=False, postgresql_where=sa.text('read_status = false'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_notifications_user_unread', table_name='notifications')
+    op.drop_index('ix_notifications_user_created_at', table_name='notifications')
+    op.drop_table('notification_counters')
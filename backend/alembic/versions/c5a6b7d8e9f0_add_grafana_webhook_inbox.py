@@ -0,0 +1,48 @@
+"""add grafana_webhook_inbox table
+
+Revision ID: c5a6b7d8e9f0
+Revises: b4f5a6c7d8e9
+Create Date: 2026-10-17 13:02:17.550913
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5a6b7d8e9f0'
+down_revision: Union[str, None] = 'b4f5a6c7d8e9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('grafana_webhook_inbox',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('group_key', sa.String(), nullable=False),
+    sa.Column('payload_hash', sa.String(length=64), nullable=False),
+    sa.Column('payload', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+    sa.Column('status', sa.String(length=20), server_default='pending', nullable=False),
+    sa.Column('attempts', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('deliveries', sa.Integer(), server_default='1', nullable=False),
+    sa.Column('last_error', sa.String(), nullable=True),
+    sa.Column('result', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+    sa.Column('received_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('next_attempt_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('locked_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('processed_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_grafana_webhook_inbox_id'), 'grafana_webhook_inbox', ['id'], unique=False)
+    op.create_index('ix_grafana_webhook_inbox_status_next_attempt_at', 'grafana_webhook_inbox', ['status', 'next_attempt_at'], unique=False)
+    op.create_index('ix_grafana_webhook_inbox_group_key_status', 'grafana_webhook_inbox', ['group_key', 'status'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_grafana_webhook_inbox_group_key_status', table_name='grafana_webhook_inbox')
+    op.drop_index('ix_grafana_webhook_inbox_status_next_attempt_at', table_name='grafana_webhook_inbox')
+    op.drop_index(op.f('ix_grafana_webhook_inbox_id'), table_name='grafana_webhook_inbox')
+    op.drop_table('grafana_webhook_inbox')
@@ -0,0 +1,43 @@
+"""add audit_logs keyset and trigram search indexes
+
+Revision ID: d2b3c4d5e6f7
+Revises: c1a2b3c4d5e6
+Create Date: 2026-10-17 18:46:09.371254
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd2b3c4d5e6f7'
+down_revision: Union[str, None] = 'c1a2b3c4d5e6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Подстрочный поиск по action (ILIKE '%...%') через триграммный GIN-индекс
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    # Журнал аудита пишется постоянно: строим индексы без блокировки записи
+    with op.get_context().autocommit_block():
+        op.create_index('ix_audit_logs_timestamp_id', 'audit_logs', ['timestamp', 'id'], unique=False, postgresql_concurrently=True, if_not_exists=True)
+        op.create_index('ix_audit_logs_platform_id_timestamp_id', 'audit_logs', ['platform_id', 'timestamp', 'id'], unique=False, postgresql_concurrently=True, if_not_exists=True)
+        op.create_index('ix_audit_logs_device_id_timestamp_id', 'audit_logs', ['device_id', 'timestamp', 'id'], unique=False, postgresql_concurrently=True, if_not_exists=True)
+        op.create_index('ix_audit_logs_user_id_timestamp_id', 'audit_logs', ['user_id', 'timestamp', 'id'], unique=False, postgresql_concurrently=True, if_not_exists=True)
+        op.create_index(
+            'ix_audit_logs_action_trgm', 'audit_logs', ['action'],
+            unique=False, postgresql_using='gin', postgresql_ops={'action': 'gin_trgm_ops'},
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_audit_logs_action_trgm', table_name='audit_logs', postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_audit_logs_user_id_timestamp_id', table_name='audit_logs', postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_audit_logs_device_id_timestamp_id', table_name='audit_logs', postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_audit_logs_platform_id_timestamp_id', table_name='audit_logs', postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_audit_logs_timestamp_id', table_name='audit_logs', postgresql_concurrently=True, if_exists=True)
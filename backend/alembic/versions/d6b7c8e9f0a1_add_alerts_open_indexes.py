@@ -0,0 +1,36 @@
+"""add partial open-alert and status indexes on alerts
+
+Revision ID: d6b7c8e9f0a1
+Revises: c5a6b7d8e9f0
+Create Date: 2026-10-17 13:48:52.107364
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd6b7c8e9f0a1'
+down_revision: Union[str, None] = 'c5a6b7d8e9f0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Строим индексы без блокировки записи: вебхуки Grafana пишут в alerts постоянно
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_alerts_open_key', 'alerts',
+            ['alert_name', 'device_id', 'grafana_player_id', 'created_at'],
+            unique=False, postgresql_where=sa.text("status = 'firing'"),
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+        op.create_index('ix_alerts_status_created_at', 'alerts', ['status', 'created_at'], unique=False, postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_alerts_status_created_at', table_name='alerts', postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_alerts_open_key', table_name='alerts', postgresql_concurrently=True, if_exists=True)
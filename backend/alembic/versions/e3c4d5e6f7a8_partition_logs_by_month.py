@@ -0,0 +1,96 @@
+"""partition logs by month (range on created_at)
+
+Revision ID: e3c4d5e6f7a8
+Revises: d2b3c4d5e6f7
+Create Date: 2026-10-17 19:38:52.140967
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e3c4d5e6f7a8'
+down_revision: Union[str, None] = 'd2b3c4d5e6f7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Совпадает с LOGS_PARTITIONS_AHEAD по умолчанию; дальше секции создаёт app.services.log_partitions
+PARTITIONS_AHEAD = 2
+
+LOGS_INDEXES = [
+    ('ix_logs_id', ['id']),
+    ('ix_logs_created_at_id', ['created_at', 'id']),
+    ('ix_logs_device_id_created_at_id', ['device_id', 'created_at', 'id']),
+    ('ix_logs_level_created_at_id', ['level', 'created_at', 'id']),
+]
+
+
+def upgrade() -> None:
+    # Таблица переписывается целиком: на время миграции запись в logs блокируется.
+    # Первичный ключ секционированной таблицы обязан включать created_at, поэтому
+    # внешний ключ sms_outbox.log_id -> logs.id снимается (log_id остаётся ссылкой
+    # без ограничения: запись лога может уйти в архив вместе с секцией).
+    op.execute("LOCK TABLE logs IN ACCESS EXCLUSIVE MODE")
+    op.execute("ALTER TABLE sms_outbox DROP CONSTRAINT IF EXISTS sms_outbox_log_id_fkey")
+    op.execute("ALTER TABLE logs RENAME TO logs_legacy")
+    op.execute("ALTER TABLE logs_legacy RENAME CONSTRAINT logs_pkey TO logs_legacy_pkey")
+    for name, _ in LOGS_INDEXES:
+        op.execute(f"DROP INDEX IF EXISTS {name}")
+    op.execute("UPDATE logs_legacy SET created_at = COALESCE(updated_at, now()) WHERE created_at IS NULL")
+
+    # Те же колонки и значения по умолчанию (id - из той же последовательности logs_id_seq)
+    op.execute("CREATE TABLE logs (LIKE logs_legacy INCLUDING DEFAULTS) PARTITION BY RANGE (created_at)")
+    op.execute("ALTER TABLE logs ALTER COLUMN created_at SET NOT NULL")
+    op.execute("ALTER TABLE logs ADD CONSTRAINT logs_pkey PRIMARY KEY (id, created_at)")
+    op.execute("ALTER TABLE logs ADD CONSTRAINT logs_device_id_fkey FOREIGN KEY (device_id) REFERENCES devices (id)")
+
+    # Месячные секции от самой старой записи до PARTITIONS_AHEAD месяцев вперёд
+    # и секция по умолчанию для записей вне диапазона
+    op.execute(f"""
+        DO $$
+        DECLARE
+            part_month date := date_trunc('month', COALESCE((SELECT MIN(created_at) FROM logs_legacy), now()))::date;
+            last_month date := (date_trunc('month', now()) + interval '{PARTITIONS_AHEAD} months')::date;
+        BEGIN
+            WHILE part_month <= last_month LOOP
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF logs FOR VALUES FROM (%L) TO (%L)',
+                    'logs_p' || to_char(part_month, 'YYYY_MM'), part_month, (part_month + interval '1 month')::date
+                );
+                part_month := (part_month + interval '1 month')::date;
+            END LOOP;
+        END $$
+    """)
+    op.execute("CREATE TABLE logs_default PARTITION OF logs DEFAULT")
+
+    op.execute("INSERT INTO logs SELECT * FROM logs_legacy")
+    for name, columns in LOGS_INDEXES:
+        op.create_index(name, 'logs', columns, unique=False)
+    op.execute("ALTER SEQUENCE logs_id_seq OWNED BY logs.id")
+    op.execute("DROP TABLE logs_legacy")
+    op.execute("ANALYZE logs")
+
+
+def downgrade() -> None:
+    op.execute("LOCK TABLE logs IN ACCESS EXCLUSIVE MODE")
+    op.execute("ALTER TABLE logs RENAME TO logs_partitioned")
+    op.execute("ALTER TABLE logs_partitioned RENAME CONSTRAINT logs_pkey TO logs_partitioned_pkey")
+    for name, _ in LOGS_INDEXES:
+        op.execute(f"DROP INDEX IF EXISTS {name}")
+
+    op.execute("CREATE TABLE logs (LIKE logs_partitioned INCLUDING DEFAULTS)")
+    op.execute("ALTER TABLE logs ALTER COLUMN created_at DROP NOT NULL")
+    op.execute("INSERT INTO logs SELECT * FROM logs_partitioned")
+    op.execute("ALTER TABLE logs ADD CONSTRAINT logs_pkey PRIMARY KEY (id)")
+    op.execute("ALTER TABLE logs ADD CONSTRAINT logs_device_id_fkey FOREIGN KEY (device_id) REFERENCES devices (id)")
+    for name, columns in LOGS_INDEXES:
+        op.create_index(name, 'logs', columns, unique=False)
+    op.execute("ALTER SEQUENCE logs_id_seq OWNED BY logs.id")
+    op.execute("DROP TABLE logs_partitioned CASCADE")
+
+    # Ссылки на записи, удалённые вместе с секциями, обнуляются
+    op.execute("UPDATE sms_outbox SET log_id = NULL WHERE log_id IS NOT NULL AND log_id NOT IN (SELECT id FROM logs)")
+    op.create_foreign_key('sms_outbox_log_id_fkey', 'sms_outbox', 'logs', ['log_id'], ['id'], ondelete='SET NULL')
@@ -0,0 +1,58 @@
+"""add normalized phone_e164 column to devices
+
+Revision ID: e7c8d9f0a1b2
+Revises: d6b7c8e9f0a1
+Create Date: 2026-10-17 14:32:07.518204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7c8d9f0a1b2'
+down_revision: Union[str, None] = 'd6b7c8e9f0a1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('devices', sa.Column('phone_e164', sa.String(length=16), nullable=True))
+    # Заполняем по тем же правилам, что и app.utils.phone.normalize_phone.
+    # Если после нормализации несколько устройств получают один номер,
+    # значение достаётся устройству с наименьшим id, остальные остаются NULL
+    op.execute("""
+        WITH converted AS (
+            SELECT id,
+                   CASE
+                       WHEN length(digits) = 11 AND left(digits, 1) = '8' AND NOT international THEN '7' || substr(digits, 2)
+                       WHEN length(digits) = 10 AND NOT international THEN '7' || digits
+                       ELSE digits
+                   END AS digits
+            FROM (
+                SELECT id,
+                       regexp_replace(phone, '[^0-9]', '', 'g') AS digits,
+                       phone ~ '^[ \\t\\r\\n]*\\+' AS international
+                FROM devices
+                WHERE phone IS NOT NULL AND phone <> ''
+            ) AS d
+        ), normalized AS (
+            SELECT id, '+' || digits AS e164
+            FROM converted
+            WHERE length(digits) BETWEEN 10 AND 15
+        ), ranked AS (
+            SELECT id, e164, row_number() OVER (PARTITION BY e164 ORDER BY id) AS rn
+            FROM normalized
+        )
+        UPDATE devices SET phone_e164 = ranked.e164
+        FROM ranked
+        WHERE devices.id = ranked.id AND ranked.rn = 1
+    """)
+    op.create_index(op.f('ix_devices_phone_e164'), 'devices', ['phone_e164'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_devices_phone_e164'), table_name='devices')
+    op.drop_column('devices', 'phone_e164')
@@ -0,0 +1,32 @@
+"""add platform_sms_usage quota counters table
+
+Revision ID: f8d9e0a1b2c3
+Revises: e7c8d9f0a1b2
+Create Date: 2026-10-17 15:06:44.903185
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f8d9e0a1b2c3'
+down_revision: Union[str, None] = 'e7c8d9f0a1b2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('platform_sms_usage',
+    sa.Column('platform_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('period_start', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('sent', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.PrimaryKeyConstraint('platform_id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('platform_sms_usage')
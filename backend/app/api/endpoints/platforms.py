@@ -11,6 +11,9 @@ from app.models.device import Device
 from app.schemas.device import DeviceCreate, DeviceUpdate, DeviceOut
 from app.core.deps import get_current_user_id, get_current_user
 from app.core.platform_permissions import require_platform_role
+from app.services.platform_role_cache import invalidate_platform_roles
+from app.services.device import DeviceService
+from app.services.device_phone_cache import device_phone_cache
 from app.core.audit import log_audit
 from app.models.audit_log import AuditLog
 from app.schemas.audit_log import AuditLogOut
@@ -54,6 +57,7 @@ def delete_platform(platform_id: int, db: Session = Depends(get_db), user=Depend
         raise HTTPException(status_code=404, detail="Platform not found")
     db.delete(platform)
     db.commit()
+    invalidate_platform_roles(db=db)
     return None
 
 @router.post("/platforms/{platform_id}/users/", response_model=PlatformUserOut, status_code=201)
@@ -63,6 +67,7 @@ def add_platform_user(platform_id: int, user_in: PlatformUserCreate, db: Session
     db.add(platform_user)
     db.commit()
     db.refresh(platform_user)
+    invalidate_platform_roles(platform_user.user_id, db)
     log_audit(db, action="add_platform_user", user_id=user_id, platform_id=platform_id, details=f"Добавлен пользователь {user_in.user_id} с ролью {user_in.role}")
     return platform_user
 
@@ -76,6 +81,7 @@ def update_platform_user(platform_id: int, platform_user_id: int, user_in: Platf
     platform_user.role = user_in.role
     db.commit()
     db.refresh(platform_user)
+    invalidate_platform_roles(platform_user.user_id, db)
     log_audit(db, action="update_platform_user", user_id=user_id, platform_id=platform_id, details=f"Изменена роль пользователя {platform_user.user_id} с {old_role} на {user_in.role}")
     return platform_user
 
@@ -87,6 +93,7 @@ def delete_platform_user(platform_id: int, platform_user_id: int, db: Session =
         raise HTTPException(status_code=404, detail="Platform user not found")
     db.delete(platform_user)
     db.commit()
+    invalidate_platform_roles(platform_user.user_id, db)
     log_audit(db, action="delete_platform_user", user_id=user_id, platform_id=platform_id, details=f"Удалён пользователь {platform_user.user_id}")
     return None
 
@@ -114,10 +121,12 @@ def add_platform_device(platform_id: int, device_in: DeviceCreate, db: Session =
         existing = db.query(Device).filter(Device.grafana_uid == device_in.grafana_uid).first()
         if existing:
             raise HTTPException(status_code=400, detail="Устройство с таким ID плеера Grafana уже существует")
+    DeviceService.ensure_phone_available(db, device_in.phone)
     device = Device(platform_id=platform_id, **device_in.dict())
     db.add(device)
     db.commit()
     db.refresh(device)
+    device_phone_cache.update(device)
     log_audit(db, action="add_platform_device", user_id=user_id, platform_id=platform_id, details=f"Добавлено устройство {device.id}")
     return device
 
@@ -129,6 +138,7 @@ def delete_platform_device(platform_id: int, device_id: int, db: Session = Depen
         raise HTTPException(status_code=404, detail="Device not found")
     db.delete(device)
     db.commit()
+    device_phone_cache.remove(device_id)
     log_audit(db, action="delete_platform_device", user_id=user_id, platform_id=platform_id, details=f"Удалено устройство {device_id}")
     return None
 
@@ -158,8 +168,11 @@ def update_platform_device(platform_id: int, device_id: int, device_in: DeviceUp
         existing = db.query(Device).filter(Device.grafana_uid == device_in.grafana_uid, Device.id != device_id).first()
         if existing:
             raise HTTPException(status_code=400, detail="Устройство с таким ID плеера Grafana уже существует")
+    if device_in.phone:
+        DeviceService.ensure_phone_available(db, device_in.phone, device_id)
     for field, value in device_in.dict(exclude_unset=True).items():
         setattr(device, field, value)
     db.commit()
     db.refresh(device)
+    device_phone_cache.update(device)
     return device 
\ No newline at end of file
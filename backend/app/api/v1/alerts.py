@@ -7,6 +7,8 @@ from app.models.device import Device
 from app.schemas.alert import AlertCreate, AlertResponse
 from app.core.auth import get_current_user
 from app.models.user import User
+from app.services.open_alert_registry import open_alert_registry
+from app.services.platform_stats_service import PlatformStatsService
 
 router = APIRouter()
 
@@ -24,6 +26,9 @@ def create_alert(
     
     db_alert = Alert(**alert_in.model_dump())
     db.add(db_alert)
+    db.flush()
+    db.refresh(db_alert)  # created_at задаёт БД
+    PlatformStatsService.alert_status_changed(db, db_alert.device_id, None, db_alert.status, alert_at=db_alert.created_at)
     db.commit()
     db.refresh(db_alert)
     return db_alert
@@ -60,12 +65,21 @@ def update_alert(
     if not db_alert:
         raise HTTPException(status_code=404, detail="Alert not found")
     
+    old_status, old_device_id = db_alert.status, db_alert.device_id
     for field, value in alert_update.model_dump(exclude_unset=True).items():
         setattr(db_alert, field, value)
+
+    if db_alert.device_id != old_device_id:
+        # Алерт перенесён на другое устройство (возможно, другой платформы)
+        PlatformStatsService.alert_status_changed(db, old_device_id, old_status, None)
+        PlatformStatsService.alert_status_changed(db, db_alert.device_id, None, db_alert.status, alert_at=db_alert.created_at)
+    else:
+        PlatformStatsService.alert_status_changed(db, db_alert.device_id, old_status, db_alert.status)
     
     db.add(db_alert)
     db.commit()
     db.refresh(db_alert)
+    open_alert_registry.sync_alert(db_alert)
     return db_alert
 
 @router.delete("/{alert_id}", status_code=204)
@@ -78,6 +92,9 @@ def delete_alert(
     if not db_alert:
         raise HTTPException(status_code=404, detail="Alert not found")
     
+    # latest_alert_at не уменьшается - его поправит периодическая сверка
+    PlatformStatsService.alert_status_changed(db, db_alert.device_id, db_alert.status, None)
     db.delete(db_alert)
     db.commit()
+    open_alert_registry.discard(alert_id)
     return None 
\ No newline at end of file
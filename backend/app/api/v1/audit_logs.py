@@ -1,4 +1,5 @@
-from fastapi import APIRouter, Depends, Request
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import datetime
@@ -6,38 +7,72 @@ from datetime import datetime
 from app.db.session import get_db
 from app.schemas.audit_log import AuditLogResponse, AuditLogCreate
 from app.services.audit_log_service import AuditLogService
+from app.services.platform_role_cache import platform_role_cache
 from app.core.auth import get_current_user
+from app.core.platform_permissions import require_platform_role
 from app.models.user import User
 
 router = APIRouter()
 
+# Роли на платформе, которым виден журнал аудита платформы
+AUDIT_ROLES = ["admin", "manager"]
+
 @router.get("/", response_model=List[AuditLogResponse])
-async def get_audit_logs(
+def get_audit_logs(
+    response: Response,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
     user_id: Optional[int] = None,
-    action: Optional[str] = None,
+    action: Optional[str] = Query(None, description="Подстрока действия (без учёта регистра)"),
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
     platform_id: Optional[int] = None,
     device_id: Optional[int] = None,
+    cursor: Optional[str] = Query(None, description="Курсор из заголовка X-Next-Cursor предыдущей страницы"),
+    limit: int = Query(100, ge=1, le=1000),
+    format: Optional[str] = Query(None, description="csv или ndjson - потоковая выгрузка всех записей"),
 ):
-    """Get all audit logs with filters."""
-    logs = AuditLogService.get_logs(
-        db, 
-        user_id=user_id, 
-        action=action, 
-        start_date=start_date, 
-        end_date=end_date,
-        platform_id=platform_id,
-        device_id=device_id
+    """
+    Журнал аудита с keyset-пагинацией по (timestamp, id).
+    Курсор следующей страницы возвращается в заголовке X-Next-Cursor.
+    superadmin видит все записи, остальные - записи платформ, где они
+    admin или manager, и свои собственные действия.
+    """
+    if format and format not in ("csv", "ndjson"):
+        raise HTTPException(status_code=400, detail="Формат выгрузки: csv или ndjson")
+    filters = dict(
+        user_id=user_id, action=action, start_date=start_date, end_date=end_date,
+        platform_id=platform_id, device_id=device_id,
     )
+    if current_user.role != "superadmin":
+        if platform_id:
+            require_platform_role(platform_id, current_user.id, allowed_roles=AUDIT_ROLES, db=db, user=current_user)
+        roles = platform_role_cache.get(db, current_user.id)
+        platforms = roles["platforms"] if roles else {}
+        filters["scope_platform_ids"] = [pid for pid, role in platforms.items() if role in AUDIT_ROLES]
+        filters["scope_user_id"] = current_user.id
+
+    if format == "csv":
+        return StreamingResponse(
+            AuditLogService.iter_export("csv", **filters),
+            media_type="text/csv",
+            headers={"Content-Disposition": "attachment; filename=audit_logs.csv"},
+        )
+    if format == "ndjson":
+        return StreamingResponse(AuditLogService.iter_export("ndjson", **filters), media_type="application/x-ndjson")
+
+    try:
+        logs, next_cursor = AuditLogService.get_logs_page(db, cursor=cursor, limit=limit, **filters)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     return logs
 
 # This is an example of how to log an action.
 # We will integrate this into other endpoints later.
 @router.post("/test-log", response_model=AuditLogResponse)
-async def create_test_log(
+def create_test_log(
     request: Request,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -9,11 +9,11 @@ from app.services.client import ClientService
 router = APIRouter()
 
 @router.get("/", response_model=List[ClientResponse])
-async def get_clients(db: Session = Depends(get_db)):
+def get_clients(db: Session = Depends(get_db)):
     """Get all clients."""
     return []
 
 @router.post("/", response_model=ClientResponse)
-async def create_client(client: ClientCreate, db: Session = Depends(get_db)):
+def create_client(client: ClientCreate, db: Session = Depends(get_db)):
     """Create a new client."""
     return {"id": 1, "name": "Test Client", "email": "test@example.com"} 
\ No newline at end of file
@@ -6,6 +6,7 @@ from app.models.command_template import CommandTemplate
 from app.schemas.command_template import CommandTemplateCreate, CommandTemplateResponse
 from app.core.deps import get_current_user
 from app.models.user import User
+from app.services.command_template_registry import command_template_registry
 
 router = APIRouter()
 
@@ -55,6 +56,7 @@ def create_command_template(
     db.add(db_template)
     db.commit()
     db.refresh(db_template)
+    command_template_registry.invalidate(db_template.id)
     return db_template
 
 @router.put("/{template_id}", response_model=CommandTemplateResponse)
@@ -78,6 +80,7 @@ def update_command_template(
     
     db.commit()
     db.refresh(template)
+    command_template_registry.invalidate(template_id)
     return template
 
 @router.delete("/{template_id}")
@@ -96,4 +99,5 @@ def delete_command_template(
     
     db.delete(template)
     db.commit()
+    command_template_registry.invalidate(template_id)
     return {"message": "Шаблон команды успешно удален"} 
\ No newline at end of file
@@ -6,17 +6,37 @@ from app.schemas.command_template import CommandTemplateResponse, CommandParamSc
 from app.core.database import get_db
 from app.schemas.command_log import CommandLogResponse
 from app.models import Log, CommandTemplate, Device
-from app.services.sms_gateway import SMSGateway, get_sms_gateway
+from app.services.sms_queue import sms_queue
+from app.services.command_template_registry import CompiledTemplate, command_template_registry
+from app.services.sms_quota import SMSQuotaService
+from app.services.command_job_service import CommandJobService
+from app.schemas.command_job import BulkCommandRequest, CommandJobResponse
+from app.core.platform_permissions import require_platform_role
 from app.core.auth import get_current_user
 from app.models.user import User
 import re
-import logging
 from datetime import datetime
 
 router = APIRouter()
 
+def _render_command(template: CompiledTemplate, params: Dict[str, str]) -> str:
+    """Проверить параметры и подставить их в скомпилированный шаблон"""
+    validation_errors = template.validate(params)
+    if validation_errors:
+        raise HTTPException(
+            status_code=400,
+            detail={"message": "Invalid parameters", "errors": validation_errors}
+        )
+    try:
+        return template.render(params)
+    except KeyError as e:
+        raise HTTPException(
+            status_code=400,
+            detail={"message": "Invalid parameters", "errors": {str(e.args[0]): ["Parameter is required"]}}
+        )
+
 @router.get("/templates/", response_model=List[CommandTemplateResponse])
-async def get_all_command_templates(
+def get_all_command_templates(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
@@ -27,7 +47,7 @@ async def get_all_command_templates(
     return templates
 
 @router.get("/templates/{model}", response_model=List[CommandTemplateResponse])
-async def get_command_templates(
+def get_command_templates(
     model: str,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -39,95 +59,49 @@ async def get_command_templates(
     return templates
 
 @router.post("/build")
-async def build_command(
+def build_command(
     template_id: int,
     params: Dict[str, str],
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """Сгенерировать команду с параметрами"""
-    template = db.query(CommandTemplate).get(template_id)
+    template = command_template_registry.get(db, template_id)
     if not template:
         raise HTTPException(status_code=404, detail="Template not found")
     
-    validation_errors = CommandService.validate_params(params, template.params_schema)
-    if validation_errors:
-        raise HTTPException(
-            status_code=400,
-            detail={"message": "Invalid parameters", "errors": validation_errors}
-        )
-    
-    result = CommandService.build_command(db, template_id, params)
-    return result
+    return {"command": _render_command(template, params)}
 
 @router.post("/execute", response_model=CommandLogResponse)
-async def execute_command(
+def execute_command(
     device_id: int = Body(...),
     template_id: int = Body(...),
     params: Dict[str, str] = Body(...),
     db: Session = Depends(get_db),
-    sms_gateway: SMSGateway = Depends(get_sms_gateway),
     current_user: User = Depends(get_current_user)
 ):
     """Выполнить команду и записать в лог"""
-    template = db.query(CommandTemplate).get(template_id)
+    template = command_template_registry.get(db, template_id)
     if not template:
         raise HTTPException(status_code=404, detail="Template not found")
     
-    validation_errors = CommandService.validate_params(params, template.params_schema)
-    if validation_errors:
-        raise HTTPException(
-            status_code=400,
-            detail={"message": "Invalid parameters", "errors": validation_errors}
-        )
-    
-    command_data = CommandService.build_command(db, template_id, params)
+    command_data = {"command": _render_command(template, params)}
     
     # Получаем устройство
     device = db.query(Device).get(device_id)
     if not device:
         raise HTTPException(status_code=404, detail="Device not found")
     
-    # Отправляем команду через SMS, если у устройства указан телефон
-    sms_response = None
+    # Ставим команду в очередь SMS, если у устройства указан телефон.
+    # Отправку выполняет фоновый воркер (app.services.sms_queue), он же
+    # обновит статус записи лога и запишет результат в audit log.
     if device.phone:
-        try:
-            sms_response = await sms_gateway.send_command(
-                phone_number=device.phone,
-                command=command_data["command"]
-            )
-            log_status = "sent"
-            log_level = "SMS_OUT"
-            log_response = sms_response or "OK"
-            
-            # Логируем успешную отправку SMS в audit log
-            from app.core.audit import log_audit
-            log_audit(
-                db=db,
-                action="sms_command_sent",
-                user_id=current_user.id,
-                platform_id=device.platform_id,
-                device_id=device_id,
-                details=f"SMS command '{command_data['command']}' sent to device {device.name} ({device.phone})"
-            )
-        except Exception as e:
-            log_status = "failed"
-            log_level = "ERROR"
-            log_response = f"Ошибка отправки SMS: {e}"
-            # Логируем ошибку для детального анализа
-            logger = logging.getLogger(__name__)
-            logger.error(f"Ошибка при отправке SMS для устройства {device_id}: {e}", exc_info=True)
-            
-            # Логируем ошибку SMS Gateway в audit log для мониторинга платформы
-            from app.core.audit import log_audit
-            log_audit(
-                db=db,
-                action="sms_gateway_error",
-                user_id=current_user.id,
-                platform_id=device.platform_id,
-                device_id=device_id,
-                details=f"SMS Gateway error for device {device.name} ({device.phone}): {str(e)[:200]}"
-            )
+        # Квоты платформы и пользователя списываются до записи в лог:
+        # при отказе запрос сразу получает 429, счётчики не меняются
+        SMSQuotaService.require(db, device.platform_id, current_user.id)
+        log_status = "queued"
+        log_level = "SMS_OUT"
+        log_response = None
     else:
         log_status = "skipped"
         log_level = "info"
@@ -142,10 +116,64 @@ async def execute_command(
         response=log_response,
         level=log_level # Передаем явно уровень логирования
     )
+
+    if device.phone:
+        sms_queue.enqueue(
+            db,
+            phone=device.phone,
+            text=command_data["command"],
+            log_id=log.id,
+            device_id=device_id,
+            platform_id=device.platform_id,
+            user_id=current_user.id
+        )
     return log
 
+@router.post("/execute-bulk", response_model=CommandJobResponse, status_code=202)
+def execute_command_bulk(
+    request: BulkCommandRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Выполнить команду на группе устройств (список device_ids и/или все
+    устройства платформы). Возвращает задание, прогресс - GET /commands/jobs/{job_id}
+    """
+    if request.platform_id is not None:
+        require_platform_role(request.platform_id, current_user.id, allowed_roles=['admin', 'manager'], db=db, user=current_user)
+    elif current_user.role != 'superadmin':
+        # Устройства из device_ids могут принадлежать разным платформам: роль проверяется на каждой
+        platform_ids = {
+            platform_id for (platform_id,) in
+            db.query(Device.platform_id).filter(Device.id.in_(set(request.device_ids))).distinct()
+        }
+        if None in platform_ids:
+            raise HTTPException(status_code=403, detail="Нет доступа к платформе")
+        for platform_id in platform_ids:
+            require_platform_role(platform_id, current_user.id, allowed_roles=['admin', 'manager'], db=db, user=current_user)
+
+    template = command_template_registry.get(db, request.template_id)
+    if not template:
+        raise HTTPException(status_code=404, detail="Template not found")
+    command = _render_command(template, request.params)
+
+    job = CommandJobService.create(db, request, template, command, current_user)
+    return CommandJobService.get_progress(db, job.id)
+
+@router.get("/jobs/{job_id}", response_model=CommandJobResponse)
+def get_command_job(
+    job_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Прогресс массового выполнения команды"""
+    progress = CommandJobService.get_progress(db, job_id)
+    if not progress or (progress["user_id"] != current_user.id and current_user.role != "superadmin"):
+        raise HTTPException(status_code=404, detail="Command job not found")
+    return progress
+
 @router.get("/status/{command_id}", response_model=CommandLogResponse)
-async def get_command_status(
+def get_command_status(
     command_id: int,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -157,7 +185,7 @@ async def get_command_status(
     return log
 
 @router.post("/templates/", response_model=CommandTemplateResponse)
-async def create_command_template(
+def create_command_template(
     template: CommandTemplateCreate,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -167,10 +195,11 @@ async def create_command_template(
     db.add(db_template)
     db.commit()
     db.refresh(db_template)
+    command_template_registry.invalidate(db_template.id)
     return db_template
 
 @router.put("/templates/{template_id}", response_model=CommandTemplateResponse)
-async def update_command_template(
+def update_command_template(
     template_id: int,
     template_update: CommandTemplateCreate, # Re-using create schema for simplicity, could be a specific update schema
     db: Session = Depends(get_db),
@@ -187,10 +216,11 @@ async def update_command_template(
     
     db.commit()
     db.refresh(db_template)
+    command_template_registry.invalidate(template_id)
     return db_template
 
 @router.delete("/templates/{template_id}", response_model=Dict[str, str])
-async def delete_command_template(
+def delete_command_template(
     template_id: int,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -202,4 +232,5 @@ async def delete_command_template(
     
     db.delete(db_template)
     db.commit()
+    command_template_registry.invalidate(template_id)
     return {"message": "Command Template deleted successfully"}
@@ -5,9 +5,11 @@ from app.core.database import get_db
 from app.models.device import Device
 from app.schemas.device import DeviceCreate, DeviceUpdate, Device as DeviceSchema
 from app.services.device import DeviceService
+from app.services.device_phone_cache import device_phone_cache
 from app.core.auth import get_current_user
 from app.models.user import User
 from app.core.audit import log_audit
+from app.services.platform_stats_service import PlatformStatsService
 
 router = APIRouter()
 
@@ -16,7 +18,7 @@ def require_superadmin(user: User):
         raise HTTPException(status_code=403, detail="Требуются права супер-администратора")
 
 @router.get("/", response_model=List[DeviceSchema])
-async def get_devices(
+def get_devices(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
@@ -25,7 +27,7 @@ async def get_devices(
     return db.query(Device).all()
 
 @router.post("/", response_model=DeviceSchema)
-async def create_device(
+def create_device(
     device: DeviceCreate,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -34,18 +36,21 @@ async def create_device(
     require_superadmin(current_user)
     if device.phone:
         device.phone = device.phone.lstrip('+')
+        DeviceService.ensure_phone_available(db, device.phone)
     # Супер-админ должен явно указать платформу при создании устройства
     if not device.platform_id:
         raise HTTPException(status_code=400, detail="platform_id является обязательным полем")
     db_device = Device(**device.model_dump())
     db.add(db_device)
+    PlatformStatsService.apply(db, db_device.platform_id, devices=1)
     db.commit()
     db.refresh(db_device)
+    device_phone_cache.update(db_device)
     log_audit(db, action="create_device", user_id=current_user.id, platform_id=db_device.platform_id, device_id=db_device.id, details=f"Создано устройство: {db_device.name}")
     return db_device
 
 @router.get("/{device_id}", response_model=DeviceSchema)
-async def get_device(
+def get_device(
     device_id: int,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -58,7 +63,7 @@ async def get_device(
     return db_device
 
 @router.put("/{device_id}", response_model=DeviceSchema)
-async def update_device(
+def update_device(
     device_id: int,
     device: DeviceUpdate,
     db: Session = Depends(get_db),
@@ -73,17 +78,19 @@ async def update_device(
     update_data = device.model_dump(exclude_unset=True)
     if "phone" in update_data and update_data["phone"] is not None:
         update_data["phone"] = update_data["phone"].lstrip('+')
+        DeviceService.ensure_phone_available(db, update_data["phone"], device_id)
 
     for field, value in update_data.items():
         setattr(db_device, field, value)
     
     db.commit()
     db.refresh(db_device)
+    device_phone_cache.update(db_device)
     log_audit(db, action="update_device", user_id=current_user.id, platform_id=db_device.platform_id, device_id=db_device.id, details=f"Обновлено устройство: {db_device.name}")
     return db_device
 
 @router.delete("/{device_id}", response_model=DeviceSchema)
-async def delete_device(
+def delete_device(
     device_id: int,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -95,12 +102,15 @@ async def delete_device(
         raise HTTPException(status_code=404, detail="Device not found")
     
     db.delete(db_device)
+    PlatformStatsService.apply(db, db_device.platform_id, devices=-1)
     db.commit()
-    log_audit(db, action="delete_device", user_id=current_user.id, platform_id=db_device.platform_id, device_id=db_device.id, details=f"Удалено устройство: {db_device.name}")
+    device_phone_cache.remove(device_id)
+    # Строка удалена: внешний ключ на неё не пройдёт, id остаётся в details
+    log_audit(db, action="delete_device", user_id=current_user.id, platform_id=db_device.platform_id, device_id=None, details=f"Удалено устройство: {db_device.name} (id={device_id})")
     return db_device
 
 @router.get("/search/")
-async def search_devices(
+def search_devices(
     phone: str,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -110,7 +120,7 @@ async def search_devices(
     return DeviceService.get_device_by_phone(db, phone)
 
 @router.patch("/{device_id}/move/{platform_id}", response_model=DeviceSchema)
-async def move_device_to_platform(
+def move_device_to_platform(
     device_id: int, 
     platform_id: int, 
     db: Session = Depends(get_db),
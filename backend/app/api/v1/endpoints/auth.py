@@ -72,7 +72,7 @@ def login_for_access_token(
         )
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": str(user.id), "role": user.role, "platform_id": user.platform_id, "user_id": user.id},
+        data={"sub": str(user.id), "role": user.role, "platform_id": user.platform_id, "user_id": user.id, "ver": user.token_version or 0},
         expires_delta=access_token_expires
     )
     return {"access_token": access_token, "token_type": "bearer"} 
@@ -85,7 +85,7 @@ def refresh_access_token(current_user: DBUser = Depends(get_current_user)) -> An
     """
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": str(current_user.id), "role": current_user.role, "platform_id": current_user.platform_id, "user_id": current_user.id},
+        data={"sub": str(current_user.id), "role": current_user.role, "platform_id": current_user.platform_id, "user_id": current_user.id, "ver": current_user.token_version or 0},
         expires_delta=access_token_expires
     )
     return {"access_token": access_token, "token_type": "bearer"} 
\ No newline at end of file
@@ -1,7 +1,9 @@
-from typing import Any, List
+from typing import Any, List, Optional
 from datetime import datetime
 
-from fastapi import APIRouter, Depends, HTTPException, status, Request
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 
 from app.core.auth import get_current_user
@@ -10,11 +12,16 @@ from app.models.platform import Platform
 from app.schemas.platform import PlatformResponse, PlatformCreate, PlatformUpdate
 from app.models.platform_user import PlatformUser
 from app.models.device import Device
-from app.models.log import Log
 from app.core.platform_permissions import require_platform_role
 from app.schemas.device import Device as DeviceResponse, DeviceCreate, DeviceUpdate
 from app.models.user import User
 from app.core.audit import log_audit
+from app.services.log import LogService
+from app.services.platform_stats_service import PlatformStatsService
+from app.services.platform_role_cache import invalidate_platform_roles
+from app.services.device import DeviceService
+from app.services.device_phone_cache import device_phone_cache
+from app.services.sms_quota import SMSQuotaService
 
 router = APIRouter()
 
@@ -82,7 +89,8 @@ def create_platform(
         name=platform.name,
         description=platform.description,
         devices_limit=platform.devices_limit,
-        sms_limit=platform.sms_limit
+        sms_limit=platform.sms_limit,
+        sms_coalesce_window=platform.sms_coalesce_window
     )
     db.add(db_platform)
     db.commit()
@@ -155,7 +163,9 @@ def delete_platform(
     
     db.delete(platform)
     db.commit()
-    log_audit(db, action="delete_platform", user_id=current_user.id, platform_id=platform_id, details=f"Удалена платформа: {platform_id}")
+    invalidate_platform_roles(db=db)
+    # Строка удалена: внешний ключ на неё не пройдёт, id остаётся в details
+    log_audit(db, action="delete_platform", user_id=current_user.id, platform_id=None, details=f"Удалена платформа: {platform_id}")
     return {"message": "Платформа успешно удалена"}
 
 # Дополнительные endpoints для работы с пользователями платформ
@@ -260,6 +270,7 @@ def add_user_to_platform(
     
     db.add(platform_user)
     db.commit()
+    invalidate_platform_roles(platform_user.user_id, db)
     log_audit(db, action="add_user_to_platform", user_id=current_user.id, platform_id=platform_id, details=f"Добавлен пользователь: {user.email}")
     return {"message": "Пользователь добавлен в платформу"}
 
@@ -291,6 +302,7 @@ def update_platform_user_role(
     
     platform_user.role = role_data["role"]
     db.commit()
+    invalidate_platform_roles(user_id, db)
     log_audit(db, action="update_platform_user_role", user_id=current_user.id, platform_id=platform_id, details=f"Изменена роль пользователя: {platform_user.user.email} -> {role_data['role']}")
     return {"message": "Роль пользователя обновлена"}
 
@@ -321,6 +333,7 @@ def remove_user_from_platform(
     
     db.delete(platform_user)
     db.commit()
+    invalidate_platform_roles(user_id, db)
     log_audit(db, action="remove_user_from_platform", user_id=current_user.id, platform_id=platform_id, details=f"Удалён пользователь: {platform_user.user.email}")
     return {"message": "Пользователь удален из платформы"}
 
@@ -335,7 +348,7 @@ def get_platform_devices(
     """
     Получить список устройств платформы.
     """
-    require_platform_role(platform_id, user.id, allowed_roles=['admin', 'manager', 'user', 'viewer'], db=db)
+    require_platform_role(platform_id, user.id, allowed_roles=['admin', 'manager', 'user', 'viewer'], db=db, user=user)
     
     platform = db.query(Platform).filter(Platform.id == platform_id).first()
     if not platform:
@@ -357,7 +370,7 @@ def add_device_to_platform(
     """
     Добавить новое устройство в платформу.
     """
-    require_platform_role(platform_id, user.id, allowed_roles=['admin', 'manager'], db=db)
+    require_platform_role(platform_id, user.id, allowed_roles=['admin', 'manager'], db=db, user=user)
     
     platform = db.query(Platform).filter(Platform.id == platform_id).first()
     if not platform:
@@ -370,11 +383,14 @@ def add_device_to_platform(
     # Исключаем platform_id из данных схемы, так как он передается отдельно
     device_data = device_in.dict()
     device_data.pop('platform_id', None)  # Удаляем platform_id если он есть
+    DeviceService.ensure_phone_available(db, device_data.get('phone'))
         
     db_device = Device(**device_data, platform_id=platform_id, user_id=user.id)
     db.add(db_device)
+    PlatformStatsService.apply(db, platform_id, devices=1)
     db.commit()
     db.refresh(db_device)
+    device_phone_cache.update(db_device)
     log_audit(db, action="add_device_to_platform", user_id=user.id, platform_id=platform_id, device_id=db_device.id, details=f"Добавлено устройство: {db_device.name}")
     return db_device
 
@@ -389,7 +405,7 @@ def update_device_in_platform(
     """
     Обновить устройство в платформе.
     """
-    require_platform_role(platform_id, user.id, allowed_roles=['admin', 'manager'], db=db)
+    require_platform_role(platform_id, user.id, allowed_roles=['admin', 'manager'], db=db, user=user)
     
     device = db.query(Device).filter(Device.id == device_id, Device.platform_id == platform_id).first()
     if not device:
@@ -398,12 +414,14 @@ def update_device_in_platform(
     update_data = device_update.dict(exclude_unset=True)
     if "phone" in update_data and update_data["phone"] is not None:
         update_data["phone"] = update_data["phone"].lstrip('+')
+        DeviceService.ensure_phone_available(db, update_data["phone"], device_id)
     
     for field, value in update_data.items():
         setattr(device, field, value)
     
     db.commit()
     db.refresh(device)
+    device_phone_cache.update(device)
     log_audit(db, action="update_device_in_platform", user_id=user.id, platform_id=platform_id, device_id=device.id, details=f"Обновлено устройство: {device.name}")
     return device
 
@@ -417,24 +435,52 @@ def remove_device_from_platform(
     """
     Удалить устройство из платформы.
     """
-    require_platform_role(platform_id, user.id, allowed_roles=['admin', 'manager'], db=db)
+    require_platform_role(platform_id, user.id, allowed_roles=['admin', 'manager'], db=db, user=user)
     
     device = db.query(Device).filter(Device.id == device_id, Device.platform_id == platform_id).first()
     if not device:
         raise HTTPException(status_code=404, detail="Устройство не найдено в этой платформе")
         
     db.delete(device)
+    PlatformStatsService.apply(db, platform_id, devices=-1)
     db.commit()
+    device_phone_cache.remove(device_id)
     log_audit(db, action="remove_device_from_platform", user_id=user.id, platform_id=platform_id, device_id=device_id, details=f"Удалено устройство: {device_id}")
     return {"message": "Устройство удалено из платформы"}
 
 @router.get("/{platform_id}/logs", summary="Получить логи команд платформы", tags=["Platforms"])
-def get_platform_logs(platform_id: int, db: Session = Depends(get_db), user=Depends(get_current_user)):
-    require_platform_role(platform_id, user.id, allowed_roles=["admin", "manager", "user", "viewer"], db=db)
-    device_ids = [d.id for d in db.query(Device).filter(Device.platform_id == platform_id).all()]
-    if not device_ids:
-        return []
-    logs = db.query(Log).filter(Log.device_id.in_(device_ids)).order_by(Log.created_at.desc()).all()
+def get_platform_logs(
+    platform_id: int,
+    response: Response,
+    db: Session = Depends(get_db),
+    user=Depends(get_current_user),
+    level: Optional[str] = None,
+    log_status: Optional[str] = Query(None, alias="status"),
+    device_id: Optional[int] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    cursor: Optional[str] = Query(None, description="Курсор из заголовка X-Next-Cursor предыдущей страницы"),
+    limit: int = Query(100, ge=1, le=1000),
+    format: Optional[str] = Query(None, description="ndjson - потоковая выгрузка всех записей"),
+):
+    """
+    Логи устройств платформы с keyset-пагинацией по (created_at, id).
+    Курсор следующей страницы возвращается в заголовке X-Next-Cursor.
+    """
+    require_platform_role(platform_id, user.id, allowed_roles=["admin", "manager", "user", "viewer"], db=db, user=user)
+    filters = dict(
+        level=level, status=log_status, device_id=device_id, platform_id=platform_id,
+        start_date=start_date, end_date=end_date,
+    )
+    if format == "ndjson":
+        return StreamingResponse(LogService.iter_logs_ndjson(**filters), media_type="application/x-ndjson")
+
+    try:
+        logs, next_cursor = LogService.get_logs_page(db, cursor=cursor, limit=limit, **filters)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     return logs
 
 @router.get("/{platform_id}/limits", summary="Получить информацию о лимитах платформы", tags=["Platforms"])
@@ -446,7 +492,7 @@ def get_platform_limits(
     """
     Получить информацию о лимитах платформы и текущем использовании.
     """
-    require_platform_role(platform_id, user.id, allowed_roles=['admin', 'manager', 'user', 'viewer'], db=db)
+    require_platform_role(platform_id, user.id, allowed_roles=['admin', 'manager', 'user', 'viewer'], db=db, user=user)
     
     platform = db.query(Platform).filter(Platform.id == platform_id).first()
     if not platform:
@@ -455,12 +501,9 @@ def get_platform_limits(
             detail="Платформа не найдена"
         )
     
-    # Подсчитываем текущее количество устройств
-    device_count = db.query(Device).filter(Device.platform_id == platform_id).count()
-    
-    # Подсчитываем количество SMS (если есть логика для этого)
-    # sms_count = db.query(SMSLog).filter(SMSLog.platform_id == platform_id).count()
-    sms_count = 0  # Пока заглушка
+    # Счётчики поддерживаются инкрементально: по одной строке на платформу
+    device_count = PlatformStatsService.get_platform(db, platform_id)["device_count"]
+    sms_count = SMSQuotaService.get_platform_usage(db, platform_id)
     
     limits_info = {
         "platform_id": platform_id,
@@ -475,47 +518,47 @@ def get_platform_limits(
             "current": sms_count,
             "limit": platform.sms_limit,
             "available": platform.sms_limit - sms_count if platform.sms_limit else None,
-            "usage_percentage": (sms_count / platform.sms_limit * 100) if platform.sms_limit else None
+            "usage_percentage": (sms_count / platform.sms_limit * 100) if platform.sms_limit else None,
+            "period_start": SMSQuotaService.period_start().isoformat(),
         }
     }
     
     return limits_info
 
+def _collect_platform_stats(db: Session, platform_id: int) -> Any:
+    """Запросы к БД для статистики платформы (выполняются в threadpool)"""
+    platform = db.query(Platform).filter(Platform.id == platform_id).first()
+    if not platform:
+        return None
+    # Счётчики поддерживаются инкрементально (PlatformStatsService) - чтение одной строки
+    counters = PlatformStatsService.get_platform(db, platform_id)
+    latest_alert_at = counters["latest_alert_at"]
+    return {
+        "created_at": platform.created_at,
+        "total_devices": counters["device_count"],
+        "active_alerts": counters["firing_alerts"],
+        "resolved_alerts": counters["resolved_alerts"],
+        "latest_alert_time": latest_alert_at.isoformat() if latest_alert_at else "N/A",
+    }
+
 @router.get("/{platform_id}/stats", summary="Получить статистику по платформе", tags=["Platforms"])
-def get_platform_stats(
+async def get_platform_stats(
     platform_id: int,
     db: Session = Depends(get_db),
     user: User = Depends(get_current_user)
 ):
     """Получить статистику по платформе."""
-    platform = db.query(Platform).filter(Platform.id == platform_id).first()
-    if not platform:
+    # Запросы к БД синхронные - выполняем их вне event loop
+    stats = await run_in_threadpool(_collect_platform_stats, db, platform_id)
+    if stats is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Платформа не найдена"
         )
-    # Количество устройств в платформе
-    total_devices = db.query(Device).filter(Device.platform_id == platform_id).count()
-    # Количество активных и решенных алертов для платформы
-    device_ids = db.query(Device.id).filter(Device.platform_id == platform_id).subquery()
-    active_alerts = db.query(Log).filter(
-        Log.level == "alert",
-        Log.status == "firing",
-        Log.device_id.in_(device_ids)
-    ).count()
-    resolved_alerts = db.query(Log).filter(
-        Log.level == "alert",
-        Log.status == "resolved",
-        Log.device_id.in_(device_ids)
-    ).count()
-    latest_alert_log = db.query(Log).filter(
-        Log.level == "alert",
-        Log.device_id.in_(device_ids)
-    ).order_by(Log.created_at.desc()).first()
-    latest_alert_time = latest_alert_log.created_at.isoformat() if latest_alert_log else "N/A"
     # Uptime платформы (с момента создания)
-    now = datetime.now(tz=platform.created_at.tzinfo)
-    platform_age = now - platform.created_at
+    created_at = stats["created_at"]
+    now = datetime.now(tz=created_at.tzinfo)
+    platform_age = now - created_at
     days = platform_age.days
     hours = platform_age.seconds // 3600
     minutes = (platform_age.seconds % 3600) // 60
@@ -528,35 +571,21 @@ def get_platform_stats(
         uptime_parts.append(f"{minutes}м")
     uptime_str = " ".join(uptime_parts)
 
-    # Проверка статуса SMS шлюза (аналогично dashboard эндпоинту)
-    try:
-        from app.services.sms_gateway import SMSGateway
-        import aiohttp
-        import asyncio
-        
-        async def check_sms_gateway():
-            sms_gateway = SMSGateway()
-            try:
-                async with aiohttp.ClientSession() as session:
-                    headers = {"Authorization": f"{sms_gateway.api_key}"}
-                    async with session.get(f"{sms_gateway.base_url}/sms", headers=headers) as resp:
-                        return 'Подключен' if resp.status == 200 else 'Ошибка'
-            except Exception:
-                return 'Ошибка'
-        
-        sms_status = asyncio.run(check_sms_gateway())
-    except Exception:
-        sms_status = 'Ошибка'
+    # Статус SMS шлюза из кэша фонового мониторинга (аналогично dashboard эндпоинту)
+    from app.services.sms_gateway_health import sms_gateway_health
+    sms_health = sms_gateway_health.get_state()
 
     return {
         "uptime": uptime_str,
-        "totalDevices": total_devices,
-        "activeAlerts": active_alerts,
-        "resolvedAlerts": resolved_alerts,
-        "latestAlert": latest_alert_time,
+        "totalDevices": stats["total_devices"],
+        "activeAlerts": stats["active_alerts"],
+        "resolvedAlerts": stats["resolved_alerts"],
+        "latestAlert": stats["latest_alert_time"],
         "dbStatus": "Онлайн",
         "dbConnections": 5,
         "apiStatus": "Онлайн",  # Если endpoint работает, backend жив
         "telegramStatus": "Подключен",
-        "smsStatus": sms_status
+        "smsStatus": sms_health["status"],
+        "smsLatencyMs": sms_health["latency_ms"],
+        "smsLastError": sms_health["last_error"],
     }
@@ -6,8 +6,10 @@ from app.db.session import get_db
 from app.core.auth import get_password_hash, get_current_user
 from datetime import datetime
 import logging
-from app.utils.audit import log_audit
+from app.core.audit import log_audit
 from app.models.platform_user import PlatformUser
+from app.services.user_cache import invalidate_user
+from app.services.platform_role_cache import invalidate_platform_roles
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -68,11 +70,16 @@ def update_user(
     if db_user.id != current_user.id and current_user.role != "superadmin":
         raise HTTPException(status_code=403, detail="Not enough permissions")
     update_data = user.dict(exclude_unset=True)
+    if update_data.get("is_active") is False and db_user.is_active:
+        # Деактивация отзывает все выданные токены пользователя
+        db_user.token_version = (db_user.token_version or 0) + 1
     for key, value in update_data.items():
         setattr(db_user, key, value)
     db_user.updated_at = datetime.utcnow()
     db.commit()
     db.refresh(db_user)
+    invalidate_user(db_user.id)
+    invalidate_platform_roles(db_user.id, db)
     log_audit(db, user_id=current_user.id, action="update_user", platform_id=None, details=f"Обновлен пользователь {db_user.email}")
     logger.info(f"User updated: {db_user.email}")
     return db_user
@@ -92,4 +99,6 @@ def delete_user(
     log_audit(db, user_id=current_user.id, action="delete_user", platform_id=None, details=f"Удален пользователь {db_user.email}")
     db.delete(db_user)
     db.commit()
+    invalidate_user(user_id)
+    invalidate_platform_roles(user_id, db)
     logger.info(f"User deleted: {db_user.email}") 
\ No newline at end of file
@@ -14,7 +14,7 @@ router = APIRouter()
 logger = logging.getLogger(__name__)
 
 @router.get("/", summary="Проверка состояния сервиса")
-async def health_check(db: Session = Depends(get_db)):
+def health_check(db: Session = Depends(get_db)):
     """
     Проверяет состояние сервиса, включая доступность базы данных.
     """
@@ -59,3 +59,74 @@ async def get_version():
     }
     
     return JSONResponse(version_info)
+
+@router.get("/sms-poller", summary="Метрики опроса SMS шлюза")
+async def get_sms_poller_metrics():
+    """
+    Возвращает метрики планировщика опроса SMS-шлюза: задержку опроса,
+    глубину очереди на шлюзе, ошибки и текущий интервал.
+    """
+    from app.services.sms_poll_scheduler import sms_poll_scheduler
+    return JSONResponse(sms_poll_scheduler.get_metrics())
+
+
+@router.get("/db-pool", summary="Метрики пула соединений с БД")
+def get_db_pool_metrics():
+    """
+    Возвращает состояние пула соединений: занятые соединения, overflow,
+    время ожидания соединения и количество медленных запросов.
+    """
+    from app.db.session import get_pool_stats
+    return JSONResponse(get_pool_stats())
+
+
+@router.get("/sms-gateway", summary="Состояние SMS шлюза")
+async def get_sms_gateway_health():
+    """
+    Возвращает последний результат фоновой проверки SMS-шлюза: статус,
+    задержку, последнюю ошибку и время проверки.
+    """
+    from app.services.sms_gateway_health import sms_gateway_health
+    return JSONResponse(sms_gateway_health.get_state())
+
+@router.get("/user-cache", summary="Метрики кэша пользователей")
+def get_user_cache_metrics():
+    """
+    Возвращает метрики кэша пользователей get_current_user: размер,
+    попадания и промахи, а также состояние рассылки инвалидаций между
+    воркерами.
+    """
+    from app.services.user_cache import user_cache
+    from app.services.cache_invalidation import cache_invalidation
+    return JSONResponse({**user_cache.get_metrics(), "invalidation": cache_invalidation.get_metrics()})
+
+
+@router.get("/webhook-inbox", summary="Метрики очереди вебхуков Grafana")
+def get_webhook_inbox_metrics(db: Session = Depends(get_db)):
+    """
+    Возвращает глубину очереди принятых вебхуков Grafana, возраст самого
+    старого необработанного вебхука, задержку обработки и число объединённых
+    повторных доставок.
+    """
+    from app.services.webhook_inbox import webhook_inbox
+    return JSONResponse(webhook_inbox.get_metrics(db))
+
+
+@router.get("/event-bus", summary="Метрики шины событий /ws")
+async def get_event_bus_metrics():
+    """
+    Возвращает метрики шины событий push-канала: число подключённых
+    клиентов, опубликованные, доставленные и отброшенные события.
+    """
+    from app.services.event_bus import event_bus
+    return JSONResponse(event_bus.get_metrics())
+
+
+@router.get("/audit-writer", summary="Метрики записи журнала аудита")
+def get_audit_writer_metrics():
+    """
+    Возвращает состояние буфера журнала аудита: записей в очереди,
+    записано, отброшено и число синхронных записей из-за переполнения.
+    """
+    from app.services.audit_writer import audit_writer
+    return JSONResponse(audit_writer.get_metrics())
@@ -1,6 +1,8 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from typing import List, Optional
+from datetime import datetime
 
 from app.core.database import get_db
 from app.schemas.log import LogCreate, LogResponse
@@ -9,11 +11,39 @@ from app.services.log import LogService
 router = APIRouter()
 
 @router.get("/", response_model=List[LogResponse])
-async def get_logs(db: Session = Depends(get_db), level: Optional[str] = None, platform_id: Optional[int] = None):
-    """Get all logs, optionally filtered by level and platform_id."""
-    return await LogService.get_logs(db, level=level, platform_id=platform_id)
+def get_logs(
+    response: Response,
+    db: Session = Depends(get_db),
+    level: Optional[str] = None,
+    status: Optional[str] = None,
+    device_id: Optional[int] = None,
+    platform_id: Optional[int] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    cursor: Optional[str] = Query(None, description="Курсор из заголовка X-Next-Cursor предыдущей страницы"),
+    limit: int = Query(100, ge=1, le=1000),
+    format: Optional[str] = Query(None, description="ndjson - потоковая выгрузка всех записей"),
+):
+    """
+    Get logs page by page (keyset pagination by created_at, id).
+    The cursor of the next page is returned in the X-Next-Cursor header.
+    """
+    filters = dict(
+        level=level, status=status, device_id=device_id, platform_id=platform_id,
+        start_date=start_date, end_date=end_date,
+    )
+    if format == "ndjson":
+        return StreamingResponse(LogService.iter_logs_ndjson(**filters), media_type="application/x-ndjson")
+
+    try:
+        items, next_cursor = LogService.get_logs_page(db, cursor=cursor, limit=limit, **filters)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return items
 
 @router.post("/", response_model=LogResponse)
-async def create_log(log: LogCreate, db: Session = Depends(get_db)):
+def create_log(log: LogCreate, db: Session = Depends(get_db)):
     """Create a new log entry."""
-    return await LogService.create_log(db, log) 
\ No newline at end of file
+    return LogService.create_log(db, log)
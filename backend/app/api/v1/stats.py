@@ -1,19 +1,31 @@
 from fastapi import APIRouter, Depends, Request
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from app.core.database import get_db
-from app.models import Device, Log # Убедитесь, что Log импортирован из app.models
+from app.services.platform_stats_service import PlatformStatsService
 from datetime import datetime, timedelta
 from app.core.auth import get_current_user # Добавил импорт get_current_user
 from app.models.user import User # Добавил импорт User
-from app.services.sms_gateway import SMSGateway
-import asyncio
-import aiohttp
+from app.services.sms_gateway_health import sms_gateway_health
 import logging
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+def _collect_dashboard_counts(db: Session) -> dict:
+    """Запросы к БД для дашборда (выполняются в threadpool)"""
+    # Счётчики устройств и алертов поддерживаются инкрементально по платформам
+    # (PlatformStatsService), поэтому здесь только сумма по таблице platform_stats
+    totals = PlatformStatsService.get_totals(db)
+    latest_alert_at = totals["latest_alert_at"]
+    return {
+        "total_devices": totals["device_count"],
+        "active_alerts": totals["firing_alerts"],
+        "resolved_alerts": totals["resolved_alerts"],
+        "latest_alert_time": latest_alert_at.isoformat() if latest_alert_at else "N/A",
+    }
+
 @router.get("/dashboard")
 async def get_dashboard_stats(
     request: Request,
@@ -39,42 +51,26 @@ async def get_dashboard_stats(
     
     uptime_str = " ".join(uptime_parts)
 
-    # Количество устройств
-    total_devices = db.query(Device).count()
-
-    # Количество активных и решенных алертов
-    # Предполагаем, что алерты хранятся в модели Log с level='alert'
-    # и статусами 'firing' (активные) и 'resolved' (решенные)
-    active_alerts = db.query(Log).filter(Log.level == "alert", Log.status == "firing").count()
-    resolved_alerts = db.query(Log).filter(Log.level == "alert", Log.status == "resolved").count()
-    latest_alert_log = db.query(Log).filter(Log.level == "alert").order_by(Log.created_at.desc()).first()
-    latest_alert_time = latest_alert_log.created_at.isoformat() if latest_alert_log else "N/A"
+    # Запросы к БД синхронные - выполняем их вне event loop
+    counts = await run_in_threadpool(_collect_dashboard_counts, db)
 
     # Статус БД (заглушка: в реальной системе нужна более сложная проверка)
     db_connections = 5 # Примерное количество соединений
 
-    # Проверка статуса SMS шлюза
-    sms_gateway = SMSGateway()
-    try:
-        # Пробуем отправить тестовый запрос к реальному эндпоинту SMS шлюза с авторизацией
-        async with aiohttp.ClientSession() as session:
-            headers = {"Authorization": f"{sms_gateway.api_key}"}
-            async with session.get(f"{sms_gateway.base_url}/sms", headers=headers) as resp:
-                sms_status = 'Подключен' if resp.status == 200 else 'Ошибка'
-                logger.info(f"SMS шлюз статус: {resp.status}, ответ: {sms_status}")
-    except Exception as e:
-        logger.error(f"Ошибка проверки статуса SMS шлюза: {e}")
-        sms_status = 'Ошибка'
+    # Статус SMS шлюза из кэша фонового мониторинга (без запроса к шлюзу)
+    sms_health = sms_gateway_health.get_state()
 
     return {
         "uptime": uptime_str,
-        "totalDevices": total_devices,
-        "activeAlerts": active_alerts,
-        "resolvedAlerts": resolved_alerts,
-        "latestAlert": latest_alert_time,
+        "totalDevices": counts["total_devices"],
+        "activeAlerts": counts["active_alerts"],
+        "resolvedAlerts": counts["resolved_alerts"],
+        "latestAlert": counts["latest_alert_time"],
         "dbStatus": "Онлайн", # Или количество соединений
         "dbConnections": db_connections,
         "apiStatus": "Онлайн", # Заглушка
         "telegramStatus": "Подключен", # Заглушка
-        "smsStatus": sms_status
+        "smsStatus": sms_health["status"],
+        "smsLatencyMs": sms_health["latency_ms"],
+        "smsLastError": sms_health["last_error"],
     }
@@ -0,0 +1,144 @@
+import asyncio
+import json
+import logging
+from typing import Optional, Set, Tuple
+
+from fastapi import APIRouter, HTTPException, Query, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
+from jose import JWTError, jwt
+
+from app.core.auth import ALGORITHM, SECRET_KEY
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.user import User
+from app.services.cache_invalidation import cache_invalidation
+from app.services.event_bus import Subscription, event_bus
+from app.services.platform_role_cache import platform_role_cache
+from app.services.user_cache import load_current_user
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# Код закрытия WebSocket при ошибке авторизации (диапазон 4000-4999 - коды приложения)
+WS_CLOSE_UNAUTHORIZED = 4401
+
+# Роли или учётную запись изменили в другом воркере: перепроверить доступ открытых соединений
+for _cache in ("platform_roles", "user"):
+    cache_invalidation.register(_cache, lambda key: event_bus.revalidate(None if key is None else int(key)))
+
+def _decode_token(token: Optional[str]) -> Optional[Tuple[int, int]]:
+    """id пользователя и версия токена из JWT"""
+    if not token:
+        return None
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        user_id = payload.get("sub")
+        if user_id is None:
+            return None
+        return int(user_id), payload.get("ver", 0)
+    except (JWTError, ValueError) as e:
+        logger.info(f"WebSocket: отказ в авторизации: {e}")
+        return None
+
+def _load_access(user_id: int, token_version: int) -> Optional[Tuple[User, Set[int]]]:
+    """Активный пользователь и платформы, в которых у него есть роль"""
+    db = SessionLocal()
+    try:
+        user = load_current_user(db, user_id, token_version)
+        if not user or not user.is_active:
+            return None
+        roles = platform_role_cache.get(db, user.id)
+    except HTTPException as e:
+        logger.info(f"WebSocket: отказ в авторизации пользователя {user_id}: {e.detail}")
+        return None
+    finally:
+        db.close()
+    return user, set(roles["platforms"]) if roles else set()
+
+async def _send_events(websocket: WebSocket, subscription: Subscription) -> None:
+    while True:
+        try:
+            event = await asyncio.wait_for(subscription.queue.get(), timeout=settings.WS_PING_INTERVAL)
+        except asyncio.TimeoutError:
+            event = {"type": "ping"}
+        await websocket.send_text(json.dumps(event, default=str))
+
+async def _recheck_access(websocket: WebSocket, subscription: Subscription, token_version: int) -> None:
+    """
+    Доступ перепроверяется раз в WS_ACCESS_RECHECK_INTERVAL и сразу после
+    инвалидации ролей или учётной записи: удалённый из платформы пользователь
+    перестаёт получать её события, деактивированный - отключается.
+    """
+    while True:
+        try:
+            await asyncio.wait_for(subscription.recheck.wait(), timeout=settings.WS_ACCESS_RECHECK_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+        subscription.recheck.clear()
+        access = await run_in_threadpool(_load_access, subscription.user_id, token_version)
+        if access is None:
+            logger.info(f"WebSocket пользователя {subscription.user_id}: доступ отозван, соединение закрывается")
+            await websocket.close(code=WS_CLOSE_UNAUTHORIZED)
+            return
+        user, platform_ids = access
+        subscription.update_access(user.role == "superadmin", platform_ids)
+
+async def _receive_commands(websocket: WebSocket, subscription: Subscription) -> None:
+    """Команды клиента: {"action": "subscribe", "platform_ids": [1, 2]} или platform_ids = null"""
+    while True:
+        message = await websocket.receive_json()
+        if not isinstance(message, dict):
+            continue
+        if message.get("action") == "subscribe":
+            platform_ids = message.get("platform_ids")
+            try:
+                platforms = subscription.set_platforms(
+                    None if platform_ids is None else [int(platform_id) for platform_id in platform_ids]
+                )
+            except (TypeError, ValueError):
+                await websocket.send_json({"type": "error", "data": {"detail": "platform_ids должен быть списком id"}})
+                continue
+            await websocket.send_json({
+                "type": "subscribed",
+                "data": {"platform_ids": sorted(platforms) if platforms is not None else None},
+            })
+        elif message.get("action") == "ping":
+            await websocket.send_json({"type": "pong"})
+
+@router.websocket("/ws")
+async def websocket_endpoint(websocket: WebSocket, token: Optional[str] = Query(None)):
+    """
+    Push-канал событий: алерты, уведомления, статусы команд и входящие SMS.
+    Токен передаётся в параметре ?token=<JWT>. По умолчанию клиент получает
+    события всех своих платформ и адресованные ему лично.
+    """
+    identity = _decode_token(token)
+    auth = await run_in_threadpool(_load_access, *identity) if identity is not None else None
+    if auth is None:
+        await websocket.close(code=WS_CLOSE_UNAUTHORIZED)
+        return
+    user, platform_ids = auth
+
+    await websocket.accept()
+    subscription = event_bus.subscribe(user.id, user.role == "superadmin", platform_ids)
+    await websocket.send_json({
+        "type": "subscribed",
+        "data": {"user_id": user.id, "platform_ids": None if user.role == "superadmin" else sorted(platform_ids)},
+    })
+    tasks = [
+        asyncio.create_task(_send_events(websocket, subscription)),
+        asyncio.create_task(_receive_commands(websocket, subscription)),
+        asyncio.create_task(_recheck_access(websocket, subscription, identity[1])),
+    ]
+    try:
+        done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            error = task.exception()
+            if error and not isinstance(error, WebSocketDisconnect):
+                logger.warning(f"WebSocket пользователя {user.id} закрыт с ошибкой: {error}")
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        event_bus.unsubscribe(subscription)
@@ -1,13 +1,67 @@
-from app.models.audit_log import AuditLog
+import logging
+from datetime import datetime, timezone
+from typing import Optional
+
 from sqlalchemy.orm import Session
 
-def log_audit(db: Session, action: str, user_id: int, platform_id: int = None, device_id: int = None, details: str = None):
-    log = AuditLog(
-        action=action,
-        user_id=user_id,
-        platform_id=platform_id,
-        device_id=device_id,
-        details=details
-    )
-    db.add(log)
-    db.commit() 
\ No newline at end of file
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.audit_log import AuditLog
+from app.services.audit_writer import audit_writer
+
+logger = logging.getLogger(__name__)
+
+# Действия, которые записываются сразу (синхронно), даже при AUDIT_ASYNC
+SECURITY_ACTIONS = frozenset({
+    "create_user",
+    "update_user",
+    "delete_user",
+    "add_user_to_platform",
+    "update_platform_user_role",
+    "remove_user_from_platform",
+    "delete_platform",
+})
+
+def log_audit(
+    db: Optional[Session] = None,
+    action: str = None,
+    user_id: Optional[int] = None,
+    platform_id: Optional[int] = None,
+    device_id: Optional[int] = None,
+    details: Optional[str] = None,
+    ip_address: Optional[str] = None,
+    sync: bool = False,
+) -> Optional[AuditLog]:
+    """
+    Единая точка записи в журнал аудита.
+
+    По умолчанию запись ставится в буфер audit_writer и пишется в фоне пачкой,
+    без commit в транзакции запроса; возвращается None. Действия из
+    SECURITY_ACTIONS, sync=True, AUDIT_ASYNC=False или переполненный буфер -
+    запись сразу через db (commit) или через отдельную сессию, если db не
+    передана; возвращается созданная запись.
+    """
+    entry = {
+        "action": action,
+        "user_id": user_id,
+        "platform_id": platform_id,
+        "device_id": device_id,
+        "details": details,
+        "ip_address": ip_address,
+        "timestamp": datetime.now(timezone.utc),
+    }
+    if not sync and settings.AUDIT_ASYNC and action not in SECURITY_ACTIONS and audit_writer.put(entry):
+        return None
+
+    log = AuditLog(**entry)
+    own_session = db is None
+    if own_session:
+        db = SessionLocal()
+    try:
+        db.add(log)
+        db.commit()
+        db.refresh(log)
+    finally:
+        if own_session:
+            db.close()
+    return log
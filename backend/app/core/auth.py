@@ -10,6 +10,7 @@ from passlib.context import CryptContext
 import logging
 import sys
 from app.core.config import settings
+from app.services.user_cache import load_current_user
 
 logger = logging.getLogger(__name__)
 
@@ -64,6 +65,7 @@ def authenticate_user(db: Session, username: str, password: str):
 def create_access_token(data: dict, expires_delta: timedelta = None) -> str:
     """Создание JWT токена с возможностью задать время истечения"""
     to_encode = data.copy()
+    to_encode.setdefault("ver", 0)  # Версия токена пользователя (users.token_version)
     
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
@@ -95,7 +97,8 @@ def get_current_user(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Invalid token: User ID missing",
             )
-        user = db.query(User).filter(User.id == user_id).first()
+        # Пользователь из кэша (ключ - id и версия токена), в БД - только при промахе
+        user = load_current_user(db, int(user_id), payload.get("ver", 0))
         if not user:
             logger.warning(f"User not found for ID: {user_id}")
             raise HTTPException(
@@ -104,6 +107,8 @@ def get_current_user(
             )
         logger.info(f"Successfully retrieved user: {user.id}")
         return user
+    except HTTPException:
+        raise
     except JWTError as e:
         logger.error(f"JWT error during token decoding/validation: {e}")
         raise HTTPException(
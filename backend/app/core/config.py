@@ -20,6 +20,15 @@ class Settings(BaseSettings):
     POSTGRES_DB: str
     POSTGRES_USER: str
     POSTGRES_PASSWORD: str
+
+    # Настройки пула соединений с БД
+    # Итоговое число соединений: (DB_POOL_SIZE + DB_MAX_OVERFLOW) * количество воркеров gunicorn
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: int = 30 # Ожидание свободного соединения (секунды)
+    DB_POOL_RECYCLE: int = 1800 # Пересоздавать соединения старше (секунды)
+    DB_STATEMENT_TIMEOUT_MS: int = 30000 # statement_timeout для Postgres (0 - без ограничения)
+    DB_SLOW_QUERY_MS: int = 500 # Порог логирования медленных запросов
     
     # Настройки Redis
     REDIS_URL: str = "redis://redis:6379/0"
@@ -28,6 +37,16 @@ class Settings(BaseSettings):
     REDIS_DB: Optional[str] = None
     REDIS_PASSWORD: Optional[str] = None
 
+    # Кэш пользователей для get_current_user
+    USER_CACHE_BACKEND: str = "memory" # memory - в процессе, redis - общий для воркеров
+    USER_CACHE_TTL: int = 60 # Время жизни записи (секунды), 0 - кэш выключен
+    USER_CACHE_MAX_SIZE: int = 10000 # Максимум записей в локальном кэше
+    CACHE_INVALIDATION_CHANNEL: str = "remosa_cache_invalidation" # Канал Postgres LISTEN/NOTIFY: сброс локальных кэшей на всех воркерах
+    PLATFORM_ROLE_CACHE_TTL: int = 60 # Время жизни карты ролей в платформах (секунды), 0 - только в рамках запроса
+    PLATFORM_ROLE_CACHE_MAX_SIZE: int = 10000 # Максимум пользователей в локальном кэше ролей
+    DEVICE_PHONE_CACHE_TTL: int = 300 # Период полной перезагрузки карты номер -> устройство (секунды)
+    COMMAND_TEMPLATE_CACHE_TTL: int = 300 # Период полной перезагрузки реестра шаблонов команд (секунды)
+
     # Настройки бэкенда
     BACKEND_HOST: str = "0.0.0.0"
     BACKEND_PORT: str = "8000"
@@ -49,11 +68,56 @@ class Settings(BaseSettings):
     NODE_ENV: str = "production"
     GENERATE_SOURCEMAP: str = "false"
 
+    # Push-канал /ws и шина событий
+    EVENT_BUS_BACKEND: str = "memory" # memory - в процессе, redis - pub/sub между воркерами gunicorn
+    EVENT_BUS_CHANNEL: str = "remosa:events" # Канал Redis pub/sub
+    WS_QUEUE_SIZE: int = 200 # Очередь событий одного клиента (старые отбрасываются при переполнении)
+    WS_PING_INTERVAL: int = 25 # Интервал ping при отсутствии событий (секунды)
+    WS_ACCESS_RECHECK_INTERVAL: int = 60 # Перепроверка доступа открытых соединений (секунды)
+
     # Настройки SMS шлюза
     SMS_SENDER_ID: Optional[str] = "REMOSA"
     SMS_GATEWAY_URL: Optional[str] = None
     SMS_GATEWAY_API_KEY: Optional[str] = None
     SMS_GATEWAY_PHONE_FORMAT: str = "+7XXXXXXXXXX"
+    SMS_GATEWAY_MAX_CONCURRENCY: int = 10 # Одновременных запросов к SMS шлюзу
+    SMS_INGEST_BATCH_SIZE: int = 1000 # Размер пачки при сохранении входящих SMS
+    SMS_GATEWAY_HEALTH_PATH: str = "/" # Путь для проверки доступности шлюза (HEAD, без побочных эффектов)
+    SMS_GATEWAY_HEALTH_INTERVAL: int = 30 # Интервал фоновой проверки шлюза (секунды)
+    SMS_GATEWAY_HEALTH_TIMEOUT: float = 5.0 # Таймаут проверки шлюза (секунды)
+    SMS_QUOTA_PERIOD: str = "month" # Период квот Platform.sms_limit и UserLimits.max_sms_messages: day или month (UTC)
+    SMS_RATE_LIMIT_PER_MINUTE: int = 0 # Ограничение скорости отправки на платформу (token bucket в процессе), 0 - выключено
+    COMMAND_BULK_MAX_DEVICES: int = 5000 # Максимум устройств в одном задании /commands/execute-bulk
+
+    # Объединение SMS по алертам и подавление флапающих алертов
+    ALERT_SMS_COALESCE_WINDOW: int = 30 # Задержка SMS по алерту для объединения с последующими (секунды), 0 - без задержки
+    ALERT_SMS_MAX_LENGTH: int = 480 # Максимальная длина объединённого SMS
+    ALERT_FLAP_WINDOW: int = 600 # Окно подсчёта срабатываний одного алерта на устройстве (секунды)
+    ALERT_FLAP_THRESHOLD: int = 3 # Срабатываний в окне, начиная с которого SMS подавляется, 0 - выключено
+
+    # Уведомления участникам платформы о новых алертах
+    ALERT_NOTIFY_PLATFORM_USERS: bool = True # Одно уведомление на платформу за вебхук каждому её участнику
+    ALERT_NOTIFY_MAX_NAMES: int = 10 # Сколько названий алертов перечислять в уведомлении
+
+    # Настройки адаптивного опроса SMS шлюза (секунды)
+    SMS_POLL_BASE_INTERVAL: int = 60 # Базовый интервал опроса
+    SMS_POLL_MAX_INTERVAL: int = 300 # Максимальный интервал при простое или ошибках
+    SMS_POLL_FAST_INTERVAL: int = 5 # Интервал в режиме частого опроса
+    SMS_POLL_FAST_WINDOW: int = 120 # Длительность частого опроса после отправки команды
+    SMS_POLL_JITTER: float = 0.1 # Случайный разброс интервала (доля)
+
+    # Настройки общего HTTP-пула (aiohttp)
+    HTTP_POOL_LIMIT: int = 100 # Всего соединений в пуле
+    HTTP_POOL_LIMIT_PER_HOST: int = 20 # Соединений на один хост
+    HTTP_KEEPALIVE_TIMEOUT: float = 30.0 # Время жизни простаивающего соединения
+    HTTP_TIMEOUT: float = 30.0 # Общий таймаут запроса
+    HTTP_CONNECT_TIMEOUT: float = 10.0 # Таймаут установки соединения
+
+    # Интервал сверки счётчиков дашборда с таблицами devices/alerts (секунды)
+    PLATFORM_STATS_RECONCILE_INTERVAL: int = 600
+
+    # Размер threadpool для синхронных обработчиков (sync SQLAlchemy)
+    THREADPOOL_SIZE: int = 40
 
     # Настройки логирования
     LOG_LEVEL: str = "INFO"
@@ -82,6 +146,32 @@ class Settings(BaseSettings):
     MAX_RETRY_ATTEMPTS: int = 3
     ALERT_TIMEOUT_SECONDS: int = 300
     SMS_QUEUE_TIMEOUT: int = 60
+    SMS_QUEUE_WORKERS: int = 4 # Количество воркеров очереди исходящих SMS
+    SMS_QUEUE_POLL_INTERVAL: float = 5.0 # Интервал проверки очереди при простое (секунды)
+    SMS_QUEUE_RETRY_BASE_DELAY: int = 10 # Базовая задержка повтора отправки (секунды, удваивается)
+
+    # Асинхронный приём вебхуков Grafana (202 + фоновая обработка)
+    WEBHOOK_ASYNC_PROCESSING: bool = True # False - обрабатывать вебхук в запросе, как раньше
+    WEBHOOK_INBOX_WORKERS: int = 2 # Количество воркеров обработки вебхуков
+    WEBHOOK_INBOX_POLL_INTERVAL: float = 5.0 # Интервал проверки очереди при простое (секунды)
+    WEBHOOK_INBOX_RETRY_BASE_DELAY: int = 5 # Базовая задержка повтора обработки (секунды, удваивается)
+    WEBHOOK_INBOX_MAX_ATTEMPTS: int = 5 # После стольких неудачных попыток вебхук помечается failed
+    WEBHOOK_INBOX_LOCK_TIMEOUT: int = 300 # Через сколько секунд 'processing' считается зависшим
+    WEBHOOK_INBOX_RETENTION_DAYS: int = 7 # Сколько хранить обработанные вебхуки
+
+    # Секционирование таблицы logs по месяцам, хранение и архивирование
+    LOGS_PARTITIONS_AHEAD: int = 2 # Сколько будущих месячных секций создавать заранее
+    LOGS_RETENTION_MONTHS: int = 0 # Сколько полных месяцев хранить в БД, 0 - хранить всё (вывод секций включается явно)
+    LOGS_EXPIRED_PARTITION_ACTION: str = "detach" # detach - только отсоединить устаревшую секцию, drop - удалить
+    LOGS_ARCHIVE_DIR: Optional[str] = "/app/archive/logs" # Куда выгружать секцию (csv.gz) перед удалением, пусто - без архива
+    LOGS_ARCHIVE_REQUIRE_MOUNT: bool = True # drop только если LOGS_ARCHIVE_DIR на смонтированном томе, иначе detach
+    LOGS_MAINTENANCE_INTERVAL: int = 21600 # Интервал обслуживания секций logs (секунды)
+
+    # Пакетная запись журнала аудита
+    AUDIT_ASYNC: bool = True # False - каждая запись сразу в транзакции запроса, как раньше
+    AUDIT_QUEUE_SIZE: int = 10000 # Буфер записей в памяти; при переполнении запись идёт синхронно
+    AUDIT_BATCH_SIZE: int = 500 # Записей в одном INSERT; при наборе пачки запись не ждёт таймера
+    AUDIT_FLUSH_INTERVAL: float = 1.0 # Максимальная задержка записи из буфера (секунды)
 
     # Настройки Python
     PYTHONPATH: Optional[str] = "/app"
@@ -4,6 +4,7 @@ from app.db.session import get_db
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
 from app.core.config import settings
+from app.services.user_cache import load_current_user
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 
@@ -11,9 +12,10 @@ def get_current_user_id(token: str = Depends(oauth2_scheme), db=Depends(get_db))
     try:
         payload = jwt.decode(token, settings.JWT_SECRET_KEY, algorithms=["HS256"])
         user_id: int = int(payload.get("sub"))
-    except (JWTError, ValueError):
+        token_version: int = int(payload.get("ver", 0))
+    except (JWTError, ValueError, TypeError):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Could not validate credentials")
-    user = db.query(User).filter(User.id == user_id).first()
+    user = load_current_user(db, user_id, token_version)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     return user.id
@@ -22,9 +24,10 @@ def get_current_user(token: str = Depends(oauth2_scheme), db=Depends(get_db)) ->
     try:
         payload = jwt.decode(token, settings.JWT_SECRET_KEY, algorithms=["HS256"])
         user_id: int = int(payload.get("sub"))
-    except (JWTError, ValueError):
+        token_version: int = int(payload.get("ver", 0))
+    except (JWTError, ValueError, TypeError):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Could not validate credentials")
-    user = db.query(User).filter(User.id == user_id).first()
+    user = load_current_user(db, user_id, token_version)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     return user 
\ No newline at end of file
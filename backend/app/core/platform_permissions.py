@@ -1,20 +1,24 @@
+from typing import Optional
 from fastapi import Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from app.db.session import get_db
-from app.models.platform_user import PlatformUser
 from app.models.user import User
+from app.services.platform_role_cache import platform_role_cache
 
 def get_current_platform_role(platform_id: int, user_id: int, db: Session = Depends(get_db)):
-    pu = db.query(PlatformUser).filter_by(platform_id=platform_id, user_id=user_id).first()
-    if not pu:
+    role = platform_role_cache.get_platform_role(db, user_id, platform_id)
+    if not role:
         raise HTTPException(status_code=403, detail="Нет доступа к платформе")
-    return pu.role
+    return role
 
-def require_platform_role(platform_id: int, user_id: int, allowed_roles: list[str], db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.id == user_id).first()
-    if user and user.role == 'superadmin':
+def require_platform_role(platform_id: int, user_id: int, allowed_roles: list[str], db: Session = Depends(get_db), user: Optional[User] = None):
+    # Роли берутся из кэша (запрос -> процесс); если передан текущий пользователь
+    # (get_current_user), глобальная роль читается из него без запроса к БД
+    if user is not None and user.role == 'superadmin':
+        return 'superadmin'
+    if platform_role_cache.get_global_role(db, user_id) == 'superadmin':
         return 'superadmin'
     role = get_current_platform_role(platform_id, user_id, db)
     if role not in allowed_roles:
         raise HTTPException(status_code=403, detail="Недостаточно прав")
-    return role 
\ No newline at end of file
+    return role
@@ -7,4 +7,10 @@ from app.models.device import Device # noqa
 from app.models.log import Log # noqa
 from app.models.command_template import CommandTemplate # noqa
 from app.models.alert import Alert # noqa
-from app.models.audit_log import AuditLog # noqa
\ No newline at end of file
+from app.models.audit_log import AuditLog # noqa
+from app.models.sms_outbox import SMSOutbox # noqa
+from app.models.platform_stats import PlatformStats # noqa
+from app.models.grafana_webhook_inbox import GrafanaWebhookInbox # noqa
+from app.models.platform_sms_usage import PlatformSMSUsage # noqa
+from app.models.command_job import CommandJob # noqa
+from app.models.notification_counter import NotificationCounter # noqa
@@ -0,0 +1,99 @@
+import logging
+import threading
+import time
+from collections import deque
+from typing import Dict
+
+from sqlalchemy import event, exc
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
+
+logger = logging.getLogger(__name__)
+
+class PoolMetrics:
+    """Потокобезопасные счётчики пула соединений и медленных запросов"""
+
+    def __init__(self, window: int = 1000):
+        self._lock = threading.Lock()
+        self._waits = deque(maxlen=window)
+        self.checkouts = 0
+        self.checkout_wait_total = 0.0
+        self.checkout_wait_max = 0.0
+        self.checkout_timeouts = 0
+        self.slow_queries = 0
+        self.queries = 0
+
+    def record_checkout(self, wait: float) -> None:
+        with self._lock:
+            self._waits.append(wait)
+            self.checkouts += 1
+            self.checkout_wait_total += wait
+            self.checkout_wait_max = max(self.checkout_wait_max, wait)
+
+    def record_checkout_timeout(self) -> None:
+        with self._lock:
+            self.checkout_timeouts += 1
+
+    def record_query(self, slow: bool) -> None:
+        with self._lock:
+            self.queries += 1
+            if slow:
+                self.slow_queries += 1
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            waits = sorted(self._waits)
+            p99 = waits[min(len(waits) - 1, int(len(waits) * 0.99))] if waits else 0.0
+            return {
+                "checkouts": self.checkouts,
+                "checkout_wait_avg_ms": (self.checkout_wait_total / self.checkouts * 1000) if self.checkouts else 0.0,
+                "checkout_wait_p99_ms": p99 * 1000,
+                "checkout_wait_max_ms": self.checkout_wait_max * 1000,
+                "checkout_timeouts": self.checkout_timeouts,
+                "queries": self.queries,
+                "slow_queries": self.slow_queries,
+            }
+
+pool_metrics = PoolMetrics()
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool, замеряющий время ожидания свободного соединения"""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            pool_metrics.record_checkout_timeout()
+            raise
+        wait = time.perf_counter() - started
+        pool_metrics.record_checkout(wait)
+        if wait > 0.1:
+            logger.warning(f"Ожидание соединения из пула заняло {wait * 1000:.0f}мс ({self.status()})")
+        return connection
+
+def install_slow_query_logging(engine: Engine, threshold_ms: int) -> None:
+    """Логировать запросы дольше threshold_ms и считать их в pool_metrics"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_start_time"].pop()
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        slow = elapsed_ms >= threshold_ms
+        pool_metrics.record_query(slow)
+        if slow:
+            logger.warning(f"Медленный запрос ({elapsed_ms:.0f}мс): {statement[:500]}")
+
+    @event.listens_for(engine, "handle_error")
+    def _handle_error(context):
+        # after_cursor_execute для упавшего запроса не вызывается: снимаем его время старта здесь,
+        # иначе список растёт на всё время жизни соединения и следующие замеры смещаются
+        if context.connection is None or context.execution_context is None:
+            return
+        started = context.connection.info.get("query_start_time")
+        if started:
+            started.pop()
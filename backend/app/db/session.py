@@ -1,10 +1,35 @@
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from app.core.config import settings  # Импортируем настройки
+from app.db.pool_metrics import InstrumentedQueuePool, install_slow_query_logging, pool_metrics
 
 DATABASE_URL = settings.SQLALCHEMY_DATABASE_URI  # Используем URL из настроек
 
-engine = create_engine(DATABASE_URL)
+def create_db_engine(database_url: str = DATABASE_URL):
+    """
+    Единая фабрика движка SQLAlchemy. Параметры пула и таймаут запросов
+    задаются в настройках (DB_POOL_*, DB_STATEMENT_TIMEOUT_MS).
+    Соединение при импорте не открывается.
+    """
+    connect_args = {}
+    if settings.DB_STATEMENT_TIMEOUT_MS:
+        connect_args["options"] = f"-c statement_timeout={settings.DB_STATEMENT_TIMEOUT_MS}"
+
+    db_engine = create_engine(
+        database_url,
+        poolclass=InstrumentedQueuePool,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=True,
+        connect_args=connect_args,
+        echo=(settings.LOG_LEVEL == 'DEBUG')  # Включаем SQL логи только если DEBUG
+    )
+    install_slow_query_logging(db_engine, settings.DB_SLOW_QUERY_MS)
+    return db_engine
+
+engine = create_db_engine()
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 def get_db():
@@ -12,4 +37,16 @@ def get_db():
     try:
         yield db
     finally:
-        db.close() 
\ No newline at end of file
+        db.close()
+
+def get_pool_stats() -> dict:
+    """Текущее состояние пула и накопленные метрики"""
+    pool = engine.pool
+    return {
+        "pool_size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": pool.overflow(),
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        **pool_metrics.snapshot(),
+    }
@@ -5,8 +5,21 @@ from app.core.config import settings
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.api.api import api_router
-from app.services.sms_poller import poll_sms_gateway
+from app.services.sms_poll_scheduler import sms_poll_scheduler
+from app.services.http_client import start_http_session, close_http_session
+from app.services.sms_queue import sms_queue
+from app.services.webhook_inbox import webhook_inbox
+from app.services.open_alert_registry import open_alert_registry
+from app.services.sms_gateway_health import sms_gateway_health
+from app.services.platform_stats_service import reconcile_platform_stats
+from app.services.notification_service import reconcile_notification_counters
+from app.services.event_bus import event_bus
+from app.services.audit_writer import audit_writer
+from app.services.log_partitions import run_log_maintenance
+from app.services.cache_invalidation import cache_invalidation
+from app.api.ws import router as ws_router
 import asyncio
+import anyio
 import logging
 import os
 import sys
@@ -38,15 +51,22 @@ if not any(isinstance(handler, logging.StreamHandler) for handler in root_logger
 # Дублирующиеся определения базы данных удалены для предотвращения конфликтов
 # Используются определения из app.db.session
 
-# Фоновая задача для опроса SMS шлюза
+# Фоновая задача для опроса SMS шлюза (адаптивный интервал, см. SMSPollScheduler)
 async def start_sms_polling_background_task():
+    await sms_poll_scheduler.run()
+
+# Фоновая задача сверки счётчиков дашборда и уведомлений с исходными таблицами
+async def start_stats_reconcile_background_task():
+    while True:
+        await asyncio.to_thread(reconcile_platform_stats)
+        await asyncio.to_thread(reconcile_notification_counters)
+        await asyncio.sleep(settings.PLATFORM_STATS_RECONCILE_INTERVAL)
+
+# Фоновая задача обслуживания месячных секций logs (новые секции, хранение, архив)
+async def start_log_maintenance_background_task():
     while True:
-        try:
-            await poll_sms_gateway()
-            await asyncio.sleep(60) # Опрос каждые 60 секунд
-        except Exception as e:
-            logger.error(f"Ошибка в SMS polling: {e}")
-            await asyncio.sleep(60)  # Ждем перед повторной попыткой
+        await asyncio.to_thread(run_log_maintenance)
+        await asyncio.sleep(settings.LOGS_MAINTENANCE_INTERVAL)
 
 # Определяем lifespan функцию ДО создания приложения FastAPI
 @asynccontextmanager
@@ -61,21 +81,73 @@ async def lifespan(app: FastAPI):
             logger.info(f"Registered route: {route.path} - {list(route.methods)}")
     logger.info("=== КОНЕЦ СПИСКА МАРШРУТОВ ===")
     logger.info(f"Используемый JWT_SECRET_KEY: {settings.JWT_SECRET_KEY[:10]}...")
-    logger.info(f"Database URI: {settings.SQLALCHEMY_DATABASE_URI}")
+    logger.info(f"Database: {settings.POSTGRES_HOST}:{settings.POSTGRES_PORT}/{settings.POSTGRES_DB}")
+
+    # Проверяем подключение к БД при старте (а не при импорте модуля)
+    try:
+        from sqlalchemy import text
+        with engine.connect() as conn:
+            version = conn.execute(text("SELECT version()")).scalar()
+        logger.info(f"DATABASE: Connection successful. PostgreSQL version: {version}")
+    except Exception as e:
+        logger.error(f"DATABASE: Connection failed: {e}")
+        raise
     
+    # Сброс локальных кэшей по уведомлениям других воркеров (LISTEN/NOTIFY)
+    cache_invalidation.start()
+
+    # Синхронные обработчики (запросы к БД) выполняются в threadpool anyio
+    anyio.to_thread.current_default_thread_limiter().total_tokens = settings.THREADPOOL_SIZE
+
+    # Общий HTTP-пул для SMS шлюза и проверок его состояния
+    await start_http_session()
+
+    # Шина событий push-канала /ws (до воркеров, которые публикуют события)
+    await event_bus.start()
+
+    # Пакетная запись журнала аудита
+    await audit_writer.start()
+
+    # Воркеры очереди исходящих SMS
+    logger.info("Запуск воркеров очереди исходящих SMS...")
+    await sms_queue.start()
+
+    # Реестр активных алертов для быстрой обработки повторных firing
+    try:
+        await asyncio.to_thread(open_alert_registry.rebuild)
+    except Exception as e:
+        logger.error(f"Не удалось построить реестр активных алертов: {e}")
+
+    # Воркеры обработки принятых вебхуков Grafana
+    logger.info("Запуск воркеров обработки вебхуков Grafana...")
+    await webhook_inbox.start()
+
     # Запуск фоновой задачи для опроса SMS шлюза
     logger.info("Запуск фоновой задачи опроса SMS шлюза...")
     sms_task = asyncio.create_task(start_sms_polling_background_task())
+    stats_task = asyncio.create_task(start_stats_reconcile_background_task())
+    log_maintenance_task = asyncio.create_task(start_log_maintenance_background_task())
+    # Фоновая проверка доступности SMS шлюза (результат кэшируется для дашбордов)
+    gateway_health_task = asyncio.create_task(sms_gateway_health.run())
     
     yield
     
     # Shutdown
     logger.info("=== ЗАВЕРШЕНИЕ ПРИЛОЖЕНИЯ ===")
     sms_task.cancel()
+    stats_task.cancel()
+    log_maintenance_task.cancel()
+    gateway_health_task.cancel()
     try:
         await sms_task
     except asyncio.CancelledError:
         logger.info("SMS polling task cancelled successfully")
+    await webhook_inbox.stop()
+    await sms_queue.stop()
+    await event_bus.stop()
+    await audit_writer.stop()
+    await close_http_session()
+    await asyncio.to_thread(cache_invalidation.stop)
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
@@ -115,9 +187,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],  # Курсор следующей страницы для keyset-пагинации
 )
 
 app.include_router(api_router, prefix=settings.API_V1_STR)
+# Push-канал событий (WebSocket /ws)
+app.include_router(ws_router)
 
 # Дублированные определения lifespan и start_sms_polling_background_task удалены выше
 
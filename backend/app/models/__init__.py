@@ -9,5 +9,11 @@ from .platform import Platform
 from .platform_user import PlatformUser
 from .audit_log import AuditLog
 from .notification import Notification
+from .sms_outbox import SMSOutbox
+from .platform_stats import PlatformStats
+from .grafana_webhook_inbox import GrafanaWebhookInbox
+from .platform_sms_usage import PlatformSMSUsage
+from .command_job import CommandJob
+from .notification_counter import NotificationCounter
 
-__all__ = ["Device", "DeviceStatus", "Client", "Log", "Alert", "CommandTemplate", "User", "UserLimits", "Platform", "PlatformUser", "AuditLog", "Notification"] 
\ No newline at end of file
+__all__ = ["Device", "DeviceStatus", "Client", "Log", "Alert", "CommandTemplate", "User", "UserLimits", "Platform", "PlatformUser", "AuditLog", "Notification", "SMSOutbox", "PlatformStats", "GrafanaWebhookInbox", "PlatformSMSUsage", "CommandJob", "NotificationCounter"] 
\ No newline at end of file
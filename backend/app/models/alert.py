@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, JSON, Index, text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from sqlalchemy.dialects.postgresql import JSONB
@@ -19,10 +19,24 @@ class Alert(Base):
     response = Column(String, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     updated_at = Column(DateTime(timezone=True), onupdate=func.now(), nullable=True)
+    # Время записи алерта на сервере (created_at - startsAt из Grafana)
+    received_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=True)
     source = Column(String, nullable=False)
     title = Column(String, nullable=False)
     timestamp = Column(DateTime, default=func.now(), nullable=False)
     external_id = Column(String, unique=True, index=True, nullable=True)
     details = Column(JSONB, nullable=True)
     
-    device = relationship("Device", back_populates="alerts") 
\ No newline at end of file
+    device = relationship("Device", back_populates="alerts")
+
+    __table_args__ = (
+        # Поиск активного алерта по ключу (обработка вебхуков Grafana) - только firing
+        Index(
+            "ix_alerts_open_key",
+            "alert_name", "device_id", "grafana_player_id", "created_at",
+            postgresql_where=text("status = 'firing'"),
+        ),
+        Index("ix_alerts_status_created_at", "status", "created_at"),
+        # Подсчёт флаппинга за окно ALERT_FLAP_WINDOW
+        Index("ix_alerts_device_id_alert_name_received_at", "device_id", "alert_name", "received_at"),
+    ) 
\ No newline at end of file
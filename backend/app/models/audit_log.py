@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.db.base_class import Base
@@ -15,3 +15,16 @@ class AuditLog(Base):
     device_id = Column(Integer, ForeignKey("devices.id"), nullable=True)
 
     user = relationship("User")
+
+    __table_args__ = (
+        # Keyset-пагинация журнала (timestamp, id) - общая и в разрезе платформы, устройства, пользователя
+        Index("ix_audit_logs_timestamp_id", "timestamp", "id"),
+        Index("ix_audit_logs_platform_id_timestamp_id", "platform_id", "timestamp", "id"),
+        Index("ix_audit_logs_device_id_timestamp_id", "device_id", "timestamp", "id"),
+        Index("ix_audit_logs_user_id_timestamp_id", "user_id", "timestamp", "id"),
+        # Поиск подстроки в action (ILIKE '%...%') - триграммы pg_trgm
+        Index(
+            "ix_audit_logs_action_trgm", "action",
+            postgresql_using="gin", postgresql_ops={"action": "gin_trgm_ops"},
+        ),
+    )
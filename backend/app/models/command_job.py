@@ -0,0 +1,21 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, JSON
+from sqlalchemy.sql import func
+from app.db.base_class import Base
+
+class CommandJob(Base):
+    """
+    Массовое выполнение команды (/commands/execute-bulk). SMS задания
+    связаны с ним через sms_outbox.job_id, прогресс считается по их статусам.
+    """
+    __tablename__ = "command_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    template_id = Column(Integer, ForeignKey("command_templates.id", ondelete="SET NULL"), nullable=True)
+    command = Column(String, nullable=False)
+    params = Column(JSON, nullable=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
+    platform_id = Column(Integer, ForeignKey("platforms.id", ondelete="SET NULL"), nullable=True)  # Фильтр по платформе, если задан
+    total = Column(Integer, nullable=False, default=0, server_default="0")  # Устройств в задании
+    queued = Column(Integer, nullable=False, default=0, server_default="0")  # SMS поставлено в очередь
+    skipped = Column(Integer, nullable=False, default=0, server_default="0")  # Устройств без номера телефона
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
@@ -1,9 +1,10 @@
 from sqlalchemy import Column, Integer, String, DateTime, Text, Enum as SQLAlchemyEnum, ForeignKey, Boolean
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, validates
 from sqlalchemy.sql import func
 import enum
 from app.db.base_class import Base
 import sqlalchemy as sa
+from app.utils.phone import normalize_phone
 
 class DeviceStatus(enum.Enum):
     ONLINE = "ONLINE"
@@ -23,9 +24,11 @@ class Device(Base):
     client_id = Column(Integer, ForeignKey("clients.id"), nullable=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=True)  # Связь с пользователем
     phone = Column(String(20), nullable=True)  # Убедитесь, что тип String
+    phone_e164 = Column(String(16), nullable=True, unique=True, index=True)  # Нормализованный номер (E.164) для сопоставления входящих SMS
     model = Column(String(50), nullable=True)  # Новое поле
     alert_sms_template_id = Column(Integer, ForeignKey("command_templates.id"), nullable=True) # ID шаблона команды для SMS-оповещений
     send_alert_sms = Column(sa.Boolean, default=False, nullable=False) # Флаг для отправки SMS-оповещений
+    sms_coalesce_window = Column(Integer, nullable=True) # Окно объединения SMS по алертам (секунды), NULL - настройка платформы
     platform_id = Column(Integer, ForeignKey("platforms.id"), nullable=True)
     # Отношения
     client = relationship("Client", back_populates="devices")
@@ -33,4 +36,10 @@ class Device(Base):
     alerts = relationship("Alert", back_populates="device")
     command_logs = relationship("Log", back_populates="device")
     platform = relationship("Platform", back_populates="devices")
- 
\ No newline at end of file
+ 
+
+    @validates("phone")
+    def _sync_phone_e164(self, key, value):
+        # Нормализованный номер обновляется при любом изменении phone
+        self.phone_e164 = normalize_phone(value)
+        return value
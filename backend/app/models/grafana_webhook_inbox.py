@@ -0,0 +1,27 @@
+from sqlalchemy import Column, Integer, String, DateTime, Index
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.sql import func
+from app.db.base_class import Base
+
+class GrafanaWebhookInbox(Base):
+    """Принятые вебхуки Grafana. Обрабатываются фоновыми воркерами (app.services.webhook_inbox)"""
+    __tablename__ = "grafana_webhook_inbox"
+
+    id = Column(Integer, primary_key=True, index=True)
+    group_key = Column(String, nullable=False)  # groupKey Grafana (или хэш полезной нагрузки, если его нет)
+    payload_hash = Column(String(64), nullable=False)
+    payload = Column(JSONB, nullable=False)  # Исходная полезная нагрузка
+    status = Column(String(20), nullable=False, default="pending", server_default="pending")  # 'pending', 'processing', 'done', 'failed', 'coalesced'
+    attempts = Column(Integer, nullable=False, default=0, server_default="0")
+    deliveries = Column(Integer, nullable=False, default=1, server_default="1")  # Повторные доставки того же вебхука
+    last_error = Column(String, nullable=True)
+    result = Column(JSONB, nullable=True)
+    received_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    next_attempt_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    locked_at = Column(DateTime(timezone=True), nullable=True)
+    processed_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        Index("ix_grafana_webhook_inbox_status_next_attempt_at", "status", "next_attempt_at"),
+        Index("ix_grafana_webhook_inbox_group_key_status", "group_key", "status"),
+    )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Float
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Float, Index
 from sqlalchemy.sql import func
 from app.db.base_class import Base
 from sqlalchemy.orm import relationship
@@ -8,22 +8,37 @@ from sqlalchemy.orm import Session
 from sqlalchemy.dialects.postgresql import JSONB
 
 class Log(Base):
+    """
+    Журнал устройств: команды, входящие SMS, записи по алертам.
+    Таблица секционирована по месяцам (RANGE по created_at), поэтому первичный
+    ключ - (id, created_at); для ORM записи идентифицируются по id. Секции
+    создаёт и выводит из БД app.services.log_partitions.
+    """
     __tablename__ = "logs"
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True, autoincrement=True, index=True)
     device_id = Column(Integer, ForeignKey("devices.id"), nullable=True)
     message = Column(String)
     level = Column(String, default="info")
     command = Column(String, nullable=True)
     status = Column(String, nullable=True)
     response = Column(String, nullable=True)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), primary_key=True, server_default=func.now(), nullable=False)
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     execution_time = Column(DateTime(timezone=True), nullable=True)
     extra_data = Column(JSONB, nullable=True)
     
     device = relationship("Device", back_populates="command_logs")
 
+    # Индексы под keyset-пагинацию по (created_at, id) и фильтры по устройству/уровню
+    __table_args__ = (
+        Index("ix_logs_created_at_id", "created_at", "id"),
+        Index("ix_logs_device_id_created_at_id", "device_id", "created_at", "id"),
+        Index("ix_logs_level_created_at_id", "level", "created_at", "id"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
+    __mapper_args__ = {"primary_key": [id]}
+
     @staticmethod
     def log_command(
         db: Session,
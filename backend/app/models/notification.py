@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean, Text
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean, Text, Index, text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.db.base_class import Base
@@ -16,4 +16,11 @@ class Notification(Base):
     updated_at = Column(DateTime(timezone=True), onupdate=func.now(), nullable=True)
     
     # Relationship
-    user = relationship("User", back_populates="notifications") 
\ No newline at end of file
+    user = relationship("User", back_populates="notifications")
+
+    __table_args__ = (
+        # Список уведомлений пользователя (новые первыми)
+        Index("ix_notifications_user_created_at", "user_id", "created_at"),
+        # Непрочитанные уведомления: отметка "прочитано" и сверка счётчиков
+        Index("ix_notifications_user_unread", "user_id", postgresql_where=text("read_status = false")),
+    ) 
\ No newline at end of file
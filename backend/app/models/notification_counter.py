@@ -0,0 +1,16 @@
+from sqlalchemy import Column, Integer, DateTime, ForeignKey
+from sqlalchemy.sql import func
+from app.db.base_class import Base
+
+class NotificationCounter(Base):
+    """
+    Счётчики уведомлений пользователя: всего и непрочитанных.
+    Изменяются в той же транзакции, что и уведомления (NotificationService);
+    периодически сверяются с таблицей notifications.
+    """
+    __tablename__ = "notification_counters"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True, autoincrement=False)
+    total = Column(Integer, nullable=False, default=0, server_default="0")
+    unread = Column(Integer, nullable=False, default=0, server_default="0")
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
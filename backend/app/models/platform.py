@@ -11,6 +11,7 @@ class Platform(Base):
     description = Column(String, nullable=True)
     devices_limit = Column(Integer, nullable=True)
     sms_limit = Column(Integer, nullable=True)
+    sms_coalesce_window = Column(Integer, nullable=True)  # Окно объединения SMS по алертам (секунды), NULL - ALERT_SMS_COALESCE_WINDOW
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
@@ -0,0 +1,16 @@
+from sqlalchemy import Column, Integer, DateTime
+from sqlalchemy.sql import func
+from app.db.base_class import Base
+
+class PlatformSMSUsage(Base):
+    """
+    Счётчик исходящих SMS платформы за текущий период квоты (Platform.sms_limit).
+    Обновляется атомарным UPSERT в SMSQuotaService; при смене периода счётчик
+    сбрасывается тем же запросом.
+    """
+    __tablename__ = "platform_sms_usage"
+
+    platform_id = Column(Integer, primary_key=True, autoincrement=False)
+    period_start = Column(DateTime(timezone=True), nullable=False)
+    sent = Column(Integer, nullable=False, default=0, server_default="0")
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -0,0 +1,18 @@
+from sqlalchemy import Column, Integer, DateTime
+from sqlalchemy.sql import func
+from app.db.base_class import Base
+
+class PlatformStats(Base):
+    """
+    Инкрементально поддерживаемые счётчики платформы для дашборда.
+    platform_id = 0 - устройства и алерты без платформы.
+    Периодически сверяются с исходными таблицами (PlatformStatsService.reconcile).
+    """
+    __tablename__ = "platform_stats"
+
+    platform_id = Column(Integer, primary_key=True, autoincrement=False)
+    device_count = Column(Integer, nullable=False, default=0, server_default="0")
+    firing_alerts = Column(Integer, nullable=False, default=0, server_default="0")
+    resolved_alerts = Column(Integer, nullable=False, default=0, server_default="0")
+    latest_alert_at = Column(DateTime(timezone=True), nullable=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -0,0 +1,35 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Index
+from sqlalchemy.sql import func
+from app.db.base_class import Base
+
+class SMSOutbox(Base):
+    """Очередь исходящих SMS. Сообщения обрабатываются фоновыми воркерами (app.services.sms_queue)"""
+    __tablename__ = "sms_outbox"
+
+    id = Column(Integer, primary_key=True, index=True)
+    phone = Column(String(20), nullable=False)
+    text = Column(Text, nullable=False)
+    status = Column(String(20), nullable=False, default="pending", server_default="pending")  # 'pending', 'processing', 'sent', 'failed', 'coalesced', 'suppressed'
+    attempts = Column(Integer, nullable=False, default=0, server_default="0")
+    last_error = Column(String, nullable=True)
+    response = Column(String, nullable=True)
+    next_attempt_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    locked_at = Column(DateTime(timezone=True), nullable=True)
+    # Куда записать результат отправки
+    log_id = Column(Integer, nullable=True)  # logs.id без внешнего ключа: logs секционирована, запись может уйти в архив
+    alert_id = Column(Integer, ForeignKey("alerts.id", ondelete="SET NULL"), nullable=True)
+    device_id = Column(Integer, ForeignKey("devices.id", ondelete="SET NULL"), nullable=True)
+    platform_id = Column(Integer, ForeignKey("platforms.id", ondelete="SET NULL"), nullable=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
+    job_id = Column(Integer, ForeignKey("command_jobs.id", ondelete="SET NULL"), nullable=True)  # Задание /commands/execute-bulk
+    # Решения этапа объединения SMS по алертам (app.services.alert_sms_coalescing)
+    coalesced_into_id = Column(Integer, ForeignKey("sms_outbox.id", ondelete="SET NULL"), nullable=True)  # SMS, в которое объединено это сообщение
+    suppressed_reason = Column(String(50), nullable=True)  # 'flapping', 'resolved_before_send'
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now(), nullable=True)
+
+    __table_args__ = (
+        Index("ix_sms_outbox_status_next_attempt_at", "status", "next_attempt_at"),
+        Index("ix_sms_outbox_coalesced_into_id", "coalesced_into_id"),
+        Index("ix_sms_outbox_job_id_status", "job_id", "status"),
+    )
@@ -12,6 +12,7 @@ class User(Base):
     is_active = Column(Boolean, default=True)
     role = Column(String, default="user", nullable=False)
     platform_id = Column(Integer, ForeignKey("clients.id"), nullable=True)
+    token_version = Column(Integer, default=0, server_default="0", nullable=False) # Увеличивается при отзыве токенов
     created_at = Column(DateTime, default=func.now())
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
     
@@ -0,0 +1,29 @@
+from datetime import datetime
+from typing import Dict, List, Optional
+from pydantic import BaseModel, Field, model_validator
+
+class BulkCommandRequest(BaseModel):
+    template_id: int
+    params: Dict[str, str] = Field(default_factory=dict)
+    device_ids: Optional[List[int]] = Field(None, description="Список устройств")
+    platform_id: Optional[int] = Field(None, description="Все устройства платформы (или пересечение с device_ids)")
+    model: Optional[str] = Field(None, description="Фильтр по модели устройства")
+
+    @model_validator(mode="after")
+    def check_target(self):
+        if not self.device_ids and self.platform_id is None:
+            raise ValueError("Нужно указать device_ids или platform_id")
+        return self
+
+class CommandJobResponse(BaseModel):
+    job_id: int
+    command: str
+    total: int
+    queued: int
+    skipped: int
+    pending: int = 0
+    processing: int = 0
+    sent: int = 0
+    failed: int = 0
+    done: bool = False
+    created_at: Optional[datetime] = None
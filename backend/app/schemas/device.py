@@ -8,6 +8,7 @@ class DeviceBase(BaseModel):
     model: Optional[str] = Field(None, max_length=50)
     alert_sms_template_id: Optional[int] = Field(None, description="ID шаблона команды для SMS-оповещений из command_templates")
     send_alert_sms: bool = Field(False, description="Флаг для отправки SMS-оповещений при срабатывании алерта")
+    sms_coalesce_window: Optional[int] = Field(None, ge=0, description="Окно объединения SMS по алертам (секунды), по умолчанию - настройка платформы")
     description: Optional[str] = None
     grafana_uid: Optional[str] = Field(None, max_length=100)
 
@@ -25,6 +26,7 @@ class DeviceUpdate(DeviceBase):
     grafana_uid: Optional[str] = Field(None, max_length=100)
     alert_sms_template_id: Optional[int] = None
     send_alert_sms: Optional[bool] = None
+    sms_coalesce_window: Optional[int] = Field(None, ge=0)
     alert_sms_template_params: Optional[dict] = None
 
 class DeviceInDB(DeviceBase):
@@ -7,6 +7,7 @@ class PlatformBase(BaseModel):
     description: Optional[str] = None
     devices_limit: Optional[int] = None
     sms_limit: Optional[int] = None
+    sms_coalesce_window: Optional[int] = None
 
 class PlatformCreate(PlatformBase):
     pass
@@ -16,6 +17,7 @@ class PlatformUpdate(BaseModel):
     description: Optional[str] = None
     devices_limit: Optional[int] = None
     sms_limit: Optional[int] = None
+    sms_coalesce_window: Optional[int] = None
 
 class PlatformResponse(PlatformBase):
     id: int
@@ -0,0 +1,179 @@
+import logging
+from collections import defaultdict
+from datetime import timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func, text
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.alert import Alert
+from app.models.device import Device
+from app.models.platform import Platform
+from app.services.sms_quota import SMSQuotaService
+
+logger = logging.getLogger(__name__)
+
+# Стандартный текст SMS по алерту: "АЛЕРТ! <alertname>: <summary>"
+ALERT_SMS_PREFIX = "АЛЕРТ! "
+
+SUPPRESSED_FLAPPING = "flapping"
+SUPPRESSED_RESOLVED = "resolved_before_send"
+
+FlapKey = Tuple[str, int]
+
+def _truncate(text: str, limit: int) -> str:
+    if len(text) <= limit:
+        return text
+    if limit <= 0:
+        return ""
+    return text[:limit - 1] + "…"
+
+class AlertSMSCoalescing:
+    """
+    Этап объединения SMS по алертам.
+
+    - SMS по алерту ставится в очередь с задержкой (окно устройства, платформы
+      или ALERT_SMS_COALESCE_WINDOW). Когда воркер забирает сообщение, все
+      ожидающие SMS по алертам на тот же номер объединяются в одно
+      (coalesce_claimed): стандартные тексты - в сводку, одинаковые команды
+      шаблона - в одну отправку. Объединённые строки получают статус
+      'coalesced' и ссылку coalesced_into_id.
+    - Алерт, закрытый до отправки SMS, отменяет её (cancel_resolved).
+    - SMS по алерту, который срабатывает на устройстве ALERT_FLAP_THRESHOLD
+      и более раз за ALERT_FLAP_WINDOW, не отправляется (flapping_keys).
+
+    Все решения записываются в sms_outbox (status, suppressed_reason), сами
+    алерты сохраняются без изменений.
+    """
+
+    @staticmethod
+    def platform_windows(db: Session, devices: Iterable[Device]) -> Dict[int, Optional[int]]:
+        platform_ids = {device.platform_id for device in devices if device.platform_id and device.sms_coalesce_window is None}
+        if not platform_ids:
+            return {}
+        return dict(db.query(Platform.id, Platform.sms_coalesce_window).filter(Platform.id.in_(platform_ids)).all())
+
+    @staticmethod
+    def window_for(device: Device, platform_windows: Dict[int, Optional[int]]) -> int:
+        if device.sms_coalesce_window is not None:
+            return device.sms_coalesce_window
+        platform_window = platform_windows.get(device.platform_id)
+        if platform_window is not None:
+            return platform_window
+        return settings.ALERT_SMS_COALESCE_WINDOW
+
+    @staticmethod
+    def flapping_keys(db: Session, keys: Iterable[FlapKey]) -> Dict[FlapKey, int]:
+        """
+        Ключи (alert_name, device_id), по которым за ALERT_FLAP_WINDOW получено
+        не меньше ALERT_FLAP_THRESHOLD алертов (включая только что созданные).
+        Окно считается по времени записи алерта в БД (received_at), а не по
+        startsAt из Grafana: опоздавшие и повторённые вебхуки тоже учитываются.
+        """
+        keys = set(keys)
+        if not keys or settings.ALERT_FLAP_THRESHOLD <= 0:
+            return {}
+        since = func.now() - timedelta(seconds=settings.ALERT_FLAP_WINDOW)
+        rows = db.query(Alert.alert_name, Alert.device_id, func.count(Alert.id)).filter(
+            Alert.device_id.in_({device_id for _, device_id in keys}),
+            Alert.alert_name.in_({alert_name for alert_name, _ in keys}),
+            Alert.received_at >= since,
+        ).group_by(Alert.alert_name, Alert.device_id).all()
+        return {
+            (alert_name, device_id): count
+            for alert_name, device_id, count in rows
+            if (alert_name, device_id) in keys and count >= settings.ALERT_FLAP_THRESHOLD
+        }
+
+    @staticmethod
+    def cancel_resolved(db: Session, alert_ids: List[int]) -> int:
+        """Отменить ещё не отправленные SMS по закрытым алертам (без commit)"""
+        if not alert_ids:
+            return 0
+        rows = db.execute(text("""
+            UPDATE sms_outbox
+            SET status = 'suppressed', suppressed_reason = :reason, updated_at = now()
+            WHERE alert_id = ANY(:alert_ids) AND status = 'pending' AND attempts = 0
+            RETURNING platform_id
+        """), {"alert_ids": alert_ids, "reason": SUPPRESSED_RESOLVED}).all()
+        refunds = defaultdict(int)
+        for (platform_id,) in rows:
+            refunds[platform_id] += 1
+        for platform_id, count in refunds.items():
+            SMSQuotaService.refund(db, platform_id, count)
+        if rows:
+            logger.info(f"Отменено SMS по алертам, закрытым до отправки: {len(rows)}")
+        return len(rows)
+
+    @staticmethod
+    def merge_texts(texts: List[str]) -> str:
+        """
+        Один текст для нескольких SMS по алертам на один номер, не длиннее
+        ALERT_SMS_MAX_LENGTH: не поместившиеся части заменяются на " … (+N)",
+        слишком длинная первая часть обрезается.
+        """
+        unique = list(dict.fromkeys(texts))
+        if len(unique) == 1:
+            return unique[0]
+        max_length = settings.ALERT_SMS_MAX_LENGTH
+        parts = [part[len(ALERT_SMS_PREFIX):] if part.startswith(ALERT_SMS_PREFIX) else part for part in unique]
+        header = f"АЛЕРТЫ ({len(texts)}): "
+        merged = header
+        for index, part in enumerate(parts):
+            separator = "; " if index else ""
+            left = len(parts) - index - 1
+            # Место под " … (+N)" для оставшихся частей резервируется заранее
+            suffix = f" … (+{left})" if left else ""
+            if len(merged) + len(separator) + len(part) + len(suffix) <= max_length:
+                merged += separator + part
+                continue
+            if index == 0:
+                merged = header + _truncate(part, max_length - len(header) - len(suffix)) + suffix
+            else:
+                merged += f" … (+{left + 1})"
+            break
+        return _truncate(merged, max_length)
+
+    @staticmethod
+    def coalesce_claimed(db: Session, message: dict) -> dict:
+        """
+        Присоединить к захваченному SMS по алерту ожидающие SMS на тот же номер
+        (без commit). Стандартные тексты объединяются в сводку, команды
+        шаблона - только с точно такими же командами.
+        """
+        if not message["alert_id"] or message["attempts"] != 1:
+            return message
+        mergeable = message["text"].startswith(ALERT_SMS_PREFIX)
+        rows = db.execute(text("""
+            UPDATE sms_outbox
+            SET status = 'coalesced', coalesced_into_id = :id, updated_at = now()
+            WHERE id IN (
+                SELECT id FROM sms_outbox
+                WHERE status = 'pending' AND attempts = 0 AND alert_id IS NOT NULL
+                  AND phone = :phone AND id <> :id
+                  AND CASE WHEN :mergeable THEN text LIKE :prefix || '%' ELSE text = :text END
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING id, text, platform_id
+        """), {
+            "id": message["id"],
+            "phone": message["phone"],
+            "text": message["text"],
+            "mergeable": mergeable,
+            "prefix": ALERT_SMS_PREFIX,
+        }).all()
+        if not rows:
+            return message
+
+        rows = sorted(rows, key=lambda row: row.id)
+        merged_text = AlertSMSCoalescing.merge_texts([message["text"]] + [row.text for row in rows])
+        db.execute(text("UPDATE sms_outbox SET text = :text WHERE id = :id"), {"text": merged_text, "id": message["id"]})
+        # Объединённые SMS не уходят на шлюз - возвращаем их в квоту платформы
+        refunds = defaultdict(int)
+        for row in rows:
+            refunds[row.platform_id] += 1
+        for platform_id, count in refunds.items():
+            SMSQuotaService.refund(db, platform_id, count)
+        logger.info(f"SMS id={message['id']} на {message['phone']}: объединено ещё {len(rows)} SMS по алертам")
+        return {**message, "text": merged_text, "coalesced": len(rows)}
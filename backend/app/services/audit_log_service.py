@@ -1,20 +1,44 @@
-from sqlalchemy.orm import Session
+import base64
+import csv
+import io
+from sqlalchemy import or_, tuple_
+from sqlalchemy.orm import Session, Query
+from app.db.session import SessionLocal
 from app.models.audit_log import AuditLog
-from app.schemas.audit_log import AuditLogCreate
-from typing import List, Optional
+from app.schemas.audit_log import AuditLogCreate, AuditLogResponse
+from app.core.audit import log_audit
+from typing import Iterable, Iterator, List, Optional, Tuple
 from datetime import datetime
 
+# Колонки CSV-выгрузки
+EXPORT_FIELDS = ["id", "timestamp", "user_id", "action", "details", "ip_address", "platform_id", "device_id"]
+
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
 class AuditLogService:
     @staticmethod
     def create_log(db: Session, log_data: AuditLogCreate) -> AuditLog:
-        log_entry = AuditLog(**log_data.model_dump())
-        db.add(log_entry)
-        db.commit()
-        db.refresh(log_entry)
-        return log_entry
+        # Запись нужна сразу (ответ содержит id) - синхронный режим log_audit
+        return log_audit(db, sync=True, **log_data.model_dump())
+
+    @staticmethod
+    def encode_cursor(log: AuditLog) -> str:
+        """Курсор keyset-пагинации: позиция (timestamp, id) последней записи страницы"""
+        raw = f"{log.timestamp.isoformat()}|{log.id}"
+        return base64.urlsafe_b64encode(raw.encode()).decode()
 
     @staticmethod
-    def get_logs(
+    def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+        try:
+            raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+            timestamp, log_id = raw.rsplit("|", 1)
+            return datetime.fromisoformat(timestamp), int(log_id)
+        except (ValueError, UnicodeDecodeError) as e:
+            raise ValueError(f"Некорректный курсор: {cursor}") from e
+
+    @staticmethod
+    def build_query(
         db: Session,
         user_id: Optional[int] = None,
         action: Optional[str] = None,
@@ -22,24 +46,80 @@ class AuditLogService:
         end_date: Optional[datetime] = None,
         platform_id: Optional[int] = None,
         device_id: Optional[int] = None,
-    ) -> List[AuditLog]:
+        scope_platform_ids: Optional[Iterable[int]] = None,
+        scope_user_id: Optional[int] = None,
+    ) -> Query:
+        """
+        Запрос журнала аудита с фильтрами, упорядоченный по (timestamp, id) по
+        убыванию. Поиск по action - подстрока без учёта регистра (триграммный
+        индекс ix_audit_logs_action_trgm). scope_platform_ids - видимость для
+        не-superadmin: записи этих платформ и собственные действия scope_user_id.
+        """
         query = db.query(AuditLog)
-
+        if scope_platform_ids is not None:
+            query = query.filter(or_(
+                AuditLog.platform_id.in_(list(scope_platform_ids)),
+                AuditLog.user_id == scope_user_id,
+            ))
         if user_id:
             query = query.filter(AuditLog.user_id == user_id)
-        
         if action:
-            query = query.filter(AuditLog.action.ilike(f"%{action}%"))
-
+            query = query.filter(AuditLog.action.ilike(f"%{_escape_like(action)}%", escape="\\"))
         if start_date:
             query = query.filter(AuditLog.timestamp >= start_date)
-            
         if end_date:
             query = query.filter(AuditLog.timestamp <= end_date)
-
         if platform_id:
             query = query.filter(AuditLog.platform_id == platform_id)
         if device_id:
             query = query.filter(AuditLog.device_id == device_id)
+        return query.order_by(AuditLog.timestamp.desc(), AuditLog.id.desc())
+
+    @staticmethod
+    def get_logs_page(
+        db: Session,
+        cursor: Optional[str] = None,
+        limit: int = 100,
+        **filters
+    ) -> Tuple[List[AuditLog], Optional[str]]:
+        """Страница журнала и курсор следующей страницы (None, если это последняя)"""
+        query = AuditLogService.build_query(db, **filters)
+        if cursor:
+            cursor_timestamp, cursor_id = AuditLogService.decode_cursor(cursor)
+            query = query.filter(tuple_(AuditLog.timestamp, AuditLog.id) < (cursor_timestamp, cursor_id))
+        items = query.limit(limit + 1).all()
+        next_cursor = None
+        if len(items) > limit:
+            items = items[:limit]
+            next_cursor = AuditLogService.encode_cursor(items[-1])
+        return items, next_cursor
 
-        return query.order_by(AuditLog.timestamp.desc()).all() 
\ No newline at end of file
+    @staticmethod
+    def iter_export(export_format: str, batch_size: int = 500, **filters) -> Iterator[str]:
+        """
+        Потоковая выгрузка журнала в CSV или NDJSON через yield_per: память не
+        растёт с размером выборки. Использует собственную сессию, так как
+        генератор выполняется после завершения обработчика.
+        """
+        db = SessionLocal()
+        try:
+            query = AuditLogService.build_query(db, **filters).yield_per(batch_size)
+            if export_format == "csv":
+                buffer = io.StringIO()
+                writer = csv.writer(buffer)
+                writer.writerow(EXPORT_FIELDS)
+                for index, log in enumerate(query, 1):
+                    writer.writerow([
+                        log.timestamp.isoformat() if field == "timestamp" and log.timestamp else getattr(log, field)
+                        for field in EXPORT_FIELDS
+                    ])
+                    if index % batch_size == 0:
+                        yield buffer.getvalue()
+                        buffer.seek(0)
+                        buffer.truncate()
+                yield buffer.getvalue()
+            else:
+                for log in query:
+                    yield AuditLogResponse.model_validate(log).model_dump_json() + "\n"
+        finally:
+            db.close()
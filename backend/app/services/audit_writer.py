@@ -0,0 +1,175 @@
+import asyncio
+import logging
+import queue
+import threading
+from typing import Dict, List, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.exc import DataError, IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.audit_log import AuditLog
+from app.utils.async_loop import call_soon_in_loop
+
+logger = logging.getLogger(__name__)
+
+# Сколько раз повторять запись пачки, прежде чем отбросить её
+MAX_FLUSH_ATTEMPTS = 3
+
+class AuditWriter:
+    """
+    Буфер записей журнала аудита с пакетной записью в фоне.
+
+    log_audit кладёт запись в ограниченную очередь в памяти и сразу
+    возвращается: запрос не платит за отдельный commit аудита. Фоновая задача
+    записывает накопленное одним INSERT раз в AUDIT_FLUSH_INTERVAL или как
+    только набирается AUDIT_BATCH_SIZE записей. Время записи фиксируется при
+    постановке в очередь. Если очередь переполнена или писатель не запущен
+    (скрипты, миграции), put() возвращает False и запись выполняется синхронно.
+    """
+
+    def __init__(self):
+        self._queue: "queue.Queue[Dict]" = queue.Queue(maxsize=settings.AUDIT_QUEUE_SIZE)
+        self._wakeup = asyncio.Event()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+        self._retry: List[Dict] = []
+        self._flush_lock = threading.Lock()  # stop() может застать незавершённую запись в потоке
+        self._retry_attempts = 0
+        self.written = 0
+        self.dropped = 0
+        self.overflows = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and self._loop is not None and not self._loop.is_closed()
+
+    def put(self, entry: Dict) -> bool:
+        """Поставить запись в очередь. False - писатель не запущен или очередь полна"""
+        if not self.running:
+            return False
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            self.overflows += 1
+            return False
+        if self._queue.qsize() >= settings.AUDIT_BATCH_SIZE:
+            self._notify()
+        return True
+
+    def _notify(self) -> None:
+        call_soon_in_loop(self._loop, self._wakeup.set)
+
+    def _take_batch(self) -> List[Dict]:
+        batch, self._retry = self._retry, []
+        while len(batch) < settings.AUDIT_BATCH_SIZE:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _flush(self) -> int:
+        """Записать всё накопленное пачками по AUDIT_BATCH_SIZE"""
+        with self._flush_lock:
+            return self._flush_locked()
+
+    def _flush_locked(self) -> int:
+        written = 0
+        while True:
+            batch = self._take_batch()
+            if not batch:
+                return written
+            db = SessionLocal()
+            try:
+                db.execute(insert(AuditLog), batch)
+                db.commit()
+                batch_written = len(batch)
+            except Exception as e:
+                db.rollback()
+                logger.warning(f"Не удалось записать пачку аудита ({len(batch)} шт.), запись по одной: {e}")
+                batch_written = self._write_rows(db, batch)
+                if batch_written is None:
+                    return written
+            finally:
+                db.close()
+            self._retry_attempts = 0
+            written += batch_written
+            self.written += batch_written
+
+    def _write_rows(self, db: Session, batch: List[Dict]) -> Optional[int]:
+        """
+        Записать пачку построчно: записи с ошибкой данных (например, ссылка на
+        удалённое устройство) отбрасываются, остальные пишутся. При ошибке
+        другого рода (БД недоступна) незаписанный остаток повторяется позже;
+        тогда возвращается None.
+        """
+        written = 0
+        for index, entry in enumerate(batch):
+            try:
+                db.execute(insert(AuditLog), entry)
+                db.commit()
+                written += 1
+            except (IntegrityError, DataError) as e:
+                db.rollback()
+                self.dropped += 1
+                logger.error(f"Запись аудита отброшена ({entry.get('action')}): {e}")
+            except Exception as e:
+                db.rollback()
+                self.written += written
+                self._retry_later(batch[index:], e)
+                return None
+        return written
+
+    def _retry_later(self, batch: List[Dict], error: Exception) -> None:
+        self._retry_attempts += 1
+        if self._retry_attempts >= MAX_FLUSH_ATTEMPTS:
+            self.dropped += len(batch)
+            self._retry_attempts = 0
+            logger.error(f"Записи аудита отброшены после {MAX_FLUSH_ATTEMPTS} попыток ({len(batch)} шт.): {error}")
+        else:
+            self._retry = batch
+            logger.warning(f"Не удалось записать записи аудита ({len(batch)} шт.), повтор: {error}")
+
+    async def _run(self) -> None:
+        logger.info("Писатель журнала аудита запущен")
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=settings.AUDIT_FLUSH_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await asyncio.to_thread(self._flush)
+            except Exception as e:
+                logger.error(f"Ошибка записи журнала аудита: {e}")
+
+    async def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Остановить фоновую задачу и записать остаток буфера"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        written = await asyncio.to_thread(self._flush)
+        if self._retry:
+            self.dropped += len(self._retry)
+            logger.error(f"При остановке не записано {len(self._retry)} записей аудита")
+            self._retry = []
+        logger.info(f"Писатель журнала аудита остановлен, записано при остановке: {written}")
+
+    def get_metrics(self) -> Dict:
+        return {
+            "running": self.running,
+            "queued": self._queue.qsize() + len(self._retry),
+            "written": self.written,
+            "dropped": self.dropped,
+            "overflows": self.overflows,
+        }
+
+audit_writer = AuditWriter()
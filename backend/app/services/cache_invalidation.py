@@ -0,0 +1,133 @@
+import json
+import logging
+import os
+import select
+import threading
+import uuid
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.db.session import engine
+
+logger = logging.getLogger(__name__)
+
+# Обработчик получает ключ записи (строкой) или None - сбросить весь кэш
+InvalidationHandler = Callable[[Optional[str]], None]
+
+class CacheInvalidation:
+    """
+    Инвалидация локальных кэшей процесса между воркерами gunicorn через
+    Postgres LISTEN/NOTIFY: отдельная инфраструктура (Redis) не нужна.
+
+    Кэш регистрирует обработчик под своим именем (register). После изменения
+    данных вызывающий код сбрасывает свою запись локально и вызывает
+    publish() - остальные процессы получают уведомление в фоновом потоке и
+    вызывают обработчик. Если уведомление потеряно (Postgres недоступен,
+    переподключение), расхождение ограничено TTL кэша; после переподключения
+    кэши сбрасываются целиком.
+    """
+
+    def __init__(self, channel: str):
+        self.channel = channel
+        self.origin = f"{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._handlers: Dict[str, List[InvalidationHandler]] = {}
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.published = 0
+        self.received = 0
+
+    def register(self, cache: str, handler: InvalidationHandler) -> None:
+        self._handlers.setdefault(cache, []).append(handler)
+
+    def publish(self, cache: str, key=None) -> None:
+        """Сообщить остальным процессам об изменении записи key кэша cache (None - всех записей)"""
+        payload = json.dumps({"origin": self.origin, "cache": cache, "key": None if key is None else str(key)})
+        try:
+            with engine.connect() as conn:
+                conn.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": self.channel, "payload": payload})
+                conn.commit()
+            self.published += 1
+        except Exception as e:
+            logger.warning(f"Не удалось разослать инвалидацию кэша {cache}: {e}")
+
+    def _apply(self, cache: str, key: Optional[str]) -> None:
+        for handler in self._handlers.get(cache, []):
+            try:
+                handler(key)
+            except Exception as e:
+                logger.error(f"Ошибка инвалидации кэша {cache}: {e}")
+
+    def _apply_all(self) -> None:
+        for cache in list(self._handlers):
+            self._apply(cache, None)
+
+    def _handle(self, raw_payload: str) -> None:
+        try:
+            message = json.loads(raw_payload)
+        except ValueError:
+            logger.warning(f"Некорректное уведомление в канале {self.channel}: {raw_payload[:200]}")
+            return
+        if message.get("origin") == self.origin:
+            return
+        self.received += 1
+        self._apply(message.get("cache"), message.get("key"))
+
+    def _listen(self) -> None:
+        delay = 1
+        connected_before = False
+        while not self._stop.is_set():
+            raw = None
+            try:
+                raw = engine.raw_connection()
+                raw.detach()  # Соединение слушает канал всё время работы и в пул не возвращается
+                connection = raw.driver_connection
+                connection.autocommit = True
+                with connection.cursor() as cursor:
+                    cursor.execute(f'LISTEN "{self.channel}"')
+                if connected_before:
+                    # Уведомления за время разрыва потеряны
+                    self._apply_all()
+                connected_before = True
+                delay = 1
+                while not self._stop.is_set():
+                    if select.select([connection], [], [], 1.0) == ([], [], []):
+                        continue
+                    connection.poll()
+                    while connection.notifies:
+                        self._handle(connection.notifies.pop(0).payload)
+            except Exception as e:
+                logger.error(f"Ошибка подписки на инвалидацию кэшей: {e}, повтор через {delay}с")
+                self._stop.wait(delay)
+                delay = min(delay * 2, 30)
+            finally:
+                if raw is not None:
+                    try:
+                        raw.close()
+                    except Exception:
+                        pass
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._listen, name="cache-invalidation", daemon=True)
+        self._thread.start()
+        logger.info(f"Инвалидация кэшей между процессами запущена (канал {self.channel})")
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout=5)
+        self._thread = None
+
+    def get_metrics(self) -> Dict:
+        return {
+            "listening": self._thread is not None and self._thread.is_alive(),
+            "published": self.published,
+            "received": self.received,
+        }
+
+cache_invalidation = CacheInvalidation(channel=settings.CACHE_INVALIDATION_CHANNEL)
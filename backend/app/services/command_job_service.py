@@ -0,0 +1,136 @@
+import logging
+from typing import Dict, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import func, insert
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.command_job import CommandJob
+from app.models.device import Device
+from app.models.log import Log
+from app.models.sms_outbox import SMSOutbox
+from app.models.user import User
+from app.schemas.command_job import BulkCommandRequest
+from app.services.command_template_registry import CompiledTemplate
+from app.services.sms_queue import sms_queue
+from app.services.sms_quota import SMSQuotaService
+
+logger = logging.getLogger(__name__)
+
+class CommandJobService:
+    """
+    Массовое выполнение команды: шаблон проверяется и подставляется один раз,
+    Log-записи и SMS вставляются пачками в одной транзакции. Отправку
+    выполняют воркеры очереди SMS (SMS_QUEUE_WORKERS), их число и ограничивает
+    параллельность обращений к шлюзу.
+    """
+
+    @staticmethod
+    def create(db: Session, request: BulkCommandRequest, template: CompiledTemplate, command: str, user: User) -> CommandJob:
+        query = db.query(Device.id, Device.phone, Device.platform_id)
+        if request.device_ids:
+            query = query.filter(Device.id.in_(set(request.device_ids)))
+        if request.platform_id is not None:
+            query = query.filter(Device.platform_id == request.platform_id)
+        if request.model:
+            query = query.filter(Device.model == request.model)
+        devices = query.order_by(Device.id).limit(settings.COMMAND_BULK_MAX_DEVICES + 1).all()
+        if not devices:
+            raise HTTPException(status_code=404, detail="Устройства не найдены")
+        if len(devices) > settings.COMMAND_BULK_MAX_DEVICES:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Слишком много устройств в задании (максимум {settings.COMMAND_BULK_MAX_DEVICES})"
+            )
+
+        with_phone = [device for device in devices if device.phone]
+        # Квота списывается на всё задание сразу: одно обращение на платформу
+        per_platform: Dict[Optional[int], int] = {}
+        for device in with_phone:
+            per_platform[device.platform_id] = per_platform.get(device.platform_id, 0) + 1
+        for platform_id, count in per_platform.items():
+            quota = SMSQuotaService.consume(db, platform_id, user.id, count=count)
+            if not quota.granted:
+                db.rollback()
+                raise HTTPException(status_code=429, detail=SMSQuotaService.reject_message(quota.reason))
+
+        job = CommandJob(
+            template_id=template.id,
+            command=command,
+            params=request.params,
+            user_id=user.id,
+            platform_id=request.platform_id,
+            total=len(devices),
+            queued=len(with_phone),
+            skipped=len(devices) - len(with_phone),
+        )
+        db.add(job)
+        db.flush()
+
+        log_rows = [
+            {
+                "device_id": device.id,
+                "message": f"Command {command}: {'queued' if device.phone else 'skipped'}",
+                "level": "SMS_OUT" if device.phone else "info",
+                "command": command,
+                "status": "queued" if device.phone else "skipped",
+                "response": None if device.phone else "Устройство не имеет номера телефона",
+                "extra_data": {"job_id": job.id},
+            }
+            for device in devices
+        ]
+        # Одна вставка executemany, id записей нужны для связи SMS с логом
+        log_ids = {
+            device_id: log_id
+            for log_id, device_id in db.execute(insert(Log).returning(Log.id, Log.device_id), log_rows).all()
+        }
+        sms_queue.enqueue_many(db, [
+            {
+                "phone": device.phone,
+                "text": command,
+                "log_id": log_ids[device.id],
+                "device_id": device.id,
+                "platform_id": device.platform_id,
+                "user_id": user.id,
+                "job_id": job.id,
+            }
+            for device in with_phone
+        ])
+        db.commit()
+        db.refresh(job)
+        if with_phone:
+            sms_queue.notify()
+        logger.info(
+            f"Задание {job.id}: команда '{command}' для {job.total} устройств, "
+            f"SMS в очереди {job.queued}, без номера {job.skipped}"
+        )
+        return job
+
+    @staticmethod
+    def get_progress(db: Session, job_id: int) -> Optional[Dict]:
+        job = db.query(CommandJob).filter(CommandJob.id == job_id).first()
+        if not job:
+            return None
+        counts = dict(
+            db.query(SMSOutbox.status, func.count(SMSOutbox.id))
+            .filter(SMSOutbox.job_id == job_id)
+            .group_by(SMSOutbox.status)
+            .all()
+        )
+        pending = counts.get("pending", 0)
+        processing = counts.get("processing", 0)
+        return {
+            "job_id": job.id,
+            "user_id": job.user_id,
+            "command": job.command,
+            "total": job.total,
+            "queued": job.queued,
+            "skipped": job.skipped,
+            "pending": pending,
+            "processing": processing,
+            "sent": counts.get("sent", 0),
+            "failed": counts.get("failed", 0),
+            "done": pending + processing == 0,
+            "created_at": job.created_at,
+        }
@@ -1,56 +1,23 @@
 from typing import Dict, Optional, List, Any
-import re
 from sqlalchemy.orm import Session
 from app.models.command_template import CommandTemplate
 from app.schemas.command_template import CommandParamSchema
 from app.models.log import Log
+from app.services.command_template_registry import CompiledParamsSchema, command_template_registry
 from datetime import datetime
 
 class CommandService:
     @staticmethod
     def validate_params(params: Dict, schema: Dict[str, Any]) -> Dict[str, List[str]]:
         """Валидация параметров команды с детализацией ошибок"""
-        errors = {}
-        required_params = set(schema.get("required", []))
-
-        for param_name, param_definition in schema.get("properties", {}).items():
-            value = params.get(param_name)
-
-            if param_name in required_params and value is None:
-                errors.setdefault(param_name, []).append("Parameter is required")
-                continue
-
-            if value is None:
-                continue
-
-            if param_definition.get("type") == "number" or param_definition.get("type") == "integer":
-                try:
-                    float(value)
-                except (ValueError, TypeError):
-                    errors.setdefault(param_name, []).append("Must be a number")
-            
-            if param_definition.get("pattern") and not re.match(param_definition["pattern"], str(value)):
-                errors.setdefault(param_name, []).append(f"Does not match pattern: {param_definition['pattern']}")
-            
-            if (param_definition.get("type") == "number" or param_definition.get("type") == "integer") and value is not None:
-                try:
-                    numeric_value = float(value)
-                    if param_definition.get("min") is not None and numeric_value < param_definition["min"]:
-                        errors.setdefault(param_name, []).append(f"Value must be >= {param_definition['min']}")
-                    
-                    if param_definition.get("max") is not None and numeric_value > param_definition["max"]:
-                        errors.setdefault(param_name, []).append(f"Value must be <= {param_definition['max']}")
-                except (ValueError, TypeError):
-                    pass # Error for non-numeric value should already be added by the 'number' type check or pattern check
-
-        return errors
+        return CompiledParamsSchema(schema).validate(params)
 
     @staticmethod
     def build_command(db: Session, template_id: int, params: dict):
-        template = db.query(CommandTemplate).get(template_id)
+        template = command_template_registry.get(db, template_id)
         if not template:
             return None
-        return {"command": template.template.format(**params)}
+        return {"command": template.render(params)}
 
     @staticmethod
     def get_templates(db: Session, model: str):
@@ -72,6 +39,7 @@ class CommandService:
             message=f"Command {command}: {status}",
             level=level,
             command=command,
+            status=status,
             response=response
         )
         db.add(log)
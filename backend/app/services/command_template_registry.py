@@ -0,0 +1,171 @@
+import logging
+import re
+import string
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.command_template import CommandTemplate
+from app.services.cache_invalidation import cache_invalidation
+
+logger = logging.getLogger(__name__)
+
+_NUMERIC_TYPES = ("number", "integer")
+
+class CompiledParam:
+    """Правила проверки одного параметра из params_schema"""
+
+    __slots__ = ("name", "required", "numeric", "min", "max", "pattern", "pattern_source", "pattern_error")
+
+    def __init__(self, name: str, definition: Dict[str, Any], required: bool):
+        self.name = name
+        self.required = required
+        self.numeric = definition.get("type") in _NUMERIC_TYPES
+        self.min = definition.get("min")
+        self.max = definition.get("max")
+        self.pattern_source = definition.get("pattern")
+        self.pattern = None
+        self.pattern_error = None
+        if self.pattern_source:
+            try:
+                self.pattern = re.compile(self.pattern_source)
+            except re.error as e:
+                self.pattern_error = f"Invalid pattern in template: {e}"
+
+    def validate(self, value: Any) -> List[str]:
+        if value is None:
+            return ["Parameter is required"] if self.required else []
+
+        errors = []
+        numeric_value = None
+        if self.numeric:
+            try:
+                numeric_value = float(value)
+            except (ValueError, TypeError):
+                errors.append("Must be a number")
+
+        if self.pattern_error:
+            errors.append(self.pattern_error)
+        elif self.pattern is not None and not self.pattern.match(str(value)):
+            errors.append(f"Does not match pattern: {self.pattern_source}")
+
+        if numeric_value is not None:
+            if self.min is not None and numeric_value < self.min:
+                errors.append(f"Value must be >= {self.min}")
+            if self.max is not None and numeric_value > self.max:
+                errors.append(f"Value must be <= {self.max}")
+        return errors
+
+class CompiledParamsSchema:
+    """params_schema шаблона, разобранная один раз"""
+
+    __slots__ = ("params",)
+
+    def __init__(self, schema: Optional[Dict[str, Any]]):
+        schema = schema or {}
+        required = set(schema.get("required", []))
+        self.params = [
+            CompiledParam(name, definition or {}, name in required)
+            for name, definition in schema.get("properties", {}).items()
+        ]
+
+    def validate(self, params: Dict) -> Dict[str, List[str]]:
+        errors = {}
+        for param in self.params:
+            param_errors = param.validate(params.get(param.name))
+            if param_errors:
+                errors[param.name] = param_errors
+        return errors
+
+class CompiledTemplate:
+    """
+    Шаблон команды с разобранной строкой формата. Простые подстановки
+    ({param}) выполняются конкатенацией, подстановки с форматом или
+    преобразованием ({param:03d}, {param!r}) - через format().
+    """
+
+    __slots__ = ("id", "model", "name", "template", "schema", "_segments", "_simple")
+
+    def __init__(self, template: CommandTemplate):
+        self.id = template.id
+        self.model = template.model
+        self.name = template.name
+        self.template = template.template
+        self.schema = CompiledParamsSchema(template.params_schema)
+        self._segments = list(string.Formatter().parse(template.template))
+        self._simple = all(
+            field is None or (field.isidentifier() and not spec and conversion is None)
+            for _, field, spec, conversion in self._segments
+        )
+
+    def validate(self, params: Dict) -> Dict[str, List[str]]:
+        return self.schema.validate(params)
+
+    def render(self, params: Dict) -> str:
+        """Подставить параметры. Отсутствующий параметр - KeyError, как у str.format"""
+        if not self._simple:
+            return self.template.format(**params)
+        parts = []
+        for literal, field, _, _ in self._segments:
+            parts.append(literal)
+            if field is not None:
+                parts.append(str(params[field]))
+        return "".join(parts)
+
+class CommandTemplateRegistry:
+    """
+    Скомпилированные шаблоны команд в памяти процесса.
+
+    Все строки command_templates загружаются при первом обращении и
+    перезагружаются раз в COMMAND_TEMPLATE_CACHE_TTL секунд. Эндпоинты
+    создания, изменения и удаления шаблонов вызывают invalidate(): запись
+    сбрасывается в этом процессе и, через cache_invalidation, в остальных.
+    """
+
+    def __init__(self, ttl: int):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._templates: Dict[int, CompiledTemplate] = {}
+        self._expires_at = 0.0
+
+    def _reload(self, db: Session) -> None:
+        compiled = {template.id: CompiledTemplate(template) for template in db.query(CommandTemplate).all()}
+        with self._lock:
+            self._templates = compiled
+            self._expires_at = time.monotonic() + self.ttl
+        logger.info(f"Реестр шаблонов команд загружен: {len(compiled)} шаблонов")
+
+    def get(self, db: Session, template_id: int) -> Optional[CompiledTemplate]:
+        if time.monotonic() >= self._expires_at:
+            self._reload(db)
+        with self._lock:
+            compiled = self._templates.get(template_id)
+        if compiled is not None:
+            return compiled
+        # Шаблон мог быть создан другим процессом после загрузки реестра
+        template = db.query(CommandTemplate).filter(CommandTemplate.id == template_id).first()
+        if template is None:
+            return None
+        compiled = CompiledTemplate(template)
+        with self._lock:
+            self._templates[template_id] = compiled
+        return compiled
+
+    def invalidate(self, template_id: Optional[int] = None) -> None:
+        """Сбросить шаблон (или весь реестр, если template_id не задан) во всех процессах"""
+        self.forget(template_id)
+        cache_invalidation.publish("command_templates", template_id)
+
+    def forget(self, template_id: Optional[int] = None) -> None:
+        """Сбросить шаблон (или весь реестр) только в этом процессе"""
+        with self._lock:
+            if template_id is None:
+                self._expires_at = 0.0
+            else:
+                self._templates.pop(template_id, None)
+
+command_template_registry = CommandTemplateRegistry(ttl=settings.COMMAND_TEMPLATE_CACHE_TTL)
+cache_invalidation.register("command_templates", lambda key: command_template_registry.forget(None if key is None else int(key)))
@@ -5,6 +5,10 @@ from ..models.device import Device, DeviceStatus
 from ..schemas.device import DeviceCreate, DeviceUpdate
 from ..services.command_service import CommandService
 from ..models.platform import Platform
+from ..services.platform_stats_service import PlatformStatsService
+from ..services.device_phone_cache import device_phone_cache
+from ..services.event_bus import event_bus
+from ..utils.phone import normalize_phone
 
 class DeviceService:
     @staticmethod
@@ -19,12 +23,26 @@ class DeviceService:
     def get_devices(db: Session, skip: int = 0, limit: int = 100) -> List[Device]:
         return db.query(Device).offset(skip).limit(limit).all()
 
+    @staticmethod
+    def ensure_phone_available(db: Session, phone: Optional[str], device_id: Optional[int] = None) -> None:
+        """400, если нормализованный номер уже принадлежит другому устройству"""
+        normalized_phone = normalize_phone(phone)
+        if not normalized_phone:
+            return
+        query = db.query(Device.id).filter(Device.phone_e164 == normalized_phone)
+        if device_id is not None:
+            query = query.filter(Device.id != device_id)
+        if query.first():
+            raise HTTPException(status_code=400, detail="Устройство с таким номером телефона уже существует")
+
     @staticmethod
     def create_device(db: Session, device: DeviceCreate) -> Device:
+        DeviceService.ensure_phone_available(db, device.phone)
         db_device = Device(**device.model_dump())
         db.add(db_device)
         db.commit()
         db.refresh(db_device)
+        device_phone_cache.update(db_device)
         return db_device
 
     @staticmethod
@@ -34,11 +52,14 @@ class DeviceService:
             raise HTTPException(status_code=404, detail="Device not found")
         
         update_data = device.model_dump(exclude_unset=True)
+        if update_data.get("phone"):
+            DeviceService.ensure_phone_available(db, update_data["phone"], device_id)
         for field, value in update_data.items():
             setattr(db_device, field, value)
         
         db.commit()
         db.refresh(db_device)
+        device_phone_cache.update(db_device)
         return db_device
 
     @staticmethod
@@ -47,6 +68,7 @@ class DeviceService:
         if device:
             db.delete(device)
             db.commit()
+            device_phone_cache.remove(device_id)
         return device
 
     @staticmethod
@@ -63,13 +85,20 @@ class DeviceService:
         
         db.commit()
         db.refresh(db_device)
+        event_bus.publish(
+            "device_status",
+            {"device_id": db_device.id, "status": getattr(db_device.status, "value", db_device.status)},
+            platform_id=db_device.platform_id,
+        )
         return db_device
 
     @staticmethod
     def get_device_by_phone(db: Session, phone: str) -> Optional[Device]:
-        # Нормализуем номер телефона для поиска: удаляем символ '+'
-        normalized_phone = phone.lstrip('+')
-        return db.query(Device).filter(Device.phone == normalized_phone).first()
+        # Номер приводится к E.164, id устройства берётся из карты номеров
+        device_ref = device_phone_cache.lookup(db, phone)
+        if device_ref is None:
+            return None
+        return db.get(Device, device_ref.id)
 
     @staticmethod
     def get_device_command_templates(db: Session, device_id: int) -> List[CommandService]:
@@ -89,7 +118,9 @@ class DeviceService:
         if not platform:
             raise HTTPException(status_code=404, detail="Platform not found")
 
+        PlatformStatsService.device_moved(db, device.platform_id, platform_id)
         device.platform_id = platform_id
         db.commit()
         db.refresh(device)
+        device_phone_cache.update(device)
         return device 
\ No newline at end of file
@@ -0,0 +1,121 @@
+import logging
+import threading
+import time
+from collections import namedtuple
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.device import Device
+from app.services.cache_invalidation import cache_invalidation
+from app.utils.phone import normalize_phone
+
+logger = logging.getLogger(__name__)
+
+DeviceRef = namedtuple("DeviceRef", ["id", "name", "platform_id"])
+
+class DevicePhoneCache:
+    """
+    Карта нормализованный номер (E.164) -> устройство в памяти процесса.
+
+    Загружается целиком при первом обращении и перезагружается раз в ttl
+    секунд (страховка на случай потерянных уведомлений). Эндпоинты создания,
+    изменения, перемещения и удаления устройств обновляют карту сразу после
+    коммита, остальные воркеры сбрасывают запись устройства по уведомлению
+    cache_invalidation. Номера, которых нет в карте, добираются одним
+    запросом IN (...).
+    """
+
+    def __init__(self, ttl: int):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._by_phone: Dict[str, DeviceRef] = {}
+        self._phone_by_id: Dict[int, str] = {}
+        self._expires_at = 0.0
+
+    def _reload(self, db: Session) -> None:
+        rows = db.query(Device.id, Device.name, Device.platform_id, Device.phone_e164).filter(
+            Device.phone_e164.isnot(None)
+        ).all()
+        with self._lock:
+            self._by_phone = {row.phone_e164: DeviceRef(row.id, row.name, row.platform_id) for row in rows}
+            self._phone_by_id = {row.id: row.phone_e164 for row in rows}
+            self._expires_at = time.monotonic() + self.ttl
+        logger.info(f"Карта номеров устройств загружена: {len(rows)} номеров")
+
+    def _ensure_loaded(self, db: Session) -> None:
+        if time.monotonic() >= self._expires_at:
+            self._reload(db)
+
+    def _discard_locked(self, device_id: int) -> None:
+        phone = self._phone_by_id.pop(device_id, None)
+        current = self._by_phone.get(phone) if phone else None
+        if current is not None and current.id == device_id:
+            del self._by_phone[phone]
+
+    def _put_locked(self, phone_e164: Optional[str], ref: DeviceRef) -> None:
+        self._discard_locked(ref.id)
+        if phone_e164:
+            self._by_phone[phone_e164] = ref
+            self._phone_by_id[ref.id] = phone_e164
+
+    def update(self, device: Device) -> None:
+        """Учесть устройство после коммита (создание, смена номера, имени или платформы)"""
+        with self._lock:
+            self._put_locked(device.phone_e164, DeviceRef(device.id, device.name, device.platform_id))
+        cache_invalidation.publish("device_phones", device.id)
+
+    def remove(self, device_id: int) -> None:
+        self.forget(device_id)
+        cache_invalidation.publish("device_phones", device_id)
+
+    def forget(self, device_id: Optional[int] = None) -> None:
+        """
+        Сбросить запись устройства только в этом процессе (следующий поиск
+        его номера пойдёт в БД); без device_id - перезагрузить карту целиком
+        """
+        with self._lock:
+            if device_id is None:
+                self._expires_at = 0.0
+            else:
+                self._discard_locked(device_id)
+
+    def lookup(self, db: Session, phone: str) -> Optional[DeviceRef]:
+        normalized = normalize_phone(phone)
+        if not normalized:
+            return None
+        return self.lookup_many(db, [normalized]).get(normalized)
+
+    def lookup_many(self, db: Session, phones: Iterable[str]) -> Dict[str, DeviceRef]:
+        """
+        Найти устройства по нормализованным номерам. Промахи проверяются в БД
+        одним запросом, найденные устройства добавляются в карту.
+        """
+        self._ensure_loaded(db)
+        found: Dict[str, DeviceRef] = {}
+        missing = []
+        with self._lock:
+            for phone in set(phones):
+                ref = self._by_phone.get(phone)
+                if ref is not None:
+                    found[phone] = ref
+                else:
+                    missing.append(phone)
+        if missing:
+            rows = db.query(Device.id, Device.name, Device.platform_id, Device.phone_e164).filter(
+                Device.phone_e164.in_(missing)
+            ).all()
+            with self._lock:
+                for row in rows:
+                    ref = DeviceRef(row.id, row.name, row.platform_id)
+                    self._put_locked(row.phone_e164, ref)
+                    found[row.phone_e164] = ref
+        return found
+
+    def size(self) -> int:
+        with self._lock:
+            return len(self._by_phone)
+
+device_phone_cache = DevicePhoneCache(ttl=settings.DEVICE_PHONE_CACHE_TTL)
+cache_invalidation.register("device_phones", lambda key: device_phone_cache.forget(None if key is None else int(key)))
@@ -0,0 +1,203 @@
+import asyncio
+import json
+import logging
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Optional, Set
+
+from app.core.config import settings
+from app.utils.async_loop import call_soon_in_loop
+
+logger = logging.getLogger(__name__)
+
+class Subscription:
+    """
+    Подписка одного WebSocket-клиента. События складываются в ограниченную
+    очередь; если клиент не успевает читать, самые старые события отбрасываются.
+    """
+
+    def __init__(self, user_id: int, is_superadmin: bool, platform_ids: Set[int]):
+        self.user_id = user_id
+        self.is_superadmin = is_superadmin
+        self.allowed_platform_ids = set(platform_ids)
+        self.platform_ids: Optional[Set[int]] = None  # None - все доступные платформы
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=settings.WS_QUEUE_SIZE)
+        self.recheck = asyncio.Event()  # Роли или учётная запись изменились - перепроверить доступ
+        self.dropped = 0
+
+    def update_access(self, is_superadmin: bool, platform_ids: Set[int]) -> None:
+        """Применить перепроверенный доступ: выбранные платформы сужаются до доступных"""
+        self.is_superadmin = is_superadmin
+        self.allowed_platform_ids = set(platform_ids)
+        if self.platform_ids is not None and not is_superadmin:
+            self.platform_ids &= self.allowed_platform_ids
+
+    def set_platforms(self, platform_ids: Optional[Iterable[int]]) -> Optional[Set[int]]:
+        """Сузить подписку до указанных платформ (в пределах доступных пользователю)"""
+        if platform_ids is None:
+            self.platform_ids = None
+        elif self.is_superadmin:
+            self.platform_ids = set(platform_ids)
+        else:
+            self.platform_ids = set(platform_ids) & self.allowed_platform_ids
+        return self.platform_ids
+
+    def wants(self, event: Dict) -> bool:
+        if event.get("user_id") is not None:
+            return event["user_id"] == self.user_id
+        platform_id = event.get("platform_id")
+        if platform_id is None:
+            # События без платформы (устройства вне платформ) видит только superadmin
+            return self.is_superadmin
+        if self.platform_ids is not None and platform_id not in self.platform_ids:
+            return False
+        return self.is_superadmin or platform_id in self.allowed_platform_ids
+
+    def push(self, event: Dict) -> None:
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(event)
+
+class EventBus:
+    """
+    Внутренняя шина событий для push-канала /ws.
+
+    publish() можно вызывать из любого потока (sync-обработчики в threadpool,
+    воркеры очередей): событие передаётся в event loop приложения. При
+    EVENT_BUS_BACKEND="redis" события идут через Redis pub/sub и доходят до
+    клиентов всех воркеров gunicorn; "memory" - только в пределах процесса.
+    """
+
+    def __init__(self, backend: str = "memory"):
+        self.backend = backend
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._subscriptions: Set[Subscription] = set()
+        self._redis = None
+        self._listener: Optional[asyncio.Task] = None
+        self._publish_tasks: Set[asyncio.Task] = set()
+        self.published = 0
+        self.delivered = 0
+
+    def subscribe(self, user_id: int, is_superadmin: bool, platform_ids: Iterable[int]) -> Subscription:
+        subscription = Subscription(user_id, is_superadmin, set(platform_ids))
+        self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        self._subscriptions.discard(subscription)
+
+    def publish(
+        self,
+        event_type: str,
+        data: Optional[Dict] = None,
+        user_id: Optional[int] = None,
+        platform_id: Optional[int] = None,
+    ) -> None:
+        """
+        Опубликовать событие. Адресат - пользователь (user_id), участники
+        платформы (platform_id) или, если не задано ни то ни другое, superadmin.
+        """
+        if self._loop is None or self._loop.is_closed():
+            return
+        event = {
+            "type": event_type,
+            "data": data or {},
+            "user_id": user_id,
+            "platform_id": platform_id,
+            "ts": datetime.now(timezone.utc).isoformat(),
+        }
+        call_soon_in_loop(self._loop, self._dispatch, event)
+
+    def _dispatch(self, event: Dict) -> None:
+        self.published += 1
+        if self._redis is not None:
+            # Ссылка на задачу нужна, иначе сборщик мусора может удалить её до завершения
+            task = asyncio.create_task(self._redis_publish(event))
+            self._publish_tasks.add(task)
+            task.add_done_callback(self._publish_tasks.discard)
+        else:
+            self._deliver(event)
+
+    def revalidate(self, user_id: Optional[int] = None) -> None:
+        """
+        Запросить перепроверку доступа подписок пользователя (или всех): роли
+        или учётная запись изменились. Можно вызывать из любого потока.
+        """
+        call_soon_in_loop(self._loop, self._mark_for_recheck, user_id)
+
+    def _mark_for_recheck(self, user_id: Optional[int]) -> None:
+        for subscription in list(self._subscriptions):
+            if user_id is None or subscription.user_id == user_id:
+                subscription.recheck.set()
+
+    async def _redis_publish(self, event: Dict) -> None:
+        try:
+            await self._redis.publish(settings.EVENT_BUS_CHANNEL, json.dumps(event, default=str))
+        except Exception as e:
+            # Redis недоступен: клиенты этого процесса всё равно получат событие
+            logger.warning(f"Не удалось опубликовать событие {event['type']} в Redis: {e}")
+            self._deliver(event)
+
+    def _deliver(self, event: Dict) -> None:
+        for subscription in list(self._subscriptions):
+            if subscription.wants(event):
+                subscription.push(event)
+                self.delivered += 1
+
+    async def _listen(self) -> None:
+        """Получение событий всех воркеров из Redis с переподключением"""
+        delay = 1
+        while True:
+            pubsub = self._redis.pubsub()
+            try:
+                await pubsub.subscribe(settings.EVENT_BUS_CHANNEL)
+                delay = 1
+                async for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    try:
+                        self._deliver(json.loads(message["data"]))
+                    except (TypeError, ValueError) as e:
+                        logger.warning(f"Некорректное событие в канале {settings.EVENT_BUS_CHANNEL}: {e}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Ошибка подписки на события Redis: {e}, повтор через {delay}с")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30)
+            finally:
+                try:
+                    await pubsub.close()
+                except Exception:
+                    pass
+
+    async def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        if self.backend == "redis":
+            import redis.asyncio as aioredis
+            self._redis = aioredis.Redis.from_url(settings.REDIS_URL)
+            self._listener = asyncio.create_task(self._listen())
+        logger.info(f"Шина событий запущена (backend: {self.backend})")
+
+    async def stop(self) -> None:
+        if self._publish_tasks:
+            await asyncio.gather(*self._publish_tasks, return_exceptions=True)
+        if self._listener is not None:
+            self._listener.cancel()
+            await asyncio.gather(self._listener, return_exceptions=True)
+            self._listener = None
+        if self._redis is not None:
+            await self._redis.close()
+            self._redis = None
+        self._loop = None
+
+    def get_metrics(self) -> Dict:
+        return {
+            "backend": self.backend,
+            "subscribers": len(self._subscriptions),
+            "published": self.published,
+            "delivered": self.delivered,
+            "dropped": sum(subscription.dropped for subscription in self._subscriptions),
+        }
+
+event_bus = EventBus(backend=settings.EVENT_BUS_BACKEND)
@@ -0,0 +1,510 @@
+import logging
+import re
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import DateTime, Integer, String, and_, column, or_, update, values
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.alert import Alert
+from app.models.command_template import CommandTemplate
+from app.models.device import Device
+from app.schemas.grafana import GrafanaAlert, GrafanaWebhookPayload
+from app.services.alert_sms_coalescing import ALERT_SMS_PREFIX, SUPPRESSED_FLAPPING, AlertSMSCoalescing
+from app.services.event_bus import event_bus
+from app.services.notification_service import NotificationService
+from app.services.open_alert_registry import open_alert_registry
+from app.services.platform_stats_service import NO_PLATFORM, PlatformStatsService, is_firing, is_resolved
+from app.services.sms_queue import sms_queue
+from app.services.sms_quota import SMSQuotaService
+
+logger = logging.getLogger(__name__)
+
+_DT_RE = re.compile(r"^(\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2})(\.\d{1,6})?(\d*)([+-]\d{2}:\d{2}|Z)$")
+
+def truncate_microseconds(dt_str: str) -> str:
+    """Grafana присылает наносекунды - обрезаем до микросекунд для fromisoformat"""
+    if not dt_str:
+        return dt_str
+    match = _DT_RE.match(dt_str)
+    if match:
+        base = match.group(1)
+        microseconds = match.group(2) or ".000000"
+        tz_info = match.group(4)
+        return f"{base}{microseconds[:7]}{tz_info}"
+    return dt_str
+
+def parse_grafana_datetime(dt_str: str) -> datetime:
+    return datetime.fromisoformat(dt_str.replace("Z", "+00:00"))
+
+AlertKey = Tuple[str, Optional[int], Optional[str]]
+
+class _AlertIndex:
+    """
+    Алерты, относящиеся к пакету, в памяти: по fingerprint (external_id) и
+    по ключу (alert_name, device_id, player_id) для активных (status='firing').
+    Обновляется по ходу обработки, чтобы алерты одного пакета видели друг друга.
+    """
+
+    def __init__(self, alerts: List[Alert]):
+        self.alerts: List[Alert] = []
+        self.by_external_id: Dict[str, Alert] = {}
+        self.open_by_key: Dict[AlertKey, List[Alert]] = defaultdict(list)
+        for alert in alerts:
+            self.add(alert)
+
+    @staticmethod
+    def key_of(alert: Alert) -> AlertKey:
+        return alert.alert_name, alert.device_id, alert.grafana_player_id
+
+    def add(self, alert: Alert) -> None:
+        self.alerts.append(alert)
+        if alert.external_id:
+            self.by_external_id.setdefault(alert.external_id, alert)
+        if alert.status == "firing":
+            self.open_by_key[self.key_of(alert)].append(alert)
+
+    def status_changed(self, alert: Alert) -> None:
+        candidates = self.open_by_key[self.key_of(alert)]
+        if alert.status == "firing":
+            if alert not in candidates:
+                candidates.append(alert)
+        elif alert in candidates:
+            candidates.remove(alert)
+
+    def latest_open(self, key: AlertKey) -> Optional[Alert]:
+        candidates = [alert for alert in self.open_by_key.get(key, []) if alert.status == "firing"]
+        if not candidates:
+            return None
+        return max(candidates, key=lambda alert: alert.created_at)
+
+    def open_by_fingerprint(self, fingerprint: Optional[str]) -> Optional[Alert]:
+        if not fingerprint:
+            return None
+        alert = self.by_external_id.get(fingerprint)
+        return alert if alert is not None and alert.status == "firing" else None
+
+class GrafanaWebhookProcessor:
+    """
+    Пакетная обработка вебхука Grafana.
+
+    Устройства и связанные алерты всего пакета загружаются двумя запросами,
+    сопоставление выполняется в памяти, все изменения (алерты, счётчики
+    платформ, очередь SMS) записываются одной транзакцией.
+    """
+
+    @staticmethod
+    def _prefetch_devices(db: Session, alerts: List[GrafanaAlert]) -> Dict[str, Device]:
+        player_ids = {alert.labels.player_id for alert in alerts if alert.labels.player_id}
+        if not player_ids:
+            return {}
+        devices = db.query(Device).filter(Device.grafana_uid.in_(player_ids)).all()
+        return {device.grafana_uid: device for device in devices}
+
+    @staticmethod
+    def _prefetch_alerts(db: Session, alerts: List[GrafanaAlert]) -> List[Alert]:
+        fingerprints = {alert.fingerprint for alert in alerts if alert.fingerprint}
+        names = {alert.labels.alertname for alert in alerts}
+        player_ids = {alert.labels.player_id for alert in alerts if alert.labels.player_id}
+        without_player = any(not alert.labels.player_id for alert in alerts)
+
+        player_conditions = []
+        if player_ids:
+            player_conditions.append(Alert.grafana_player_id.in_(player_ids))
+        if without_player:
+            player_conditions.append(Alert.grafana_player_id.is_(None))
+
+        conditions = []
+        if fingerprints:
+            # По fingerprint - алерт в любом статусе (external_id уникален)
+            conditions.append(Alert.external_id.in_(fingerprints))
+        if names and player_conditions:
+            conditions.append(and_(
+                Alert.status == "firing",
+                Alert.alert_name.in_(names),
+                or_(*player_conditions),
+            ))
+        if not conditions:
+            return []
+        return db.query(Alert).filter(or_(*conditions)).all()
+
+    @staticmethod
+    def _refresh_open_alerts(db: Session, now: datetime, refreshes: Dict[int, tuple]) -> set:
+        """
+        Повторный firing алертов, найденных в реестре: один UPDATE ... FROM (VALUES ...)
+        без предварительного SELECT. Возвращает id реально обновлённых алертов -
+        алерт мог быть закрыт другим процессом, тогда он обрабатывается обычным путём.
+        """
+        data = values(
+            column("id", Integer), column("timestamp", DateTime), column("severity", String),
+            name="refresh",
+        ).data([(alert_id, starts_at, severity) for alert_id, (_, starts_at, severity) in refreshes.items()])
+        stmt = (
+            update(Alert)
+            .where(Alert.id == data.c.id, Alert.status == "firing")
+            .values(updated_at=now, timestamp=data.c.timestamp, severity=data.c.severity)
+            .returning(Alert.id)
+            .execution_options(synchronize_session=False)
+        )
+        return set(db.execute(stmt).scalars().all())
+
+    @staticmethod
+    def _sms_text(
+        device: Device,
+        templates: Dict[int, CommandTemplate],
+        alert_name: str,
+        alert_status: str,
+        player_name: str,
+        player_id_str: Optional[str],
+        platform: str,
+        summary: str,
+    ) -> str:
+        default_text = f"{ALERT_SMS_PREFIX}{alert_name}: {summary}"
+        if not device.alert_sms_template_id:
+            logger.info(f"Для устройства {device.name} включена отправка SMS, но шаблон не выбран. Использую стандартное сообщение.")
+            return default_text
+        command_template = templates.get(device.alert_sms_template_id)
+        if not command_template:
+            logger.warning(f"Шаблон команды с ID {device.alert_sms_template_id} не найден для устройства {device.name}. Использую стандартное сообщение.")
+            return default_text
+        try:
+            # Форматируем шаблон, используя доступные данные алерта
+            return command_template.template.format(
+                alert_name=alert_name,
+                alert_status=alert_status.upper(),
+                player_name=player_name,
+                player_id_str=player_id_str or 'N/A',
+                platform=platform,
+                summary=summary
+            ) or default_text
+        except KeyError as e:
+            logger.error(f"Ошибка форматирования шаблона SMS (неизвестный ключ {e}): {command_template.template}")
+            return default_text
+
+    @staticmethod
+    def _apply_stats(
+        db: Session,
+        devices: Dict[str, Device],
+        deltas: Dict[Optional[int], List],
+    ) -> Dict[int, List]:
+        """
+        Применить накопленные изменения счётчиков: один UPSERT на платформу.
+        Возвращает изменения по платформам [firing, resolved, alert_at]
+        """
+        if not deltas:
+            return {}
+        platform_by_device = {device.id: device.platform_id for device in devices.values()}
+        unknown = [device_id for device_id in deltas if device_id and device_id not in platform_by_device]
+        if unknown:
+            platform_by_device.update(
+                db.query(Device.id, Device.platform_id).filter(Device.id.in_(unknown)).all()
+            )
+
+        per_platform: Dict[int, List] = {}
+        for device_id, (firing, resolved, alert_at) in deltas.items():
+            platform_id = (platform_by_device.get(device_id) if device_id else None) or NO_PLATFORM
+            total = per_platform.setdefault(platform_id, [0, 0, None])
+            total[0] += firing
+            total[1] += resolved
+            if alert_at is not None and (total[2] is None or alert_at > total[2]):
+                total[2] = alert_at
+        for platform_id, (firing, resolved, alert_at) in per_platform.items():
+            if firing or resolved or alert_at is not None:
+                PlatformStatsService.apply(db, platform_id, firing=firing, resolved=resolved, alert_at=alert_at)
+        return per_platform
+
+    @staticmethod
+    def _platform_notification(platform_id: int, alert_names: List[str]) -> Dict:
+        """Уведомление участникам платформы о новых алертах её устройств"""
+        if len(alert_names) == 1:
+            title = f"Сработал алерт: {alert_names[0]}"
+        else:
+            title = f"Сработало алертов: {len(alert_names)}"
+        shown = alert_names[:settings.ALERT_NOTIFY_MAX_NAMES]
+        message = "\n".join(shown)
+        if len(alert_names) > len(shown):
+            message += f"\n… и ещё {len(alert_names) - len(shown)}"
+        return {"platform_id": platform_id, "title": title[:255], "message": message, "type": "alert"}
+
+    @staticmethod
+    def process(db: Session, payload: GrafanaWebhookPayload) -> Dict:
+        """Обработать все алерты вебхука. Транзакция фиксируется один раз в конце"""
+        alerts = payload.alerts or []
+        result = {"alerts": len(alerts), "created": 0, "updated": 0, "resolved": 0, "ignored": 0, "sms_queued": 0, "sms_rejected": 0, "sms_suppressed": 0, "notifications": 0}
+        if not alerts:
+            return result
+
+        devices = GrafanaWebhookProcessor._prefetch_devices(db, alerts)
+        now = datetime.now(timezone.utc)
+
+        def alert_key(alert_data: GrafanaAlert) -> AlertKey:
+            device = devices.get(alert_data.labels.player_id) if alert_data.labels.player_id else None
+            return alert_data.labels.alertname, device.id if device else None, alert_data.labels.player_id
+
+        # Быстрый путь: повторный firing алерта, который есть в реестре активных алертов.
+        # Ключи, которые в этом же пакете закрываются, идут обычным путём, чтобы сохранить порядок.
+        resolved_keys = {alert_key(alert_data) for alert_data in alerts if alert_data.status.lower() == "resolved"}
+        refreshes: Dict[int, tuple] = {}
+        remaining: List[GrafanaAlert] = []
+        for alert_data in alerts:
+            key = alert_key(alert_data)
+            if alert_data.status.lower() != "resolved" and key not in resolved_keys:
+                alert_id = open_alert_registry.find(alert_data.fingerprint, key)
+                if alert_id is not None and alert_id not in refreshes:
+                    starts_at = parse_grafana_datetime(truncate_microseconds(alert_data.startsAt))
+                    refreshes[alert_id] = (alert_data, starts_at, alert_data.labels.severity or "info")
+                    continue
+            remaining.append(alert_data)
+        if refreshes:
+            refreshed = GrafanaWebhookProcessor._refresh_open_alerts(db, now, refreshes)
+            result["updated"] += len(refreshed)
+            for alert_id, (alert_data, _, _) in refreshes.items():
+                if alert_id not in refreshed:
+                    open_alert_registry.discard(alert_id)
+                    remaining.append(alert_data)
+
+        index = _AlertIndex(GrafanaWebhookProcessor._prefetch_alerts(db, remaining) if remaining else [])
+        summary = payload.commonAnnotations.summary if payload.commonAnnotations and payload.commonAnnotations.summary else "Нет описания"
+
+        # device_id -> [изменение firing, изменение resolved, время последнего алерта]
+        stats_deltas: Dict[Optional[int], List] = {}
+
+        def count_status_change(device_id, old_status, new_status, alert_at=None):
+            delta = stats_deltas.setdefault(device_id, [0, 0, None])
+            delta[0] += int(is_firing(new_status)) - int(is_firing(old_status))
+            delta[1] += int(is_resolved(new_status)) - int(is_resolved(old_status))
+            if alert_at is not None and (delta[2] is None or alert_at > delta[2]):
+                delta[2] = alert_at
+
+        new_alerts: List[Alert] = []
+        pending_sms = []  # (алерт, устройство, текст)
+        platform_alerts: Dict[int, List[str]] = defaultdict(list)  # платформа -> новые firing алерты для уведомлений
+        resolved_alert_ids: List[int] = []
+        for alert_data in remaining:
+            alert_name = alert_data.labels.alertname
+            alert_status = alert_data.status
+            player_name = alert_data.labels.player_name or "Неизвестный плеер"
+            player_id_str = alert_data.labels.player_id
+            platform = alert_data.labels.platform or "Неизвестная платформа"
+            severity = alert_data.labels.severity or "info"
+            processed_starts_at = truncate_microseconds(alert_data.startsAt)
+            processed_ends_at = truncate_microseconds(alert_data.endsAt)
+
+            device = devices.get(player_id_str) if player_id_str else None
+            if player_id_str and not device:
+                logger.warning(f"Устройство с grafana_uid {player_id_str} не найдено.")
+            device_id_for_alert = device.id if device else None
+            key = (alert_name, device_id_for_alert, player_id_str)
+
+            # 1. Resolved: закрыть последний активный алерт с тем же ключом
+            if alert_status.lower() == "resolved":
+                existing_firing_alert = index.latest_open(key)
+                if existing_firing_alert:
+                    count_status_change(existing_firing_alert.device_id, existing_firing_alert.status, alert_status)
+                    existing_firing_alert.status = alert_status
+                    existing_firing_alert.updated_at = now
+                    index.status_changed(existing_firing_alert)
+                    resolved_alert_ids.append(existing_firing_alert.id)
+                    result["resolved"] += 1
+                    logger.info(f"Алерт (ID: {existing_firing_alert.id}, FINGERPRINT: {existing_firing_alert.external_id}) переведён в 'resolved'.")
+                else:
+                    result["ignored"] += 1
+                    logger.warning(f"Получен RESOLVED алерт для {alert_name} (player_id: {player_id_str}) но не найдено соответствующего FIRING алерта для разрешения. Игнорирую этот resolved алерт согласно логике.")
+                continue
+
+            starts_at = parse_grafana_datetime(processed_starts_at)
+
+            # 2. Повторный firing: обновить активный алерт (по fingerprint, затем по ключу)
+            existing_active_firing_alert = index.open_by_fingerprint(alert_data.fingerprint) or index.latest_open(key)
+            if existing_active_firing_alert:
+                existing_active_firing_alert.updated_at = now
+                existing_active_firing_alert.timestamp = starts_at
+                existing_active_firing_alert.severity = severity
+                result["updated"] += 1
+                continue
+
+            alert_message = f"🚨 АЛЕРТ: {alert_name} ({alert_status.upper()})\n\nПлеер: {player_name} ({player_id_str or 'N/A'})\nПлатформа: {platform}\nОписание: {summary}"
+            alert_data_dict = {
+                "alert_name": alert_name,
+                "player_name": player_name,
+                "player_id": player_id_str,
+                "platform": platform,
+                "summary": summary,
+                "startsAt": processed_starts_at,
+                "endsAt": processed_ends_at,
+                "severity": severity,
+                "grafana_folder": alert_data.labels.grafana_folder,
+                "instance": alert_data.labels.instance,
+                "job": alert_data.labels.job,
+                "alert_type": alert_data.labels.alert_type or "generic",
+                "device_id": device_id_for_alert,
+                "device_phone_number": device.phone if device else None,
+                "fingerprint": alert_data.fingerprint,
+                "status": alert_status,
+                "message": alert_message
+            }
+
+            # 3. Алерт с таким fingerprint уже есть (не активный) - обновляем его, а не создаём новый
+            existing_alert_by_external_id = index.by_external_id.get(alert_data.fingerprint) if alert_data.fingerprint else None
+            if existing_alert_by_external_id:
+                count_status_change(existing_alert_by_external_id.device_id, existing_alert_by_external_id.status, alert_status)
+                existing_alert_by_external_id.status = alert_status
+                existing_alert_by_external_id.updated_at = now
+                existing_alert_by_external_id.severity = severity
+                existing_alert_by_external_id.timestamp = starts_at
+                existing_alert_by_external_id.details = alert_data_dict
+                index.status_changed(existing_alert_by_external_id)
+                result["updated"] += 1
+                continue
+
+            # 4. Новый алерт
+            alert_title = payload.title or alert_name or "Generated Alert Title"
+            db_alert = Alert(
+                device_id=device_id_for_alert,
+                alert_name=alert_name,
+                alert_type=alert_data.labels.alert_type or "generic",
+                message=alert_message,
+                data=alert_data_dict,
+                severity=severity,
+                status=alert_status,
+                grafana_player_id=player_id_str,
+                created_at=starts_at,
+                source="Grafana",
+                title=alert_title,
+                timestamp=starts_at,
+                external_id=alert_data.fingerprint,
+                details=alert_data_dict,
+            )
+            new_alerts.append(db_alert)
+            index.add(db_alert)
+            count_status_change(device_id_for_alert, None, alert_status, alert_at=starts_at)
+            result["created"] += 1
+
+            if device and device.platform_id and alert_status.lower() == "firing":
+                platform_alerts[device.platform_id].append(f"{alert_name} ({device.name})")
+
+            if device and device.phone and alert_status.lower() == "firing" and device.send_alert_sms:
+                pending_sms.append((db_alert, device, (alert_name, alert_status, player_name, player_id_str, platform, summary)))
+
+        try:
+            db.add_all(new_alerts)
+            platform_deltas = GrafanaWebhookProcessor._apply_stats(db, devices, stats_deltas)
+
+            if pending_sms:
+                template_ids = {device.alert_sms_template_id for _, device, _ in pending_sms if device.alert_sms_template_id}
+                templates = {}
+                if template_ids:
+                    templates = {
+                        template.id: template
+                        for template in db.query(CommandTemplate).filter(CommandTemplate.id.in_(template_ids)).all()
+                    }
+                # id новых алертов нужны для очереди SMS: один flush на весь пакет
+                db.flush()
+                messages = []
+
+                # Подавление флапающих алертов: решение записывается в очередь со статусом 'suppressed'
+                flapping = AlertSMSCoalescing.flapping_keys(
+                    db, {(db_alert.alert_name, device.id) for db_alert, device, _ in pending_sms}
+                )
+                if flapping:
+                    to_send = []
+                    for db_alert, device, fields in pending_sms:
+                        fired = flapping.get((db_alert.alert_name, device.id))
+                        if fired is None:
+                            to_send.append((db_alert, device, fields))
+                            continue
+                        db_alert.response = (
+                            f"SMS подавлено: алерт сработал {fired} раз за {settings.ALERT_FLAP_WINDOW // 60} мин"
+                        )
+                        messages.append({
+                            "phone": device.phone,
+                            "text": GrafanaWebhookProcessor._sms_text(device, templates, *fields),
+                            "alert_id": db_alert.id,
+                            "device_id": device.id,
+                            "platform_id": device.platform_id,
+                            "status": "suppressed",
+                            "suppressed_reason": SUPPRESSED_FLAPPING,
+                        })
+                        result["sms_suppressed"] += 1
+                    pending_sms = to_send
+
+                # SMS ждёт окно объединения устройства (платформы), чтобы уйти одним сообщением с последующими
+                platform_windows = AlertSMSCoalescing.platform_windows(db, [device for _, device, _ in pending_sms])
+
+                # Квота списывается одним запросом на платформу; SMS сверх остатка не ставятся в очередь
+                requested = defaultdict(int)
+                for _, device, _ in pending_sms:
+                    requested[device.platform_id] += 1
+                quotas = {
+                    platform_id: SMSQuotaService.consume(db, platform_id, count=count, partial=True)
+                    for platform_id, count in requested.items()
+                }
+                quota_left = {platform_id: quota.granted for platform_id, quota in quotas.items()}
+                for db_alert, device, fields in pending_sms:
+                    if not quota_left[device.platform_id]:
+                        reason = quotas[device.platform_id].reason
+                        db_alert.response = f"SMS не отправлено: {SMSQuotaService.reject_message(reason)}"
+                        result["sms_rejected"] += 1
+                        continue
+                    quota_left[device.platform_id] -= 1
+                    sms_command_text = GrafanaWebhookProcessor._sms_text(device, templates, *fields)
+                    # Отправку выполняет фоновый воркер очереди SMS: он запишет результат
+                    # в response алерта и переведёт его в firing_sms_sent / firing_sms_failed
+                    db_alert.response = f"SMS поставлено в очередь: {sms_command_text}"
+                    messages.append({
+                        "phone": device.phone,
+                        "text": sms_command_text,
+                        "alert_id": db_alert.id,
+                        "device_id": device.id,
+                        "platform_id": device.platform_id,
+                        "next_attempt_at": now + timedelta(seconds=AlertSMSCoalescing.window_for(device, platform_windows)),
+                    })
+                    result["sms_queued"] += 1
+                sms_queue.enqueue_many(db, messages)
+
+            # Уведомления участникам платформ: одна вставка на весь вебхук
+            notifications = []
+            if platform_alerts and settings.ALERT_NOTIFY_PLATFORM_USERS:
+                notifications = NotificationService(db).create_platform_notifications([
+                    GrafanaWebhookProcessor._platform_notification(platform_id, names)
+                    for platform_id, names in platform_alerts.items()
+                ])
+                result["notifications"] = len(notifications)
+
+            # Алерты, закрытые до отправки SMS (флап в пределах окна объединения) - SMS отменяется
+            result["sms_suppressed"] += AlertSMSCoalescing.cancel_resolved(db, resolved_alert_ids)
+
+            db.flush()
+            # Состояние затронутых алертов для реестра - до commit, пока объекты не устарели
+            touched = [
+                (alert.id, alert.status, alert.external_id, _AlertIndex.key_of(alert), alert.created_at)
+                for alert in index.alerts
+            ]
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+        for state in touched:
+            open_alert_registry.sync(*state)
+
+        if result["sms_queued"]:
+            sms_queue.notify()
+        NotificationService.publish_created(notifications)
+        # Push-канал /ws: изменения по алертам для участников платформы
+        for platform_id, (firing, resolved, alert_at) in platform_deltas.items():
+            if firing or resolved:
+                event_bus.publish(
+                    "alerts",
+                    {"firing": firing, "resolved": resolved, "last_alert_at": alert_at.isoformat() if alert_at else None},
+                    platform_id=None if platform_id == NO_PLATFORM else platform_id,
+                )
+        logger.info(
+            f"Вебхук Grafana обработан: алертов {result['alerts']}, создано {result['created']}, "
+            f"обновлено {result['updated']}, разрешено {result['resolved']}, "
+            f"пропущено {result['ignored']}, SMS в очереди {result['sms_queued']}, "
+            f"отклонено квотой {result['sms_rejected']}, подавлено {result['sms_suppressed']}"
+        )
+        return result
@@ -0,0 +1,53 @@
+import logging
+from typing import Optional
+
+import aiohttp
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Общая HTTP-сессия процесса: один пул keep-alive соединений для SMS-шлюза,
+# опроса входящих SMS и проверок состояния шлюза
+_session: Optional[aiohttp.ClientSession] = None
+
+def _create_session() -> aiohttp.ClientSession:
+    connector = aiohttp.TCPConnector(
+        limit=settings.HTTP_POOL_LIMIT,
+        limit_per_host=settings.HTTP_POOL_LIMIT_PER_HOST,
+        keepalive_timeout=settings.HTTP_KEEPALIVE_TIMEOUT,
+    )
+    timeout = aiohttp.ClientTimeout(
+        total=settings.HTTP_TIMEOUT,
+        connect=settings.HTTP_CONNECT_TIMEOUT,
+    )
+    logger.info(
+        f"Создан общий HTTP-пул: limit={settings.HTTP_POOL_LIMIT}, "
+        f"limit_per_host={settings.HTTP_POOL_LIMIT_PER_HOST}, timeout={settings.HTTP_TIMEOUT}с"
+    )
+    return aiohttp.ClientSession(connector=connector, timeout=timeout)
+
+async def start_http_session() -> aiohttp.ClientSession:
+    """Создать общую сессию (вызывается из lifespan приложения)"""
+    global _session
+    if _session is None or _session.closed:
+        _session = _create_session()
+    return _session
+
+async def close_http_session() -> None:
+    """Закрыть общую сессию и все соединения пула"""
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+        logger.info("Общий HTTP-пул закрыт")
+    _session = None
+
+def get_http_session() -> aiohttp.ClientSession:
+    """
+    Вернуть общую сессию. Если lifespan не запускался (скрипты, бенчмарки),
+    сессия создаётся лениво в текущем event loop.
+    """
+    global _session
+    if _session is None or _session.closed:
+        _session = _create_session()
+    return _session
@@ -1,27 +1,94 @@
-from sqlalchemy.orm import Session
-from typing import List, Optional
+import base64
+from datetime import datetime
+from sqlalchemy import select, tuple_
+from sqlalchemy.orm import Session, Query
+from typing import Iterator, List, Optional, Tuple
+from app.db.session import SessionLocal
+from app.models.device import Device
 from app.models.log import Log
-from app.schemas.log import LogCreate
+from app.schemas.log import LogCreate, LogResponse
 
 class LogService:
     @staticmethod
-    async def get_logs(db: Session, level: Optional[str] = None, platform_id: Optional[int] = None) -> List[Log]:
+    def encode_cursor(log: Log) -> str:
+        """Курсор keyset-пагинации: позиция (created_at, id) последней записи страницы"""
+        raw = f"{log.created_at.isoformat()}|{log.id}"
+        return base64.urlsafe_b64encode(raw.encode()).decode()
+
+    @staticmethod
+    def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+        try:
+            raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+            created_at, log_id = raw.rsplit("|", 1)
+            return datetime.fromisoformat(created_at), int(log_id)
+        except (ValueError, UnicodeDecodeError) as e:
+            raise ValueError(f"Некорректный курсор: {cursor}") from e
+
+    @staticmethod
+    def build_query(
+        db: Session,
+        level: Optional[str] = None,
+        status: Optional[str] = None,
+        device_id: Optional[int] = None,
+        platform_id: Optional[int] = None,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+    ) -> Query:
+        """Запрос логов с серверными фильтрами, упорядоченный по (created_at, id) по убыванию"""
         query = db.query(Log)
         if level:
             query = query.filter(Log.level == level)
+        if status:
+            query = query.filter(Log.status == status)
+        if device_id:
+            query = query.filter(Log.device_id == device_id)
         if platform_id:
-            from app.models.device import Device
-            device_ids = [d.id for d in db.query(Device).filter(Device.platform_id == platform_id).all()]
-            if device_ids:
-                query = query.filter(Log.device_id.in_(device_ids))
-            else:
-                return []
-        return query.order_by(Log.created_at.desc()).all()
+            platform_devices = select(Device.id).where(Device.platform_id == platform_id)
+            query = query.filter(Log.device_id.in_(platform_devices))
+        if start_date:
+            query = query.filter(Log.created_at >= start_date)
+        if end_date:
+            query = query.filter(Log.created_at <= end_date)
+        return query.order_by(Log.created_at.desc(), Log.id.desc())
+
+    @staticmethod
+    def get_logs_page(
+        db: Session,
+        cursor: Optional[str] = None,
+        limit: int = 100,
+        **filters
+    ) -> Tuple[List[Log], Optional[str]]:
+        """Страница логов и курсор следующей страницы (None, если это последняя)"""
+        query = LogService.build_query(db, **filters)
+        if cursor:
+            cursor_created_at, cursor_id = LogService.decode_cursor(cursor)
+            query = query.filter(tuple_(Log.created_at, Log.id) < (cursor_created_at, cursor_id))
+        items = query.limit(limit + 1).all()
+        next_cursor = None
+        if len(items) > limit:
+            items = items[:limit]
+            next_cursor = LogService.encode_cursor(items[-1])
+        return items, next_cursor
+
+    @staticmethod
+    def iter_logs_ndjson(batch_size: int = 500, **filters) -> Iterator[str]:
+        """
+        Потоковая выгрузка логов в NDJSON. Строки читаются через yield_per,
+        поэтому память не растёт с размером выборки. Использует собственную
+        сессию, так как генератор выполняется после завершения обработчика.
+        """
+        db = SessionLocal()
+        try:
+            query = LogService.build_query(db, **filters).yield_per(batch_size)
+            for log in query:
+                yield LogResponse.model_validate(log).model_dump_json() + "\n"
+        finally:
+            db.close()
 
     @staticmethod
-    async def create_log(db: Session, log: LogCreate) -> Log:
+    def create_log(db: Session, log: LogCreate) -> Log:
         db_log = Log(**log.model_dump())
         db.add(db_log)
         db.commit()
         db.refresh(db_log)
-        return db_log 
\ No newline at end of file
+        return db_log
@@ -0,0 +1,246 @@
+import gzip
+import logging
+import os
+import re
+from datetime import date, datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.session import engine
+
+logger = logging.getLogger(__name__)
+
+# Секции logs называются logs_pYYYY_MM и покрывают [1-е число месяца, 1-е число следующего)
+PARTITION_PREFIX = "logs_p"
+_PARTITION_RE = re.compile(r"^logs_p(\d{4})_(\d{2})$")
+DEFAULT_PARTITION = "logs_default"
+
+# Ключ advisory lock: обслуживание секций выполняет только один процесс
+MAINTENANCE_LOCK_KEY = 7_250_001
+
+def month_start(value: date) -> date:
+    return date(value.year, value.month, 1)
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+def is_on_mount(path: Path) -> bool:
+    """Каталог лежит на смонтированном томе (не в файловой системе контейнера)"""
+    path = path.resolve()
+    for candidate in (path, *path.parents):
+        if candidate == Path(candidate.anchor):
+            return False
+        if os.path.ismount(candidate):
+            return True
+    return False
+
+class LogPartitionService:
+    """
+    Обслуживание месячных секций таблицы logs (PARTITION BY RANGE (created_at)):
+    создание секций на LOGS_PARTITIONS_AHEAD месяцев вперёд и вывод из БД
+    секций старше LOGS_RETENTION_MONTHS - с выгрузкой в LOGS_ARCHIVE_DIR
+    (CSV, gzip) перед удалением или отсоединением. Вывод секций включается
+    явно (LOGS_RETENTION_MONTHS > 0); удаляются они только при архиве на
+    сохраняемом томе.
+    """
+
+    @staticmethod
+    def partition_name(month: date) -> str:
+        return f"{PARTITION_PREFIX}{month:%Y_%m}"
+
+    @staticmethod
+    def list_partitions(db: Session) -> List[date]:
+        """Месяцы существующих секций logs (без секции по умолчанию), по возрастанию"""
+        names = db.execute(text("""
+            SELECT child.relname
+            FROM pg_inherits i
+            JOIN pg_class child ON child.oid = i.inhrelid
+            JOIN pg_class parent ON parent.oid = i.inhparent
+            WHERE parent.relname = 'logs'
+        """)).scalars().all()
+        months = []
+        for name in names:
+            match = _PARTITION_RE.match(name)
+            if match:
+                months.append(date(int(match.group(1)), int(match.group(2)), 1))
+        return sorted(months)
+
+    @staticmethod
+    def create_partition(db: Session, month: date) -> str:
+        """
+        Создать секцию месяца. Если строки этого месяца уже попали в секцию по
+        умолчанию (обслуживание отстало больше чем на LOGS_PARTITIONS_AHEAD
+        месяцев), Postgres не даст создать секцию: в одной транзакции секция по
+        умолчанию отсоединяется, строки переносятся в новую секцию, затем она
+        присоединяется обратно.
+        """
+        name = LogPartitionService.partition_name(month)
+        bounds = {"start": month, "end": add_months(month, 1)}
+        create_sql = text(
+            f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF logs "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{bounds['end'].isoformat()}')"
+        )
+        stranded = db.execute(text(
+            f"SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} WHERE created_at >= :start AND created_at < :end)"
+        ), bounds).scalar()
+        if not stranded:
+            db.execute(create_sql)
+            db.commit()
+            return name
+
+        db.execute(text("SET LOCAL statement_timeout = 0"))
+        db.execute(text(f"ALTER TABLE logs DETACH PARTITION {DEFAULT_PARTITION}"))
+        db.execute(create_sql)
+        moved = db.execute(text(f"""
+            WITH moved AS (
+                DELETE FROM {DEFAULT_PARTITION} WHERE created_at >= :start AND created_at < :end RETURNING *
+            )
+            INSERT INTO {name} SELECT * FROM moved
+        """), bounds).rowcount
+        db.execute(text(f"ALTER TABLE logs ATTACH PARTITION {DEFAULT_PARTITION} DEFAULT"))
+        db.commit()
+        logger.warning(f"В секцию {name} перенесено {moved} записей из {DEFAULT_PARTITION}")
+        return name
+
+    @staticmethod
+    def ensure_partitions(db: Session, today: date) -> List[str]:
+        """Создать недостающие секции с текущего месяца на LOGS_PARTITIONS_AHEAD вперёд"""
+        existing = set(LogPartitionService.list_partitions(db))
+        current = month_start(today)
+        created = []
+        for offset in range(settings.LOGS_PARTITIONS_AHEAD + 1):
+            month = add_months(current, offset)
+            if month in existing:
+                continue
+            try:
+                name = LogPartitionService.create_partition(db, month)
+            except Exception as e:
+                # Ошибка одного месяца не должна мешать созданию остальных
+                db.rollback()
+                logger.error(f"Не удалось создать секцию {LogPartitionService.partition_name(month)}: {e}")
+                continue
+            created.append(name)
+            logger.info(f"Создана секция {name}")
+        return created
+
+    @staticmethod
+    def expired_partitions(db: Session, today: date) -> List[date]:
+        """Секции, все записи которых старше LOGS_RETENTION_MONTHS полных месяцев"""
+        if settings.LOGS_RETENTION_MONTHS <= 0:
+            return []
+        cutoff = add_months(month_start(today), -settings.LOGS_RETENTION_MONTHS)
+        return [month for month in LogPartitionService.list_partitions(db) if add_months(month, 1) <= cutoff]
+
+    @staticmethod
+    def archive_persisted() -> bool:
+        """
+        Архив переживёт контейнер: LOGS_ARCHIVE_DIR задан и (при
+        LOGS_ARCHIVE_REQUIRE_MOUNT) находится на смонтированном томе
+        """
+        if not settings.LOGS_ARCHIVE_DIR:
+            return False
+        if not settings.LOGS_ARCHIVE_REQUIRE_MOUNT:
+            return True
+        directory = Path(settings.LOGS_ARCHIVE_DIR)
+        directory.mkdir(parents=True, exist_ok=True)
+        return is_on_mount(directory)
+
+    @staticmethod
+    def archive_partition(db: Session, month: date) -> Path:
+        """
+        Выгрузить секцию в <LOGS_ARCHIVE_DIR>/logs_pYYYY_MM.csv.gz через COPY.
+        Файл пишется во временный и переименовывается после успешной выгрузки.
+        """
+        name = LogPartitionService.partition_name(month)
+        directory = Path(settings.LOGS_ARCHIVE_DIR)
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f"{name}.csv.gz"
+        tmp_path = directory / f"{name}.csv.gz.tmp"
+
+        # COPY большой секции не должен упираться в DB_STATEMENT_TIMEOUT_MS
+        db.execute(text("SET LOCAL statement_timeout = 0"))
+        cursor = db.connection().connection.cursor()
+        try:
+            with open(tmp_path, "wb") as raw:
+                with gzip.GzipFile(fileobj=raw, mode="wb") as archive:
+                    cursor.copy_expert(
+                        f"COPY (SELECT * FROM {name} ORDER BY created_at, id) TO STDOUT WITH (FORMAT csv, HEADER)",
+                        archive,
+                    )
+                raw.flush()
+                os.fsync(raw.fileno())
+        except Exception:
+            tmp_path.unlink(missing_ok=True)
+            raise
+        finally:
+            cursor.close()
+        db.commit()
+        os.replace(tmp_path, path)
+        logger.info(f"Секция {name} выгружена в {path} ({path.stat().st_size} байт)")
+        return path
+
+    @staticmethod
+    def expire_partition(db: Session, month: date) -> Dict:
+        """
+        Архивировать (если задан LOGS_ARCHIVE_DIR), отсоединить и удалить секцию.
+        Без сохраняемого архива секция только отсоединяется: данные остаются в БД.
+        """
+        name = LogPartitionService.partition_name(month)
+        dropped = settings.LOGS_EXPIRED_PARTITION_ACTION == "drop"
+        if dropped and not LogPartitionService.archive_persisted():
+            logger.warning(
+                f"Секция {name} не удаляется: LOGS_ARCHIVE_DIR не задан или не на смонтированном томе, "
+                f"секция только отсоединяется"
+            )
+            dropped = False
+        archive = None
+        if settings.LOGS_ARCHIVE_DIR:
+            archive = str(LogPartitionService.archive_partition(db, month))
+        db.execute(text(f"ALTER TABLE logs DETACH PARTITION {name}"))
+        if dropped:
+            db.execute(text(f"DROP TABLE {name}"))
+        db.commit()
+        logger.info(f"Секция {name} {'удалена' if dropped else 'отсоединена'}")
+        return {"partition": name, "archive": archive, "dropped": dropped}
+
+    @staticmethod
+    def maintain(db: Session, today: Optional[date] = None) -> Dict:
+        today = today or datetime.now(timezone.utc).date()
+        result = {"created": LogPartitionService.ensure_partitions(db, today), "expired": []}
+        for month in LogPartitionService.expired_partitions(db, today):
+            result["expired"].append(LogPartitionService.expire_partition(db, month))
+        return result
+
+def run_log_maintenance() -> Optional[Dict]:
+    """
+    Обслуживание секций logs (для фоновой задачи и скрипта). Между воркерами
+    gunicorn выполняется одним процессом под advisory lock; остальные
+    пропускают запуск. None - запуск пропущен или завершился ошибкой.
+    """
+    try:
+        with engine.connect() as conn:
+            locked = conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": MAINTENANCE_LOCK_KEY}).scalar()
+            conn.commit()
+            if not locked:
+                return None
+            db = Session(bind=conn)
+            try:
+                result = LogPartitionService.maintain(db)
+            except Exception:
+                db.rollback()
+                raise
+            finally:
+                db.close()
+                conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MAINTENANCE_LOCK_KEY})
+                conn.commit()
+    except Exception as e:
+        logger.error(f"Ошибка обслуживания секций logs: {e}", exc_info=True)
+        return None
+    if result["created"] or result["expired"]:
+        logger.info(f"Обслуживание секций logs: создано {len(result['created'])}, выведено {len(result['expired'])}")
+    return result
@@ -1,20 +1,56 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import desc, func
-from typing import List, Optional
+import logging
+
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy import desc, func, select, text, true
+from sqlalchemy.dialects.postgresql import insert
+from typing import Dict, List, Optional
+from app.db.session import SessionLocal
 from app.models.notification import Notification
+from app.models.notification_counter import NotificationCounter
 from app.schemas.notification import NotificationCreate, NotificationUpdate, NotificationList, UnreadCountResponse, NotificationMarkReadResponse
 from app.models.user import User
+from app.services.event_bus import event_bus
+
+logger = logging.getLogger(__name__)
 
 class NotificationService:
+    """
+    Уведомления пользователей. Количество всех и непрочитанных уведомлений
+    хранится в notification_counters и меняется в той же транзакции, что и
+    сами уведомления: список и счётчики читаются одним запросом.
+    """
+
     def __init__(self, db: Session):
         self.db = db
 
+    def _apply_counter(self, user_id: int, total: int = 0, unread: int = 0) -> None:
+        """Изменить счётчики пользователя на указанные приращения (без commit)"""
+        table = NotificationCounter.__table__
+        stmt = insert(table).values(user_id=user_id, total=max(total, 0), unread=max(unread, 0))
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.user_id],
+            set_={
+                "total": func.greatest(table.c.total + total, 0),
+                "unread": func.greatest(table.c.unread + unread, 0),
+                "updated_at": func.now(),
+            },
+        )
+        self.db.execute(stmt)
+
     def create_notification(self, notification_data: NotificationCreate) -> Notification:
         """Создать новое уведомление"""
         db_notification = Notification(**notification_data.dict())
         self.db.add(db_notification)
+        self._apply_counter(db_notification.user_id, total=1, unread=0 if db_notification.read_status else 1)
         self.db.commit()
         self.db.refresh(db_notification)
+        event_bus.publish("notification", {
+            "id": db_notification.id,
+            "title": db_notification.title,
+            "message": db_notification.message,
+            "type": db_notification.type,
+            "created_at": db_notification.created_at.isoformat() if db_notification.created_at else None,
+        }, user_id=db_notification.user_id)
         return db_notification
 
     def get_notifications(
@@ -23,64 +59,118 @@ class NotificationService:
         limit: int = 10, 
         unread_only: bool = False
     ) -> NotificationList:
-        """Получить уведомления пользователя"""
-        query = self.db.query(Notification).filter(Notification.user_id == user_id)
-        
+        """
+        Получить уведомления пользователя: страница и счётчики одним запросом
+        (строка счётчиков + LATERAL-подзапрос страницы)
+        """
+        page_query = select(Notification).where(Notification.user_id == user_id)
         if unread_only:
-            query = query.filter(Notification.read_status == False)
-        
-        # Получаем последние уведомления
-        notifications = query.order_by(desc(Notification.created_at)).limit(limit).all()
-        
-        # Подсчитываем общее количество и непрочитанные
-        total = self.db.query(Notification).filter(Notification.user_id == user_id).count()
-        unread_count = self.db.query(Notification).filter(
-            Notification.user_id == user_id,
-            Notification.read_status == False
-        ).count()
-        
+            page_query = page_query.where(Notification.read_status == False)
+        page = page_query.order_by(desc(Notification.created_at)).limit(limit).subquery().lateral()
+        page_notification = aliased(Notification, page)
+
+        rows = (
+            self.db.query(NotificationCounter.total, NotificationCounter.unread, page_notification)
+            .select_from(NotificationCounter)
+            .outerjoin(page, true())
+            .filter(NotificationCounter.user_id == user_id)
+            .order_by(desc(page.c.created_at))
+            .all()
+        )
+        # Строки счётчиков нет - у пользователя ещё не было уведомлений
+        if not rows:
+            return NotificationList(items=[], total=0, unread_count=0)
+
         return NotificationList(
-            items=notifications,
-            total=total,
-            unread_count=unread_count
+            items=[notification for _, _, notification in rows if notification is not None],
+            total=rows[0][0],
+            unread_count=rows[0][1]
         )
 
     def get_unread_count(self, user_id: int) -> UnreadCountResponse:
-        """Получить количество непрочитанных уведомлений"""
-        unread_count = self.db.query(Notification).filter(
-            Notification.user_id == user_id,
-            Notification.read_status == False
-        ).count()
-        
-        return UnreadCountResponse(unread_count=unread_count)
+        """Получить количество непрочитанных уведомлений (одна строка по первичному ключу)"""
+        unread_count = self.db.query(NotificationCounter.unread).filter(
+            NotificationCounter.user_id == user_id
+        ).scalar()
+
+        return UnreadCountResponse(unread_count=unread_count or 0)
 
     def mark_notification_read(self, notification_id: int, user_id: int) -> bool:
         """Пометить одно уведомление как прочитанное"""
-        notification = self.db.query(Notification).filter(
-            Notification.id == notification_id,
-            Notification.user_id == user_id
-        ).first()
-        
-        if notification:
-            notification.read_status = True
-            self.db.commit()
-            return True
-        return False
+        found = self.db.execute(text("""
+            WITH target AS (
+                SELECT id, read_status FROM notifications
+                WHERE id = :notification_id AND user_id = :user_id
+                FOR UPDATE
+            ),
+            updated AS (
+                UPDATE notifications n SET read_status = true, updated_at = now()
+                FROM target
+                WHERE n.id = target.id AND target.read_status = false
+                RETURNING n.id
+            ),
+            counter AS (
+                UPDATE notification_counters
+                SET unread = GREATEST(unread - (SELECT COUNT(*) FROM updated), 0), updated_at = now()
+                WHERE user_id = :user_id AND EXISTS (SELECT 1 FROM updated)
+            )
+            SELECT COUNT(*) FROM target
+        """), {"notification_id": notification_id, "user_id": user_id}).scalar()
+        self.db.commit()
+        return bool(found)
 
     def mark_all_read(self, user_id: int) -> NotificationMarkReadResponse:
-        """Пометить все уведомления пользователя как прочитанные"""
-        updated_count = self.db.query(Notification).filter(
-            Notification.user_id == user_id,
-            Notification.read_status == False
-        ).update({Notification.read_status: True})
-        
+        """Пометить все уведомления пользователя как прочитанные (один запрос вместе со счётчиком)"""
+        updated_count = self.db.execute(text("""
+            WITH updated AS (
+                UPDATE notifications SET read_status = true, updated_at = now()
+                WHERE user_id = :user_id AND read_status = false
+                RETURNING id
+            ),
+            counter AS (
+                UPDATE notification_counters
+                SET unread = GREATEST(unread - (SELECT COUNT(*) FROM updated), 0), updated_at = now()
+                WHERE user_id = :user_id
+            )
+            SELECT COUNT(*) FROM updated
+        """), {"user_id": user_id}).scalar()
+
         self.db.commit()
-        
+
         return NotificationMarkReadResponse(
             message="All notifications marked as read",
             updated_count=updated_count
         )
 
+    @staticmethod
+    def reconcile_counters(db: Session) -> int:
+        """Пересчитать счётчики всех пользователей по таблице notifications"""
+        result = db.execute(text("""
+            WITH fresh AS (
+                SELECT ids.user_id,
+                       COALESCE(nc.total, 0) AS total,
+                       COALESCE(nc.unread, 0) AS unread
+                FROM (
+                    SELECT DISTINCT user_id FROM notifications
+                    UNION SELECT user_id FROM notification_counters
+                ) ids
+                LEFT JOIN (
+                    SELECT user_id, COUNT(*) AS total, COUNT(*) FILTER (WHERE read_status = false) AS unread
+                    FROM notifications
+                    GROUP BY user_id
+                ) nc ON nc.user_id = ids.user_id
+            )
+            INSERT INTO notification_counters (user_id, total, unread, updated_at)
+            SELECT user_id, total, unread, now() FROM fresh
+            ON CONFLICT (user_id) DO UPDATE SET
+                total = EXCLUDED.total,
+                unread = EXCLUDED.unread,
+                updated_at = now()
+            WHERE notification_counters.total <> EXCLUDED.total OR notification_counters.unread <> EXCLUDED.unread
+        """))
+        db.commit()
+        return result.rowcount
+
     def create_alert_notification(self, user_id: int, alert_title: str, alert_message: str) -> Notification:
         """Создать уведомление на основе алерта"""
         notification_data = NotificationCreate(
@@ -91,6 +181,58 @@ class NotificationService:
         )
         return self.create_notification(notification_data)
 
+    def create_platform_notifications(self, notifications: List[Dict]) -> List[Dict]:
+        """
+        Разослать уведомления всем участникам платформ (PlatformUser) одним
+        запросом вместе со счётчиками, без commit. notifications - словари
+        platform_id, title, message, type. Возвращает созданные уведомления
+        для publish_created после commit.
+        """
+        if not notifications:
+            return []
+        rows = self.db.execute(text("""
+            WITH source AS (
+                SELECT * FROM unnest(
+                    CAST(:platform_ids AS integer[]), CAST(:titles AS text[]),
+                    CAST(:messages AS text[]), CAST(:types AS text[])
+                ) AS s(platform_id, title, message, type)
+            ),
+            inserted AS (
+                INSERT INTO notifications (user_id, title, message, type, read_status)
+                SELECT pu.user_id, s.title, s.message, s.type, false
+                FROM source s
+                JOIN platform_users pu ON pu.platform_id = s.platform_id
+                RETURNING id, user_id, title, message, type, created_at
+            ),
+            counters AS (
+                INSERT INTO notification_counters (user_id, total, unread)
+                SELECT user_id, COUNT(*), COUNT(*) FROM inserted GROUP BY user_id
+                ON CONFLICT (user_id) DO UPDATE SET
+                    total = notification_counters.total + EXCLUDED.total,
+                    unread = notification_counters.unread + EXCLUDED.unread,
+                    updated_at = now()
+            )
+            SELECT id, user_id, title, message, type, created_at FROM inserted
+        """), {
+            "platform_ids": [item["platform_id"] for item in notifications],
+            "titles": [item["title"] for item in notifications],
+            "messages": [item["message"] for item in notifications],
+            "types": [item.get("type", "alert") for item in notifications],
+        }).mappings().all()
+        return [dict(row) for row in rows]
+
+    @staticmethod
+    def publish_created(notifications: List[Dict]) -> None:
+        """Отправить созданные уведомления получателям в push-канал /ws (после commit)"""
+        for notification in notifications:
+            event_bus.publish("notification", {
+                "id": notification["id"],
+                "title": notification["title"],
+                "message": notification["message"],
+                "type": notification["type"],
+                "created_at": notification["created_at"].isoformat() if notification["created_at"] else None,
+            }, user_id=notification["user_id"])
+
     def create_system_notification(self, user_id: int, title: str, message: str, notification_type: str = "info") -> Notification:
         """Создать системное уведомление"""
         notification_data = NotificationCreate(
@@ -99,4 +241,17 @@ class NotificationService:
             message=message,
             type=notification_type
         )
-        return self.create_notification(notification_data) 
\ No newline at end of file
+        return self.create_notification(notification_data)
+
+def reconcile_notification_counters() -> None:
+    """Сверка счётчиков уведомлений с таблицей notifications (для фоновой задачи)"""
+    db = SessionLocal()
+    try:
+        rows = NotificationService.reconcile_counters(db)
+        if rows:
+            logger.info(f"Счётчики уведомлений исправлены: {rows} пользователей")
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Ошибка пересчёта счётчиков уведомлений: {e}", exc_info=True)
+    finally:
+        db.close()
@@ -0,0 +1,99 @@
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.core.database import SessionLocal
+from app.models.alert import Alert
+
+logger = logging.getLogger(__name__)
+
+AlertKey = Tuple[str, Optional[int], Optional[str]]
+
+class OpenAlertRegistry:
+    """
+    Реестр активных (status='firing') алертов процесса: fingerprint -> id и
+    (alert_name, device_id, grafana_player_id) -> id последнего алерта.
+
+    Строится при старте приложения и обновляется обработчиком вебхуков.
+    Реестр - только подсказка: запись по найденному id выполняется с условием
+    status='firing', и если алерт уже изменён другим процессом, обработчик
+    возвращается к обычному поиску в БД.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_fingerprint: Dict[str, int] = {}
+        self._by_key: Dict[AlertKey, Tuple[int, datetime]] = {}
+        self._keys: Dict[int, Tuple[Optional[str], AlertKey]] = {}
+
+    def rebuild(self, db: Optional[Session] = None) -> int:
+        """Загрузить все активные алерты (использует частичный индекс по status='firing')"""
+        own_session = db is None
+        db = db or SessionLocal()
+        try:
+            rows = db.query(
+                Alert.id, Alert.external_id, Alert.alert_name, Alert.device_id,
+                Alert.grafana_player_id, Alert.created_at,
+            ).filter(Alert.status == "firing").all()
+        finally:
+            if own_session:
+                db.close()
+        with self._lock:
+            self._by_fingerprint.clear()
+            self._by_key.clear()
+            self._keys.clear()
+            for alert_id, external_id, alert_name, device_id, player_id, created_at in rows:
+                self._add_locked(alert_id, external_id, (alert_name, device_id, player_id), created_at)
+        logger.info(f"Реестр активных алертов построен: {len(rows)} алертов")
+        return len(rows)
+
+    def _add_locked(self, alert_id: int, external_id: Optional[str], key: AlertKey, created_at: datetime) -> None:
+        self._keys[alert_id] = (external_id, key)
+        if external_id:
+            self._by_fingerprint[external_id] = alert_id
+        current = self._by_key.get(key)
+        if current is None or created_at >= current[1]:
+            self._by_key[key] = (alert_id, created_at)
+
+    def _discard_locked(self, alert_id: int) -> None:
+        entry = self._keys.pop(alert_id, None)
+        if entry is None:
+            return
+        external_id, key = entry
+        if external_id and self._by_fingerprint.get(external_id) == alert_id:
+            del self._by_fingerprint[external_id]
+        current = self._by_key.get(key)
+        if current and current[0] == alert_id:
+            del self._by_key[key]
+
+    def sync(self, alert_id: int, status: str, external_id: Optional[str], key: AlertKey, created_at: datetime) -> None:
+        """Учесть состояние алерта после записи в БД"""
+        with self._lock:
+            self._discard_locked(alert_id)
+            if status == "firing":
+                self._add_locked(alert_id, external_id, key, created_at)
+
+    def sync_alert(self, alert: Alert) -> None:
+        self.sync(alert.id, alert.status, alert.external_id,
+                  (alert.alert_name, alert.device_id, alert.grafana_player_id), alert.created_at)
+
+    def discard(self, alert_id: int) -> None:
+        with self._lock:
+            self._discard_locked(alert_id)
+
+    def find(self, fingerprint: Optional[str], key: AlertKey) -> Optional[int]:
+        """id активного алерта: сначала по fingerprint, затем по ключу"""
+        with self._lock:
+            if fingerprint and fingerprint in self._by_fingerprint:
+                return self._by_fingerprint[fingerprint]
+            entry = self._by_key.get(key)
+            return entry[0] if entry else None
+
+    def size(self) -> int:
+        with self._lock:
+            return len(self._keys)
+
+open_alert_registry = OpenAlertRegistry()
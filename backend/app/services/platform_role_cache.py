@@ -0,0 +1,115 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.platform_user import PlatformUser
+from app.models.user import User
+from app.services.cache_invalidation import cache_invalidation
+from app.services.event_bus import event_bus
+
+logger = logging.getLogger(__name__)
+
+# Ключ в Session.info для кэша ролей в рамках одного запроса
+_REQUEST_CACHE_KEY = "platform_roles"
+
+class PlatformRoleCache:
+    """
+    Карта ролей пользователя: глобальная роль (users.role) и роли в
+    платформах {platform_id: role}.
+
+    Два уровня: в рамках запроса карта хранится в Session.info, между
+    запросами - в памяти процесса (LRU с TTL, не больше max_size записей).
+    Эндпоинты добавления, изменения и удаления пользователей платформы
+    вызывают invalidate_platform_roles(): запись сбрасывается во всех
+    воркерах через cache_invalidation.
+    """
+
+    def __init__(self, ttl: int, max_size: int):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[int, tuple]" = OrderedDict()
+
+    @staticmethod
+    def _load(db: Session, user_id: int) -> Optional[Dict]:
+        rows = (
+            db.query(User.role, PlatformUser.platform_id, PlatformUser.role)
+            .outerjoin(PlatformUser, PlatformUser.user_id == User.id)
+            .filter(User.id == user_id)
+            .all()
+        )
+        if not rows:
+            return None
+        return {
+            "role": rows[0][0],
+            "platforms": {platform_id: role for _, platform_id, role in rows if platform_id is not None},
+        }
+
+    def get(self, db: Session, user_id: int) -> Optional[Dict]:
+        """Карта ролей пользователя или None, если пользователь не найден"""
+        request_cache = db.info.setdefault(_REQUEST_CACHE_KEY, {})
+        if user_id in request_cache:
+            return request_cache[user_id]
+
+        roles = None
+        if self.ttl > 0:
+            with self._lock:
+                entry = self._entries.get(user_id)
+                if entry is not None and entry[0] > time.monotonic():
+                    self._entries.move_to_end(user_id)
+                    roles = entry[1]
+        if roles is None:
+            roles = self._load(db, user_id)
+            if roles is not None and self.ttl > 0:
+                with self._lock:
+                    self._entries[user_id] = (time.monotonic() + self.ttl, roles)
+                    self._entries.move_to_end(user_id)
+                    while len(self._entries) > self.max_size:
+                        self._entries.popitem(last=False)
+
+        request_cache[user_id] = roles
+        return roles
+
+    def invalidate(self, user_id: Optional[int] = None, db: Optional[Session] = None) -> None:
+        """Сбросить карту пользователя (или всех пользователей, если user_id не задан)"""
+        with self._lock:
+            if user_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(user_id, None)
+        if db is not None:
+            request_cache = db.info.get(_REQUEST_CACHE_KEY, {})
+            if user_id is None:
+                request_cache.clear()
+            else:
+                request_cache.pop(user_id, None)
+
+    def get_global_role(self, db: Session, user_id: int) -> Optional[str]:
+        """Глобальная роль пользователя (users.role) или None, если пользователь не найден"""
+        roles = self.get(db, user_id)
+        return roles["role"] if roles else None
+
+    def get_platform_role(self, db: Session, user_id: int, platform_id: int) -> Optional[str]:
+        """Роль пользователя в платформе или None, если он в ней не состоит"""
+        roles = self.get(db, user_id)
+        return roles["platforms"].get(platform_id) if roles else None
+
+platform_role_cache = PlatformRoleCache(
+    ttl=settings.PLATFORM_ROLE_CACHE_TTL,
+    max_size=settings.PLATFORM_ROLE_CACHE_MAX_SIZE,
+)
+cache_invalidation.register(
+    "platform_roles",
+    lambda key: platform_role_cache.invalidate(None if key is None else int(key)),
+)
+
+def invalidate_platform_roles(user_id: Optional[int] = None, db: Optional[Session] = None) -> None:
+    """Сбросить роли пользователя (или всех) в этом процессе и в остальных воркерах"""
+    platform_role_cache.invalidate(user_id, db)
+    event_bus.revalidate(user_id)
+    cache_invalidation.publish("platform_roles", user_id)
@@ -0,0 +1,173 @@
+import logging
+from datetime import datetime
+from typing import Dict, Optional
+
+from sqlalchemy import func, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.db.session import SessionLocal
+from app.models.device import Device
+from app.models.platform_stats import PlatformStats
+
+logger = logging.getLogger(__name__)
+
+NO_PLATFORM = 0
+
+def is_firing(alert_status: Optional[str]) -> bool:
+    # firing, firing_sms_sent, firing_sms_failed - активный алерт
+    return bool(alert_status) and alert_status.lower().startswith("firing")
+
+def is_resolved(alert_status: Optional[str]) -> bool:
+    return bool(alert_status) and alert_status.lower() == "resolved"
+
+class PlatformStatsService:
+    """
+    Счётчики платформ для дашборда: чтение - одна строка по первичному ключу,
+    запись - атомарный UPSERT с приращениями в транзакции вызывающего кода.
+    """
+
+    @staticmethod
+    def platform_of_device(db: Session, device_id: Optional[int]) -> int:
+        if not device_id:
+            return NO_PLATFORM
+        platform_id = db.query(Device.platform_id).filter(Device.id == device_id).scalar()
+        return platform_id or NO_PLATFORM
+
+    @staticmethod
+    def apply(
+        db: Session,
+        platform_id: Optional[int],
+        devices: int = 0,
+        firing: int = 0,
+        resolved: int = 0,
+        alert_at: Optional[datetime] = None,
+    ) -> None:
+        """Изменить счётчики платформы на указанные приращения (без commit)"""
+        platform_id = platform_id or NO_PLATFORM
+        table = PlatformStats.__table__
+        stmt = insert(table).values(
+            platform_id=platform_id,
+            device_count=max(devices, 0),
+            firing_alerts=max(firing, 0),
+            resolved_alerts=max(resolved, 0),
+            latest_alert_at=alert_at,
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.platform_id],
+            set_={
+                "device_count": func.greatest(table.c.device_count + devices, 0),
+                "firing_alerts": func.greatest(table.c.firing_alerts + firing, 0),
+                "resolved_alerts": func.greatest(table.c.resolved_alerts + resolved, 0),
+                "latest_alert_at": func.greatest(table.c.latest_alert_at, stmt.excluded.latest_alert_at),
+                "updated_at": func.now(),
+            },
+        )
+        db.execute(stmt)
+
+    @staticmethod
+    def alert_status_changed(
+        db: Session,
+        device_id: Optional[int],
+        old_status: Optional[str],
+        new_status: Optional[str],
+        alert_at: Optional[datetime] = None,
+    ) -> None:
+        """Учесть создание алерта (old_status=None) или смену его статуса"""
+        firing = int(is_firing(new_status)) - int(is_firing(old_status))
+        resolved = int(is_resolved(new_status)) - int(is_resolved(old_status))
+        if not firing and not resolved and alert_at is None:
+            return
+        platform_id = PlatformStatsService.platform_of_device(db, device_id)
+        PlatformStatsService.apply(db, platform_id, firing=firing, resolved=resolved, alert_at=alert_at)
+
+    @staticmethod
+    def device_moved(db: Session, old_platform_id: Optional[int], new_platform_id: Optional[int]) -> None:
+        if (old_platform_id or NO_PLATFORM) == (new_platform_id or NO_PLATFORM):
+            return
+        PlatformStatsService.apply(db, old_platform_id, devices=-1)
+        PlatformStatsService.apply(db, new_platform_id, devices=1)
+
+    @staticmethod
+    def get_platform(db: Session, platform_id: int) -> Dict:
+        row = db.query(PlatformStats).filter(PlatformStats.platform_id == platform_id).first()
+        if not row:
+            return {"device_count": 0, "firing_alerts": 0, "resolved_alerts": 0, "latest_alert_at": None}
+        return {
+            "device_count": row.device_count,
+            "firing_alerts": row.firing_alerts,
+            "resolved_alerts": row.resolved_alerts,
+            "latest_alert_at": row.latest_alert_at,
+        }
+
+    @staticmethod
+    def get_totals(db: Session) -> Dict:
+        """Суммарные счётчики по всем платформам (одна строка на платформу)"""
+        row = db.query(
+            func.coalesce(func.sum(PlatformStats.device_count), 0),
+            func.coalesce(func.sum(PlatformStats.firing_alerts), 0),
+            func.coalesce(func.sum(PlatformStats.resolved_alerts), 0),
+            func.max(PlatformStats.latest_alert_at),
+        ).one()
+        return {
+            "device_count": int(row[0]),
+            "firing_alerts": int(row[1]),
+            "resolved_alerts": int(row[2]),
+            "latest_alert_at": row[3],
+        }
+
+    @staticmethod
+    def reconcile(db: Session) -> int:
+        """Пересчитать все счётчики по исходным таблицам devices и alerts"""
+        result = db.execute(text("""
+            WITH device_counts AS (
+                SELECT COALESCE(platform_id, 0) AS platform_id, COUNT(*) AS device_count
+                FROM devices
+                GROUP BY COALESCE(platform_id, 0)
+            ),
+            alert_counts AS (
+                SELECT COALESCE(d.platform_id, 0) AS platform_id,
+                       COUNT(*) FILTER (WHERE lower(a.status) LIKE 'firing%') AS firing_alerts,
+                       COUNT(*) FILTER (WHERE lower(a.status) = 'resolved') AS resolved_alerts,
+                       MAX(a.created_at) AS latest_alert_at
+                FROM alerts a
+                LEFT JOIN devices d ON d.id = a.device_id
+                GROUP BY COALESCE(d.platform_id, 0)
+            ),
+            fresh AS (
+                SELECT ids.platform_id,
+                       COALESCE(dc.device_count, 0) AS device_count,
+                       COALESCE(ac.firing_alerts, 0) AS firing_alerts,
+                       COALESCE(ac.resolved_alerts, 0) AS resolved_alerts,
+                       ac.latest_alert_at
+                FROM (
+                    SELECT platform_id FROM device_counts
+                    UNION SELECT platform_id FROM alert_counts
+                    UNION SELECT platform_id FROM platform_stats
+                ) ids
+                LEFT JOIN device_counts dc ON dc.platform_id = ids.platform_id
+                LEFT JOIN alert_counts ac ON ac.platform_id = ids.platform_id
+            )
+            INSERT INTO platform_stats (platform_id, device_count, firing_alerts, resolved_alerts, latest_alert_at, updated_at)
+            SELECT platform_id, device_count, firing_alerts, resolved_alerts, latest_alert_at, now() FROM fresh
+            ON CONFLICT (platform_id) DO UPDATE SET
+                device_count = EXCLUDED.device_count,
+                firing_alerts = EXCLUDED.firing_alerts,
+                resolved_alerts = EXCLUDED.resolved_alerts,
+                latest_alert_at = EXCLUDED.latest_alert_at,
+                updated_at = now()
+        """))
+        db.commit()
+        return result.rowcount
+
+def reconcile_platform_stats() -> None:
+    """Сверка счётчиков с исходными таблицами (для фоновой задачи)"""
+    db = SessionLocal()
+    try:
+        rows = PlatformStatsService.reconcile(db)
+        logger.info(f"Счётчики платформ пересчитаны: {rows} строк")
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Ошибка пересчёта счётчиков платформ: {e}", exc_info=True)
+    finally:
+        db.close()
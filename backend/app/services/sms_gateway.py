@@ -1,5 +1,7 @@
+import asyncio
 import aiohttp
 from app.core.config import settings
+from app.services.http_client import get_http_session
 import logging
 
 logger = logging.getLogger(__name__)
@@ -8,6 +10,14 @@ class SMSGateway:
     def __init__(self):
         self.base_url = settings.SMS_GATEWAY_URL
         self.api_key = settings.SMS_GATEWAY_API_KEY # Теперь используется
+        # Ограничиваем число одновременных запросов к шлюзу
+        self._semaphore = asyncio.Semaphore(settings.SMS_GATEWAY_MAX_CONCURRENCY)
+
+    @property
+    def headers(self) -> dict:
+        return {
+            "Authorization": f"{self.api_key}" # Теперь используется ключ как есть, без добавления "API"
+        }
 
     async def send_command(self, phone_number: str, command: str) -> dict:
         """
@@ -17,32 +27,50 @@ class SMSGateway:
         if not phone_number.startswith('+'):
             phone_number = '+' + phone_number
 
-        async with aiohttp.ClientSession() as session:
-            headers = {
-                "Authorization": f"{self.api_key}" # Теперь используется ключ как есть, без добавления "API"
-            }
-            params = {
-                "number": phone_number,
-                "text": command
-            }
-
-            # Логируем полный URL, параметры и заголовки перед отправкой
-            full_url = f"{self.base_url}/send"
-            logger.info(f"Отправка SMS-команды на URL: {full_url}")
-            logger.info(f"Параметры: {params}")
-            logger.info(f"Заголовки: {headers}")
-            
+        params = {
+            "number": phone_number,
+            "text": command
+        }
+
+        # Логируем полный URL и параметры перед отправкой
+        full_url = f"{self.base_url}/send"
+        logger.info(f"Отправка SMS-команды на URL: {full_url}")
+        logger.info(f"Параметры: {params}")
+
+        session = get_http_session()
+        async with self._semaphore:
             async with session.post(
-                f"{self.base_url}/send", # Устанавливаем правильный эндпоинт для отправки SMS
+                full_url, # Устанавливаем правильный эндпоинт для отправки SMS
                 params=params, # Передаем параметры в строке запроса
-                headers=headers # Добавляем заголовки
+                headers=self.headers # Добавляем заголовки
             ) as response:
                 if response.status != 200:
                     error_text = await response.text()
                     logger.error(f"SMS Gateway returned error status {response.status}: {error_text}")
                     raise Exception("Ошибка работы SMS-шлюза. Подробности в логах бэкенда.")
-                
+
                 return await response.text() # Теперь возвращаем сырой текст
 
+    async def probe(self) -> int:
+        """
+        Проверка доступности шлюза без побочных эффектов: HEAD-запрос к
+        SMS_GATEWAY_HEALTH_PATH (GET /sms забирает входящие сообщения).
+        Возвращает HTTP-статус ответа; сетевые ошибки пробрасываются.
+        """
+        session = get_http_session()
+        timeout = aiohttp.ClientTimeout(total=settings.SMS_GATEWAY_HEALTH_TIMEOUT)
+        async with session.head(
+            f"{self.base_url}{settings.SMS_GATEWAY_HEALTH_PATH}",
+            headers=self.headers,
+            timeout=timeout,
+            allow_redirects=False,
+        ) as resp:
+            return resp.status
+
+_sms_gateway = None
+
 def get_sms_gateway() -> SMSGateway:
-    return SMSGateway() 
\ No newline at end of file
+    global _sms_gateway
+    if _sms_gateway is None:
+        _sms_gateway = SMSGateway()
+    return _sms_gateway
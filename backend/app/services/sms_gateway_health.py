@@ -0,0 +1,95 @@
+import asyncio
+import logging
+import time
+from typing import Dict, Optional
+
+import aiohttp
+
+from app.core.config import settings
+from app.services.sms_gateway import get_sms_gateway
+
+logger = logging.getLogger(__name__)
+
+STATUS_CONNECTED = "Подключен"
+STATUS_ERROR = "Ошибка"
+
+class SMSGatewayHealthMonitor:
+    """
+    Фоновая проверка доступности SMS-шлюза.
+
+    Шлюз опрашивается раз в SMS_GATEWAY_HEALTH_INTERVAL секунд, результат
+    (статус, задержка, последняя ошибка) хранится в памяти процесса.
+    Эндпоинты статистики читают только кэш и не ходят в шлюз сами.
+    """
+
+    def __init__(self):
+        self._state = {
+            "status": STATUS_ERROR,
+            "http_status": None,
+            "latency_ms": None,
+            "last_error": "Проверка ещё не выполнялась",
+            "checked_at": None,
+            "last_ok_at": None,
+            "consecutive_failures": 0,
+        }
+
+    async def check(self) -> Dict:
+        """Выполнить одну проверку и обновить кэш"""
+        started = time.perf_counter()
+        http_status: Optional[int] = None
+        error: Optional[str] = None
+        if not settings.SMS_GATEWAY_URL:
+            error = "SMS_GATEWAY_URL не задан"
+        else:
+            try:
+                http_status = await get_sms_gateway().probe()
+                # Любой ответ, кроме 5xx и ошибок авторизации, означает, что шлюз доступен
+                if http_status >= 500 or http_status in (401, 403):
+                    error = f"HTTP {http_status}"
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                error = str(e) or e.__class__.__name__
+        latency_ms = (time.perf_counter() - started) * 1000
+
+        now = time.time()
+        self._state["http_status"] = http_status
+        self._state["latency_ms"] = latency_ms
+        self._state["checked_at"] = now
+        if error is None:
+            if self._state["status"] != STATUS_CONNECTED:
+                logger.info(f"SMS шлюз доступен (HTTP {http_status}, {latency_ms:.0f}мс)")
+            self._state["status"] = STATUS_CONNECTED
+            self._state["last_error"] = None
+            self._state["last_ok_at"] = now
+            self._state["consecutive_failures"] = 0
+        else:
+            if self._state["status"] != STATUS_ERROR or self._state["consecutive_failures"] == 0:
+                logger.error(f"SMS шлюз недоступен: {error}")
+            self._state["status"] = STATUS_ERROR
+            self._state["last_error"] = error
+            self._state["consecutive_failures"] += 1
+        return self.get_state()
+
+    async def run(self) -> None:
+        logger.info("Мониторинг состояния SMS-шлюза запущен")
+        while True:
+            try:
+                await self.check()
+            except Exception as e:
+                logger.error(f"Ошибка проверки состояния SMS шлюза: {e}", exc_info=True)
+            await asyncio.sleep(settings.SMS_GATEWAY_HEALTH_INTERVAL)
+
+    def get_state(self) -> Dict:
+        state = dict(self._state)
+        checked_at = state["checked_at"]
+        # Устаревший результат (монитор остановлен или завис) не считаем успешным
+        if checked_at is None or time.time() - checked_at > settings.SMS_GATEWAY_HEALTH_INTERVAL * 3:
+            state["status"] = STATUS_ERROR
+            state["stale"] = True
+        else:
+            state["stale"] = False
+        return state
+
+    def get_status(self) -> str:
+        return self.get_state()["status"]
+
+sms_gateway_health = SMSGatewayHealthMonitor()
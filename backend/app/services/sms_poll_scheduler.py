@@ -0,0 +1,127 @@
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from typing import Dict, Optional
+
+from app.core.config import settings
+from app.services.sms_poller import poll_sms_gateway
+from app.utils.async_loop import call_soon_in_loop
+
+logger = logging.getLogger(__name__)
+
+class SMSPollScheduler:
+    """
+    Адаптивный планировщик опроса SMS-шлюза.
+
+    - после отправки команды (trigger_fast_polling) опрашивает шлюз с коротким
+      интервалом в течение SMS_POLL_FAST_WINDOW секунд;
+    - пока на шлюзе есть сообщения, держит базовый интервал;
+    - при простое или ошибках шлюза увеличивает интервал экспоненциально
+      до SMS_POLL_MAX_INTERVAL;
+    - к каждому интервалу добавляется случайный разброс (jitter).
+    """
+
+    def __init__(self):
+        self._wakeup = asyncio.Event()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._fast_until = 0.0
+        self._backoff_interval = float(settings.SMS_POLL_BASE_INTERVAL)
+        self._latencies = deque(maxlen=100)
+        self.metrics = {
+            "polls_total": 0,
+            "errors_total": 0,
+            "consecutive_errors": 0,
+            "last_poll_at": None,
+            "last_poll_latency": None,
+            "avg_poll_latency": None,
+            "max_poll_latency": None,
+            "backlog_depth": 0,
+            "messages_total": 0,
+            "next_interval": None,
+            "fast_polling": False,
+        }
+
+    def trigger_fast_polling(self, window: Optional[int] = None) -> None:
+        """Включить частый опрос (например, сразу после отправки SMS-команды)"""
+        window = window if window is not None else settings.SMS_POLL_FAST_WINDOW
+        self._fast_until = max(self._fast_until, time.monotonic() + window)
+        self._backoff_interval = float(settings.SMS_POLL_BASE_INTERVAL)
+        self._wake()
+        logger.info(f"Включен частый опрос SMS-шлюза на {window}с")
+
+    def _wake(self) -> None:
+        # trigger_fast_polling может вызываться из потоков threadpool
+        call_soon_in_loop(self._loop, self._wakeup.set)
+
+    def _next_interval(self, result: Dict) -> float:
+        base = float(settings.SMS_POLL_BASE_INTERVAL)
+        max_interval = float(settings.SMS_POLL_MAX_INTERVAL)
+        fast = time.monotonic() < self._fast_until
+
+        if result.get("error"):
+            # Ошибка шлюза: экспоненциальная задержка даже в режиме частого опроса
+            self._backoff_interval = min(max_interval, self._backoff_interval * 2)
+            interval = self._backoff_interval
+        elif result.get("received"):
+            # На шлюзе были сообщения - возможно, там ещё есть очередь
+            self._backoff_interval = base
+            interval = float(settings.SMS_POLL_FAST_INTERVAL) if fast else base
+        elif fast:
+            interval = float(settings.SMS_POLL_FAST_INTERVAL)
+        else:
+            # Простой: постепенно увеличиваем интервал
+            interval = self._backoff_interval
+            self._backoff_interval = min(max_interval, self._backoff_interval * 2)
+
+        jitter = settings.SMS_POLL_JITTER
+        if jitter > 0:
+            interval *= 1 + random.uniform(-jitter, jitter)
+        return max(0.5, interval)
+
+    def _record(self, result: Dict, latency: float) -> None:
+        self._latencies.append(latency)
+        self.metrics["polls_total"] += 1
+        self.metrics["last_poll_at"] = time.time()
+        self.metrics["last_poll_latency"] = latency
+        self.metrics["avg_poll_latency"] = sum(self._latencies) / len(self._latencies)
+        self.metrics["max_poll_latency"] = max(self._latencies)
+        self.metrics["backlog_depth"] = result.get("received", 0)
+        self.metrics["messages_total"] += result.get("received", 0)
+        if result.get("error"):
+            self.metrics["errors_total"] += 1
+            self.metrics["consecutive_errors"] += 1
+        else:
+            self.metrics["consecutive_errors"] = 0
+
+    async def run(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        logger.info("Планировщик опроса SMS-шлюза запущен")
+        while True:
+            started = time.perf_counter()
+            try:
+                result = await poll_sms_gateway()
+            except Exception as e:
+                logger.error(f"Ошибка в SMS polling: {e}")
+                result = {"received": 0, "error": True}
+            self._record(result, time.perf_counter() - started)
+
+            interval = self._next_interval(result)
+            self.metrics["next_interval"] = interval
+            self.metrics["fast_polling"] = time.monotonic() < self._fast_until
+            logger.debug(f"Следующий опрос SMS-шлюза через {interval:.1f}с")
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def get_metrics(self) -> Dict:
+        return dict(self.metrics)
+
+sms_poll_scheduler = SMSPollScheduler()
+
+def trigger_fast_polling(window: Optional[int] = None) -> None:
+    sms_poll_scheduler.trigger_fast_polling(window)
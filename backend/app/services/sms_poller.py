@@ -1,80 +1,178 @@
 import re
 import logging
 import asyncio
-import httpx
+import time
+import aiohttp
 import json
 from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
 
 from app.core.config import settings
 from app.core.database import SessionLocal
 from app.models.device import Device
 from app.models.log import Log
+from app.services.device_phone_cache import device_phone_cache
+from app.services.event_bus import event_bus
+from app.services.http_client import get_http_session
+from app.utils.phone import normalize_phone
 
 logger = logging.getLogger(__name__)
 
-async def poll_sms_gateway():
+def _unlink_missing_devices(db: Session, log_rows: List[Dict]) -> None:
+    """Снять ссылки на устройства, которых уже нет в БД, и сбросить их в карте номеров"""
+    device_ids = {row["device_id"] for row in log_rows if row["device_id"] is not None}
+    existing = {device_id for (device_id,) in db.query(Device.id).filter(Device.id.in_(device_ids)).all()}
+    for device_id in device_ids - existing:
+        device_phone_cache.remove(device_id)
+        logger.warning(f"Устройство id={device_id} удалено: входящие SMS сохранены без устройства")
+    for row in log_rows:
+        if row["device_id"] is not None and row["device_id"] not in existing:
+            row["device_id"] = None
+            row["status"] = "unmatched"
+
+def ingest_sms_batch(db: Session, sms_messages: List[Dict]) -> Dict:
+    """
+    Пакетное сохранение входящих SMS: устройства ищутся по номерам отправителей
+    в карте device_phone_cache (без запроса к БД для известных номеров), затем
+    одна вставка Log-записей (executemany) в одной транзакции.
+    Возвращает статистику пачки.
+    """
+    started = time.perf_counter()
+
+    valid_messages = []
+    for sms_data in sms_messages:
+        if sms_data.get("from") and sms_data.get("message"):
+            valid_messages.append(sms_data)
+        else:
+            logger.warning(f"Не удалось получить номер телефона или сообщение из SMS-блока: {sms_data}")
+
+    # Номера отправителей приводятся к E.164 и ищутся в карте номеров в памяти;
+    # в БД уходят только номера, которых нет в карте (один запрос на пачку)
+    normalized = {sms_data["from"]: normalize_phone(sms_data["from"]) for sms_data in valid_messages}
+    devices_by_phone = device_phone_cache.lookup_many(db, {phone for phone in normalized.values() if phone})
+
+    log_rows = []
+    for sms_data in valid_messages:
+        phone_number = sms_data["from"]
+        message_text = sms_data["message"]
+        timestamp = sms_data.get("timestamp") # Необязательное поле
+        device = devices_by_phone.get(normalized[phone_number])
+
+        log_entry_message = f"Входящее SMS от {phone_number}: {message_text}"
+        if timestamp:
+            log_entry_message = f"Входящее SMS от {phone_number} ({timestamp}): {message_text}"
+
+        log_rows.append({
+            "device_id": device.id if device else None,
+            "level": "sms_in",
+            "message": log_entry_message,
+            "status": "received" if device else "unmatched",
+            "extra_data": sms_data, # Сохраняем весь словарь SMS как Python-объект
+        })
+        if not device:
+            logger.debug(f"Устройство с номером {phone_number} не найдено для входящего SMS. Запись сохранена со статусом 'unmatched'")
+
+    if log_rows:
+        try:
+            with db.begin_nested():
+                db.execute(insert(Log), log_rows)
+        except IntegrityError:
+            # Устройство удалено в другом процессе после загрузки карты номеров:
+            # такие SMS сохраняются без устройства, остальные записи пачки не теряются
+            _unlink_missing_devices(db, log_rows)
+            db.execute(insert(Log), log_rows)
+        db.commit()
+
+    platform_by_device = {device.id: device.platform_id for device in devices_by_phone.values()}
+    matched = 0
+    received_by_platform: Dict[Optional[int], List[int]] = {}
+    for row in log_rows:
+        if row["device_id"] is not None:
+            matched += 1
+            received_by_platform.setdefault(platform_by_device[row["device_id"]], []).append(row["device_id"])
+
+    # Push-канал /ws: входящие SMS для участников платформы (без платформы - superadmin)
+    for platform_id, device_ids in received_by_platform.items():
+        event_bus.publish("sms_in", {"count": len(device_ids), "device_ids": sorted(set(device_ids))}, platform_id=platform_id)
+    if len(log_rows) > matched:
+        event_bus.publish("sms_in", {"count": len(log_rows) - matched, "unmatched": True})
+
+    elapsed = time.perf_counter() - started
+    stats = {
+        "received": len(sms_messages),
+        "stored": len(log_rows),
+        "matched": matched,
+        "unmatched": len(log_rows) - matched,
+        "elapsed": elapsed,
+        "rate": len(log_rows) / elapsed if elapsed > 0 else 0.0,
+    }
+    logger.info(
+        f"Пачка SMS сохранена: {stats['stored']} записей ({stats['matched']} сопоставлено, "
+        f"{stats['unmatched']} без устройства) за {elapsed:.3f}с ({stats['rate']:.0f} SMS/с)"
+    )
+    return stats
+
+def _store_sms_batch(sms_messages: List[Dict]) -> Dict:
+    """Сохранить пачку в собственной сессии (выполняется в потоке, не в event loop)"""
     db = SessionLocal()
+    try:
+        return ingest_sms_batch(db, sms_messages)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+async def poll_sms_gateway() -> Dict:
+    """
+    Один цикл опроса SMS-шлюза. Возвращает результат опроса для планировщика:
+    количество полученных SMS (глубина очереди на шлюзе) и признак ошибки.
+    """
+    result = {"received": 0, "error": False}
     try:
         headers = {
             "Authorization": f"{settings.SMS_GATEWAY_API_KEY}"
         }
-        async with httpx.AsyncClient() as client:
-            response = await client.get(f"{settings.SMS_GATEWAY_URL}/sms", headers=headers)
+        session = get_http_session()
+        async with session.get(f"{settings.SMS_GATEWAY_URL}/sms", headers=headers) as response:
             response.raise_for_status()
-            
+
             # Теперь предполагаем, что шлюз возвращает JSON
-            json_data = response.json()
-            logger.info(f"Получен JSON ответ от SMS-шлюза:\n{json_data}")
+            json_data = await response.json(content_type=None)
+            logger.debug(f"Получен JSON ответ от SMS-шлюза:\n{json_data}")
 
         # Проверяем статус из JSON ответа, игнорируя регистр
         status_from_gateway = json_data.get("status", "").lower()
         if status_from_gateway == "no new sms" or not json_data.get("sms_messages"):
             logger.info("SMS-шлюз сообщает: Нет новых SMS или список пуст. Пропускаем парсинг.")
-            return
+            return result
 
         sms_messages = json_data.get("sms_messages", [])
+        result["received"] = len(sms_messages)
+        logger.info(f"Получено {len(sms_messages)} SMS от шлюза")
 
+        # Разбиваем на пачки, чтобы одна транзакция не росла неограниченно. Работа с БД
+        # идёт в потоке: event loop обслуживает /ws, воркеры SMS и очередь вебхуков
+        batch_size = max(1, settings.SMS_INGEST_BATCH_SIZE)
         processed_sms_count = 0
-        for sms_data in sms_messages:
-            phone_number = sms_data.get("from")
-            message_text = sms_data.get("message")
-            timestamp = sms_data.get("timestamp") # Необязательное поле
-
-            if phone_number and message_text:
-                # Нормализуем номер телефона: удаляем символ '+'
-                normalized_phone_number = phone_number.lstrip('+')
-                device = db.query(Device).filter(Device.phone == normalized_phone_number).first()
-
-                log_entry_message = f"Входящее SMS от {phone_number}: {message_text}"
-                if timestamp:
-                    log_entry_message = f"Входящее SMS от {phone_number} ({timestamp}): {message_text}"
-
-                log_entry = Log(
-                    device_id=device.id if device else None,
-                    level="sms_in",
-                    message=log_entry_message,
-                    status="received" if device else "unmatched",
-                    extra_data=sms_data # Сохраняем весь словарь SMS как Python-объект
-                )
-                db.add(log_entry)
-                db.commit()
-
-                if device:
-                    logger.info(f"Сохранено входящее SMS от устройства {device.name} ({phone_number}): {message_text}")
-                    processed_sms_count += 1
-                else:
-                    logger.warning(f"Устройство с номером {phone_number} не найдено для входящего SMS. Запись сохранена со статусом 'unmatched': {message_text}")
-            else:
-                logger.warning(f"Не удалось получить номер телефона или сообщение из SMS-блока: {sms_data}")
-        
+        for offset in range(0, len(sms_messages), batch_size):
+            batch = sms_messages[offset:offset + batch_size]
+            try:
+                stats = await asyncio.to_thread(_store_sms_batch, batch)
+                processed_sms_count += stats["matched"]
+            except Exception as e:
+                logger.error(f"Ошибка сохранения пачки SMS ({offset}-{offset + len(batch)}): {e}", exc_info=True)
+
         logger.info(f"Обработано {processed_sms_count} новых SMS.")
 
-    except httpx.RequestError as e:
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        result["error"] = True
         logger.error(f"Ошибка при запросе к SMS-шлюзу: {e}")
     except Exception as e:
+        result["error"] = True
         logger.error(f"Неизвестная ошибка в poll_sms_gateway: {e}", exc_info=True)
-    finally:
-        db.close()
-
-# TODO: Интегрировать trigger_fast_polling в app.services.command_service.CommandService 
-# или в app.api.v1.commands.execute_command после успешной отправки SMS. 
\ No newline at end of file
+    return result
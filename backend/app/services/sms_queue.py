@@ -0,0 +1,341 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.alert import Alert
+from app.models.log import Log
+from app.models.sms_outbox import SMSOutbox
+from app.services.alert_sms_coalescing import AlertSMSCoalescing
+from app.services.event_bus import event_bus
+from app.services.open_alert_registry import open_alert_registry
+from app.services.sms_gateway import get_sms_gateway
+from app.utils.async_loop import call_soon_in_loop
+
+logger = logging.getLogger(__name__)
+
+# Паузы между повторами записи результата успешной отправки (секунды)
+COMPLETE_RETRY_DELAYS = (0.5, 2.0)
+
+class SMSQueue:
+    """
+    Персистентная очередь исходящих SMS поверх таблицы sms_outbox.
+
+    Обработчики запросов только ставят сообщение в очередь (enqueue) и сразу
+    возвращают ответ. Отправку выполняют N фоновых воркеров: они забирают
+    сообщения через SELECT ... FOR UPDATE SKIP LOCKED, повторяют неудачные
+    попытки с экспоненциальной задержкой (не более MAX_RETRY_ATTEMPTS) и
+    записывают результат в связанные Log / Alert.
+    """
+
+    def __init__(self):
+        self._wakeup = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._next_release_at = 0.0
+
+    @staticmethod
+    def enqueue(
+        db: Session,
+        phone: str,
+        text: str,
+        log_id: Optional[int] = None,
+        alert_id: Optional[int] = None,
+        device_id: Optional[int] = None,
+        platform_id: Optional[int] = None,
+        user_id: Optional[int] = None,
+        commit: bool = True,
+    ) -> SMSOutbox:
+        """Поставить SMS в очередь. Отправка выполняется фоновым воркером"""
+        message = SMSOutbox(
+            phone=phone,
+            text=text,
+            log_id=log_id,
+            alert_id=alert_id,
+            device_id=device_id,
+            platform_id=platform_id,
+            user_id=user_id,
+        )
+        db.add(message)
+        if commit:
+            db.commit()
+            db.refresh(message)
+        else:
+            db.flush()
+        sms_queue.notify()
+        logger.info(f"SMS для {phone} поставлено в очередь (id={message.id})")
+        return message
+
+    @staticmethod
+    def enqueue_many(db: Session, messages: List[dict]) -> List[SMSOutbox]:
+        """
+        Поставить пачку SMS в очередь в транзакции вызывающего кода (без commit):
+        строки вставляются одним batch INSERT при flush. После commit нужно
+        вызвать sms_queue.notify().
+        """
+        rows = [SMSOutbox(**message) for message in messages]
+        db.add_all(rows)
+        return rows
+
+    def notify(self) -> None:
+        """
+        Разбудить воркеры (сообщение добавлено в этом процессе).
+        Безопасно вызывать из потоков threadpool, в которых работают sync-обработчики.
+        """
+        call_soon_in_loop(self._loop, self._wakeup.set)
+
+    @staticmethod
+    def _claim(limit: int) -> List[dict]:
+        db = SessionLocal()
+        try:
+            rows = db.execute(text("""
+                UPDATE sms_outbox
+                SET status = 'processing', attempts = attempts + 1, locked_at = now()
+                WHERE id IN (
+                    SELECT id FROM sms_outbox
+                    WHERE status = 'pending' AND next_attempt_at <= now()
+                    ORDER BY next_attempt_at, id
+                    LIMIT :limit
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING id, phone, text, attempts, log_id, alert_id, device_id, platform_id, user_id, job_id
+            """), {"limit": limit}).mappings().all()
+            # SMS по алертам: присоединяем ожидающие SMS на тот же номер в той же транзакции
+            messages = [AlertSMSCoalescing.coalesce_claimed(db, dict(row)) for row in rows]
+            db.commit()
+            return messages
+        finally:
+            db.close()
+
+    @staticmethod
+    def _release_stale() -> int:
+        """Вернуть в очередь сообщения, зависшие в 'processing' (например, после перезапуска)"""
+        db = SessionLocal()
+        try:
+            stale_before = datetime.now(timezone.utc) - timedelta(seconds=settings.SMS_QUEUE_TIMEOUT * 2)
+            count = db.query(SMSOutbox).filter(
+                SMSOutbox.status == "processing",
+                SMSOutbox.locked_at < stale_before
+            ).update({SMSOutbox.status: "pending", SMSOutbox.locked_at: None}, synchronize_session=False)
+            db.commit()
+            return count
+        finally:
+            db.close()
+
+    async def _release_stale_if_due(self) -> None:
+        """
+        Периодически (раз в SMS_QUEUE_TIMEOUT) возвращать в очередь зависшие
+        сообщения: воркер мог упасть посреди обработки, не дожидаясь перезапуска
+        """
+        loop = asyncio.get_running_loop()
+        if loop.time() < self._next_release_at:
+            return
+        self._next_release_at = loop.time() + settings.SMS_QUEUE_TIMEOUT
+        try:
+            released = await asyncio.to_thread(self._release_stale)
+            if released:
+                logger.warning(f"Возвращено в очередь {released} зависших SMS")
+        except Exception as e:
+            logger.error(f"Не удалось проверить зависшие SMS: {e}")
+
+    @staticmethod
+    def _complete(message: dict, success: bool, response: Optional[str], error: Optional[str]) -> None:
+        db = SessionLocal()
+        try:
+            outbox = db.query(SMSOutbox).filter(SMSOutbox.id == message["id"]).first()
+            if not outbox:
+                return
+
+            final = success or message["attempts"] >= settings.MAX_RETRY_ATTEMPTS
+            if success:
+                outbox.status = "sent"
+                outbox.response = response
+                outbox.last_error = None
+            elif final:
+                outbox.status = "failed"
+                outbox.last_error = error
+            else:
+                delay = settings.SMS_QUEUE_RETRY_BASE_DELAY * (2 ** (message["attempts"] - 1))
+                outbox.status = "pending"
+                outbox.last_error = error
+                outbox.next_attempt_at = datetime.now(timezone.utc) + timedelta(seconds=delay)
+                logger.warning(f"SMS id={message['id']} не отправлено (попытка {message['attempts']}), повтор через {delay}с: {error}")
+            outbox.locked_at = None
+
+            if final:
+                SMSQueue._write_back(db, message, success, response, error)
+            db.commit()
+        finally:
+            db.close()
+
+        if final and message["user_id"]:
+            # Push-канал /ws: итог отправки команды её автору
+            event_bus.publish("command_status", {
+                "sms_id": message["id"],
+                "log_id": message["log_id"],
+                "job_id": message.get("job_id"),
+                "device_id": message["device_id"],
+                "status": "sent" if success else "failed",
+                "error": None if success else error,
+            }, user_id=message["user_id"])
+
+    @staticmethod
+    def _mark_sent(message_id: int, response: Optional[str]) -> None:
+        """
+        Минимальная отметка об успешной отправке, когда _complete не удалось
+        выполнить: без неё сообщение вернётся в очередь и будет отправлено повторно
+        """
+        db = SessionLocal()
+        try:
+            db.execute(text("""
+                UPDATE sms_outbox
+                SET status = 'sent', response = :response, last_error = NULL, locked_at = NULL, updated_at = now()
+                WHERE id = :id
+            """), {"id": message_id, "response": response})
+            db.commit()
+        finally:
+            db.close()
+
+    async def _complete_sent(self, message: dict, response: Optional[str]) -> None:
+        """Записать успешную отправку; повторить при ошибке БД, в крайнем случае - только статус 'sent'"""
+        attempts = len(COMPLETE_RETRY_DELAYS) + 1
+        for attempt in range(1, attempts + 1):
+            try:
+                await asyncio.to_thread(self._complete, message, True, response, None)
+                return
+            except Exception as e:
+                if attempt == attempts:
+                    logger.error(f"Не удалось записать результат отправки SMS id={message['id']}: {e}", exc_info=True)
+                    break
+                logger.warning(f"Ошибка записи результата отправки SMS id={message['id']} (попытка {attempt}): {e}")
+                await asyncio.sleep(COMPLETE_RETRY_DELAYS[attempt - 1])
+
+        try:
+            await asyncio.to_thread(self._mark_sent, message["id"], response)
+            logger.warning(f"SMS id={message['id']} отмечено отправленным без обновления связанных Log / Alert")
+        except Exception as e:
+            # Сообщение останется в 'processing' и после _release_stale будет отправлено повторно
+            logger.critical(f"[SUPERADMIN] SMS id={message['id']} отправлено, но статус не сохранён: {e}")
+
+    @staticmethod
+    def _write_back(db: Session, message: dict, success: bool, response: Optional[str], error: Optional[str]) -> None:
+        """Записать итог отправки в связанные Log / Alert"""
+        if message["log_id"]:
+            log = db.query(Log).filter(Log.id == message["log_id"]).first()
+            if log:
+                if success:
+                    log.status = "sent"
+                    log.level = "SMS_OUT"
+                    log.response = response or "OK"
+                else:
+                    log.status = "failed"
+                    log.level = "ERROR"
+                    log.response = f"Ошибка отправки SMS: {error}"
+                log.message = f"Command {log.command}: {log.status}"
+
+        if message["alert_id"]:
+            # Алерты объединённых SMS получают тот же итог, что и основное сообщение
+            alert_ids = [message["alert_id"]] + [
+                alert_id for (alert_id,) in db.query(SMSOutbox.alert_id).filter(
+                    SMSOutbox.coalesced_into_id == message["id"], SMSOutbox.alert_id.isnot(None)
+                ).all()
+            ]
+            for alert in db.query(Alert).filter(Alert.id.in_(alert_ids)).all():
+                # Алерт мог быть закрыт, пока SMS ждало окна объединения: статус resolved не трогаем
+                still_firing = alert.status == "firing"
+                if success:
+                    alert.response = f"SMS отправлено: {message['text']}"
+                    if still_firing:
+                        alert.status = "firing_sms_sent" # Обновляем статус алерта после отправки SMS
+                    open_alert_registry.discard(alert.id)
+                else:
+                    alert.response = f"Ошибка отправки SMS: {error}"
+                    if still_firing:
+                        alert.status = "firing_sms_failed" # Обновляем статус алерта при ошибке отправки SMS
+                    open_alert_registry.discard(alert.id)
+                    # Критический лог для superadmin
+                    logger.critical(f"[SUPERADMIN] Не удалось отправить SMS для устройства {message['phone']} (алерт ID {alert.id}): {error}")
+
+        if message["user_id"]:
+            from app.core.audit import log_audit
+            if success:
+                action = "sms_command_sent"
+                details = f"SMS command '{message['text']}' sent to {message['phone']}"
+            else:
+                action = "sms_gateway_error"
+                details = f"SMS Gateway error for {message['phone']}: {str(error)[:200]}"
+            log_audit(
+                db=db,
+                action=action,
+                user_id=message["user_id"],
+                platform_id=message["platform_id"],
+                device_id=message["device_id"],
+                details=details
+            )
+
+    async def _process(self, message: dict) -> None:
+        sms_gateway = get_sms_gateway()
+        try:
+            response = await asyncio.wait_for(
+                sms_gateway.send_command(message["phone"], message["text"]),
+                timeout=settings.SMS_QUEUE_TIMEOUT
+            )
+        except Exception as e:
+            error = "таймаут отправки" if isinstance(e, asyncio.TimeoutError) else str(e)
+            logger.error(f"Ошибка отправки SMS id={message['id']} на {message['phone']}: {error}")
+            await asyncio.to_thread(self._complete, message, False, None, error)
+            return
+
+        logger.info(f"SMS id={message['id']} отправлено на {message['phone']}")
+        await self._complete_sent(message, response)
+        if message["log_id"]:
+            # Ждём ответ устройства на команду: временно опрашиваем шлюз чаще
+            from app.services.sms_poll_scheduler import trigger_fast_polling
+            trigger_fast_polling()
+
+    async def _worker(self, worker_id: int) -> None:
+        logger.info(f"SMS воркер {worker_id} запущен")
+        while True:
+            await self._release_stale_if_due()
+            try:
+                messages = await asyncio.to_thread(self._claim, 1)
+            except Exception as e:
+                logger.error(f"SMS воркер {worker_id}: ошибка чтения очереди: {e}")
+                messages = []
+
+            if messages:
+                for message in messages:
+                    try:
+                        await self._process(message)
+                    except Exception as e:
+                        # Сообщение остаётся в 'processing' и вернётся в очередь через _release_stale
+                        logger.error(f"SMS воркер {worker_id}: ошибка обработки SMS id={message['id']}: {e}", exc_info=True)
+                continue
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=settings.SMS_QUEUE_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+    async def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._next_release_at = 0.0
+        await self._release_stale_if_due()
+        for worker_id in range(settings.SMS_QUEUE_WORKERS):
+            self._tasks.append(asyncio.create_task(self._worker(worker_id)))
+        self._wakeup.set()
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        logger.info("SMS воркеры остановлены")
+
+sms_queue = SMSQueue()
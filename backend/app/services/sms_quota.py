@@ -0,0 +1,268 @@
+import logging
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.platform_sms_usage import PlatformSMSUsage
+
+logger = logging.getLogger(__name__)
+
+# granted - сколько SMS из запрошенных можно отправить, reason - причина отказа
+QuotaResult = namedtuple("QuotaResult", ["granted", "reason"])
+
+REASON_RATE_LIMIT = "rate_limit"
+REASON_PLATFORM_QUOTA = "platform_quota"
+REASON_USER_QUOTA = "user_quota"
+
+_REJECT_MESSAGES = {
+    REASON_RATE_LIMIT: "Превышена скорость отправки SMS для платформы, повторите позже",
+    REASON_PLATFORM_QUOTA: "Исчерпан лимит SMS платформы на текущий период",
+    REASON_USER_QUOTA: "Исчерпан лимит SMS пользователя на текущий период",
+}
+
+# Лимит 0 или NULL - без ограничения (как в get_platform_limits)
+_PLATFORM_CONSUME_SQL = text("""
+    INSERT INTO platform_sms_usage (platform_id, period_start, sent, updated_at)
+    SELECT :platform_id, :period_start, :count, now()
+    WHERE :count <= COALESCE(NULLIF((SELECT sms_limit FROM platforms WHERE id = :platform_id), 0), :count)
+    ON CONFLICT (platform_id) DO UPDATE SET
+        sent = CASE WHEN platform_sms_usage.period_start < EXCLUDED.period_start
+                    THEN EXCLUDED.sent ELSE platform_sms_usage.sent + EXCLUDED.sent END,
+        period_start = GREATEST(platform_sms_usage.period_start, EXCLUDED.period_start),
+        updated_at = now()
+    WHERE (CASE WHEN platform_sms_usage.period_start < EXCLUDED.period_start
+                THEN 0 ELSE platform_sms_usage.sent END)::bigint + EXCLUDED.sent
+          <= COALESCE(NULLIF((SELECT sms_limit FROM platforms WHERE id = EXCLUDED.platform_id), 0), 2147483647)
+    RETURNING sent
+""")
+
+_PLATFORM_REMAINING_SQL = text("""
+    SELECT GREATEST(p.sms_limit - CASE WHEN u.period_start >= :period_start THEN u.sent ELSE 0 END, 0)
+    FROM platforms p
+    LEFT JOIN platform_sms_usage u ON u.platform_id = p.id
+    WHERE p.id = :platform_id
+""")
+
+# Пользователь без строки user_limits или с max_sms_messages = 0 не ограничен
+_USER_CONSUME_SQL = text("""
+    WITH updated AS (
+        UPDATE user_limits SET
+            sms_messages_sent_current_period = CASE WHEN sms_period_start_date < :period_start
+                THEN :count ELSE sms_messages_sent_current_period + :count END,
+            sms_period_start_date = GREATEST(sms_period_start_date, :period_start)
+        WHERE user_id = :user_id
+          AND (max_sms_messages = 0
+               OR (CASE WHEN sms_period_start_date < :period_start
+                        THEN 0 ELSE sms_messages_sent_current_period END) + :count <= max_sms_messages)
+        RETURNING 1
+    )
+    SELECT EXISTS (SELECT 1 FROM updated) OR NOT EXISTS (SELECT 1 FROM user_limits WHERE user_id = :user_id)
+""")
+
+# Ключ в Session.info: токены скорости, выданные в текущей транзакции сессии
+_PENDING_TOKENS_KEY = "sms_quota_tokens"
+
+class _TokenBucket:
+    """Ведро токенов: capacity токенов, пополнение rate_per_minute в минуту"""
+
+    def __init__(self, rate_per_minute: int):
+        self.capacity = float(rate_per_minute)
+        self.refill_per_second = rate_per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+
+    def take(self, count: int) -> int:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.refill_per_second)
+        self.updated_at = now
+        granted = min(count, int(self.tokens))
+        self.tokens -= granted
+        return granted
+
+    def give_back(self, count: int) -> None:
+        self.tokens = min(self.capacity, self.tokens + count)
+
+class SMSQuotaService:
+    """
+    Квоты исходящих SMS. Проверяется перед постановкой сообщения в очередь
+    (execute_command, SMS по алертам Grafana):
+
+    - скорость отправки на платформу - token bucket в памяти процесса
+      (SMS_RATE_LIMIT_PER_MINUTE), отказ без обращения к БД;
+    - лимит платформы на период (Platform.sms_limit) - атомарный UPSERT
+      в platform_sms_usage с условием на остаток;
+    - лимит пользователя (UserLimits.max_sms_messages) - атомарный UPDATE
+      счётчика sms_messages_sent_current_period.
+
+    Смена периода (SMS_QUOTA_PERIOD) выполняется теми же запросами: счётчик
+    с устаревшим period_start сбрасывается. Изменения счётчиков выполняются
+    в транзакции вызывающего кода (внутри SAVEPOINT) и фиксируются вместе
+    с постановкой SMS в очередь. Токены скорости, выданные в транзакции,
+    возвращаются в ведро, если она откатывается, а не фиксируется.
+    """
+
+    _buckets: Dict[int, _TokenBucket] = {}
+    _buckets_lock = threading.Lock()
+
+    @staticmethod
+    def period_start(now: Optional[datetime] = None) -> datetime:
+        now = now or datetime.now(timezone.utc)
+        start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        if settings.SMS_QUOTA_PERIOD == "month":
+            start = start.replace(day=1)
+        return start
+
+    @classmethod
+    def _take_tokens(cls, platform_id: int, count: int) -> int:
+        if settings.SMS_RATE_LIMIT_PER_MINUTE <= 0:
+            return count
+        with cls._buckets_lock:
+            bucket = cls._buckets.get(platform_id)
+            if bucket is None:
+                bucket = cls._buckets[platform_id] = _TokenBucket(settings.SMS_RATE_LIMIT_PER_MINUTE)
+            return bucket.take(count)
+
+    @classmethod
+    def _return_tokens(cls, platform_id: int, count: int) -> None:
+        if settings.SMS_RATE_LIMIT_PER_MINUTE <= 0 or count <= 0:
+            return
+        with cls._buckets_lock:
+            bucket = cls._buckets.get(platform_id)
+            if bucket is not None:
+                bucket.give_back(count)
+
+    @classmethod
+    def _track_tokens(cls, db: Session, platform_id: int, count: int) -> None:
+        """Запомнить токены, выданные в транзакции db: при её откате они вернутся в ведро"""
+        if settings.SMS_RATE_LIMIT_PER_MINUTE <= 0 or count <= 0:
+            return
+        pending = db.info.get(_PENDING_TOKENS_KEY)
+        if pending is None:
+            pending = db.info[_PENDING_TOKENS_KEY] = []
+            event.listen(db, "after_commit", cls._forget_pending_tokens)
+            event.listen(db, "after_transaction_end", cls._return_pending_tokens)
+        pending.append((platform_id, count))
+
+    @staticmethod
+    def _forget_pending_tokens(db: Session) -> None:
+        db.info.get(_PENDING_TOKENS_KEY, []).clear()
+
+    @classmethod
+    def _return_pending_tokens(cls, db: Session, transaction) -> None:
+        # После commit список уже пуст; иначе корневая транзакция откачена или закрыта без commit
+        if transaction.parent is not None:
+            return
+        pending = db.info.get(_PENDING_TOKENS_KEY)
+        while pending:
+            cls._return_tokens(*pending.pop())
+
+    @staticmethod
+    def _consume_platform(db: Session, platform_id: int, count: int, period_start: datetime, partial: bool) -> int:
+        params = {"platform_id": platform_id, "period_start": period_start}
+        if db.execute(_PLATFORM_CONSUME_SQL, {**params, "count": count}).first() is not None:
+            return count
+        if not partial:
+            return 0
+        # Выдаём остаток лимита; при гонке с другим процессом остаток может уменьшиться - тогда отказ
+        remaining = db.execute(_PLATFORM_REMAINING_SQL, params).scalar() or 0
+        remaining = min(remaining, count)
+        if remaining and db.execute(_PLATFORM_CONSUME_SQL, {**params, "count": remaining}).first() is not None:
+            return remaining
+        return 0
+
+    @classmethod
+    def consume(
+        cls,
+        db: Session,
+        platform_id: Optional[int],
+        user_id: Optional[int] = None,
+        count: int = 1,
+        partial: bool = False,
+    ) -> QuotaResult:
+        """
+        Списать count SMS из квот платформы и пользователя (без commit).
+        С partial=True выдаётся столько SMS, сколько позволяют скорость
+        и лимит платформы; лимит пользователя проверяется на весь остаток.
+        """
+        if count <= 0:
+            return QuotaResult(0, None)
+        period_start = cls.period_start()
+        granted = count
+
+        if platform_id:
+            granted = cls._take_tokens(platform_id, count)
+            if granted < count and not partial:
+                cls._return_tokens(platform_id, granted)
+                return QuotaResult(0, REASON_RATE_LIMIT)
+            if granted == 0:
+                return QuotaResult(0, REASON_RATE_LIMIT)
+
+        savepoint = db.begin_nested()
+        try:
+            reason = None if granted == count else REASON_RATE_LIMIT
+            if platform_id:
+                platform_granted = cls._consume_platform(db, platform_id, granted, period_start, partial)
+                if platform_granted < granted:
+                    cls._return_tokens(platform_id, granted - platform_granted)
+                    granted, reason = platform_granted, REASON_PLATFORM_QUOTA
+            if granted and user_id:
+                allowed = db.execute(_USER_CONSUME_SQL, {
+                    "user_id": user_id, "count": granted, "period_start": period_start,
+                }).scalar()
+                if not allowed:
+                    if platform_id:
+                        cls._return_tokens(platform_id, granted)
+                    granted, reason = 0, REASON_USER_QUOTA
+            if granted:
+                savepoint.commit()
+                if platform_id:
+                    cls._track_tokens(db, platform_id, granted)
+            else:
+                savepoint.rollback()
+        except Exception:
+            savepoint.rollback()
+            if platform_id:
+                cls._return_tokens(platform_id, granted)
+            raise
+
+        if reason:
+            logger.warning(
+                f"Квота SMS: выдано {granted} из {count} (платформа {platform_id}, пользователь {user_id}), причина: {reason}"
+            )
+        return QuotaResult(granted, reason)
+
+    @classmethod
+    def refund(cls, db: Session, platform_id: Optional[int], count: int) -> None:
+        """Вернуть в квоту платформы SMS, которые не будут отправлены (без commit)"""
+        if not platform_id or count <= 0:
+            return
+        db.execute(text("""
+            UPDATE platform_sms_usage SET sent = GREATEST(sent - :count, 0), updated_at = now()
+            WHERE platform_id = :platform_id AND period_start >= :period_start
+        """), {"platform_id": platform_id, "count": count, "period_start": cls.period_start()})
+
+    @classmethod
+    def require(cls, db: Session, platform_id: Optional[int], user_id: Optional[int] = None) -> None:
+        """Списать одно SMS или отклонить запрос с 429"""
+        result = cls.consume(db, platform_id, user_id)
+        if not result.granted:
+            raise HTTPException(status_code=429, detail=_REJECT_MESSAGES[result.reason])
+
+    @classmethod
+    def get_platform_usage(cls, db: Session, platform_id: int) -> int:
+        """Число SMS платформы за текущий период (одна строка по первичному ключу)"""
+        row = db.query(PlatformSMSUsage).filter(PlatformSMSUsage.platform_id == platform_id).first()
+        if row is None or row.period_start < cls.period_start():
+            return 0
+        return row.sent
+
+    @staticmethod
+    def reject_message(reason: str) -> str:
+        return _REJECT_MESSAGES.get(reason, "Отправка SMS отклонена")
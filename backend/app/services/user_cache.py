@@ -0,0 +1,196 @@
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Optional
+
+from fastapi import HTTPException, status
+from sqlalchemy.orm import Session, make_transient_to_detached
+
+from app.core.config import settings
+from app.models.user import User
+from app.services.cache_invalidation import cache_invalidation
+from app.services.event_bus import event_bus
+
+logger = logging.getLogger(__name__)
+
+# Поля пользователя, которые кэшируются. Хэш пароля в кэш не попадает.
+CACHED_FIELDS = ("id", "email", "is_active", "role", "platform_id", "created_at", "updated_at", "token_version")
+_DATETIME_FIELDS = ("created_at", "updated_at")
+
+def _snapshot(user: User) -> Dict:
+    return {field: getattr(user, field) for field in CACHED_FIELDS}
+
+def _to_user(db: Session, snapshot: Dict) -> User:
+    """
+    Пользователь из снимка, присоединённый к сессии запроса без запроса к БД
+    (merge с load=False): связи и не кэшируемые поля (hashed_password)
+    догружаются из БД при обращении. Поля снимка могут отставать от БД
+    не дольше USER_CACHE_TTL - для изменения пользователя его следует
+    загрузить из БД.
+    """
+    user = User(**snapshot)
+    make_transient_to_detached(user)
+    return db.merge(user, load=False)
+
+class UserCache:
+    """
+    Кэш пользователей для get_current_user: ключ - id пользователя и версия
+    токена (claim "ver"), значение - снимок полей пользователя.
+
+    По умолчанию кэш локальный для процесса (LRU с TTL); инвалидация
+    рассылается остальным воркерам через cache_invalidation. При
+    USER_CACHE_BACKEND="redis" используется общий Redis.
+    """
+
+    def __init__(self, ttl: int, max_size: int, backend: str = "memory"):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.backend = backend
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._redis = None
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(user_id: int, token_version: int) -> tuple:
+        return int(user_id), int(token_version)
+
+    def _get_redis(self):
+        if self._redis is None:
+            import redis
+            self._redis = redis.Redis.from_url(settings.REDIS_URL, socket_timeout=1)
+        return self._redis
+
+    @staticmethod
+    def _redis_key(user_id: int) -> str:
+        return f"user_cache:{user_id}"
+
+    def get(self, user_id: int, token_version: int) -> Optional[Dict]:
+        if self.ttl <= 0:
+            return None
+        if self.backend == "redis":
+            return self._redis_get(user_id, token_version)
+        key = self._key(user_id, token_version)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < now:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, snapshot: Dict) -> None:
+        if self.ttl <= 0:
+            return
+        if self.backend == "redis":
+            self._redis_set(snapshot)
+            return
+        key = self._key(snapshot["id"], snapshot["token_version"])
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, snapshot)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: int) -> None:
+        """Удалить все записи пользователя (все версии токена)"""
+        if self.backend == "redis":
+            try:
+                self._get_redis().delete(self._redis_key(user_id))
+            except Exception as e:
+                logger.error(f"Не удалось инвалидировать кэш пользователя {user_id} в Redis: {e}")
+            return
+        self.invalidate_local(user_id)
+
+    def invalidate_local(self, user_id: int) -> None:
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == int(user_id)]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def _redis_get(self, user_id: int, token_version: int) -> Optional[Dict]:
+        try:
+            raw = self._get_redis().get(self._redis_key(user_id))
+        except Exception as e:
+            # Redis недоступен - работаем без кэша
+            logger.warning(f"Кэш пользователей в Redis недоступен: {e}")
+            return None
+        snapshot = json.loads(raw) if raw is not None else None
+        if snapshot is None or snapshot.get("token_version") != int(token_version):
+            with self._lock:
+                self.misses += 1
+            return None
+        for field in _DATETIME_FIELDS:
+            if snapshot.get(field):
+                snapshot[field] = datetime.fromisoformat(snapshot[field])
+        with self._lock:
+            self.hits += 1
+        return snapshot
+
+    def _redis_set(self, snapshot: Dict) -> None:
+        data = dict(snapshot)
+        for field in _DATETIME_FIELDS:
+            if data.get(field):
+                data[field] = data[field].isoformat()
+        try:
+            self._get_redis().set(self._redis_key(snapshot["id"]), json.dumps(data), ex=self.ttl)
+        except Exception as e:
+            logger.warning(f"Не удалось записать пользователя {snapshot['id']} в кэш Redis: {e}")
+
+    def get_metrics(self) -> Dict:
+        with self._lock:
+            size, hits, misses = len(self._entries), self.hits, self.misses
+        total = hits + misses
+        return {
+            "backend": self.backend,
+            "size": size,
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": hits / total if total else 0.0,
+        }
+
+user_cache = UserCache(
+    ttl=settings.USER_CACHE_TTL,
+    max_size=settings.USER_CACHE_MAX_SIZE,
+    backend=settings.USER_CACHE_BACKEND,
+)
+cache_invalidation.register("user", lambda key: user_cache.clear() if key is None else user_cache.invalidate_local(int(key)))
+
+def load_current_user(db: Session, user_id: int, token_version: int = 0) -> Optional[User]:
+    """
+    Пользователь по данным токена: из кэша или из БД. Возвращает None, если
+    пользователь не найден; если версия токена устарела (токен отозван) -
+    401.
+    """
+    snapshot = user_cache.get(user_id, token_version)
+    if snapshot is not None:
+        return _to_user(db, snapshot)
+    user = db.query(User).filter(User.id == user_id).first()
+    if user is None:
+        return None
+    if (user.token_version or 0) != int(token_version):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token revoked",
+        )
+    user_cache.set(_snapshot(user))
+    return user
+
+def invalidate_user(user_id: int) -> None:
+    """Вызывается после изменения, деактивации или удаления пользователя"""
+    user_cache.invalidate(user_id)
+    event_bus.revalidate(user_id)
+    if user_cache.backend != "redis":
+        # Локальные кэши остальных воркеров
+        cache_invalidation.publish("user", user_id)
@@ -0,0 +1,318 @@
+import asyncio
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func, text
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.grafana_webhook_inbox import GrafanaWebhookInbox
+from app.schemas.grafana import GrafanaWebhookPayload
+from app.services.grafana_webhook_processor import GrafanaWebhookProcessor
+from app.services.open_alert_registry import open_alert_registry
+from app.utils.async_loop import call_soon_in_loop
+
+logger = logging.getLogger(__name__)
+
+def payload_hash(raw_payload: dict) -> str:
+    return hashlib.sha256(json.dumps(raw_payload, sort_keys=True, ensure_ascii=False).encode()).hexdigest()
+
+def merge_payloads(payloads: List[dict]) -> dict:
+    """
+    Объединить несколько доставок одной группы (в порядке получения) в одну
+    полезную нагрузку: для каждого алерта (fingerprint, иначе alertname+player_id)
+    остаётся его последнее состояние, заголовок и описание - из последней доставки.
+    """
+    merged = dict(payloads[-1])
+    alerts: Dict[Tuple, dict] = {}
+    for payload in payloads:
+        for alert in payload.get("alerts") or []:
+            labels = alert.get("labels") or {}
+            key = ("fp", alert["fingerprint"]) if alert.get("fingerprint") else ("labels", labels.get("alertname"), labels.get("player_id"))
+            # Переставляем ключ в конец, чтобы сохранить порядок последних состояний
+            alerts.pop(key, None)
+            alerts[key] = alert
+    merged["alerts"] = list(alerts.values())
+    return merged
+
+class WebhookInbox:
+    """
+    Персистентная очередь входящих вебхуков Grafana (таблица grafana_webhook_inbox).
+
+    Эндпоинт только проверяет и сохраняет исходную полезную нагрузку и сразу
+    отвечает 202 - Grafana не ждёт записи в БД и отправки SMS и не повторяет
+    доставку. Воркеры забирают вебхуки по groupKey: одну группу одновременно
+    обрабатывает только один воркер, все накопившиеся доставки группы
+    объединяются и обрабатываются одной транзакцией (GrafanaWebhookProcessor).
+    """
+
+    def __init__(self):
+        self._wakeup = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lags = deque(maxlen=100)
+        self._next_release_at = 0.0
+        self._metrics_lock = threading.Lock()  # accept() вызывается из потоков threadpool
+        self.metrics = {
+            "accepted_total": 0,
+            "duplicates_total": 0,
+            "batches_total": 0,
+            "processed_total": 0,
+            "coalesced_total": 0,
+            "failed_total": 0,
+            "last_batch_at": None,
+            "last_batch_duration": None,
+            "last_lag": None,
+            "avg_lag": None,
+            "max_lag": None,
+        }
+
+    def accept(self, db: Session, raw_payload: dict, group_key: Optional[str]) -> Dict:
+        """
+        Сохранить вебхук в очередь. Повторная доставка того же вебхука, который
+        ещё ждёт обработки, не создаёт новую запись (увеличивается deliveries).
+        """
+        digest = payload_hash(raw_payload)
+        group_key = group_key or f"hash:{digest}"
+        duplicate_id = db.execute(text("""
+            UPDATE grafana_webhook_inbox SET deliveries = deliveries + 1
+            WHERE id = (
+                SELECT id FROM grafana_webhook_inbox
+                WHERE group_key = :group_key AND payload_hash = :digest AND status = 'pending'
+                ORDER BY id DESC LIMIT 1
+            )
+            RETURNING id
+        """), {"group_key": group_key, "digest": digest}).scalar()
+        if duplicate_id:
+            db.commit()
+            self._count("duplicates_total")
+            logger.info(f"Повторная доставка вебхука groupKey={group_key} объединена с id={duplicate_id}")
+            return {"id": duplicate_id, "group_key": group_key, "duplicate": True}
+
+        entry = GrafanaWebhookInbox(group_key=group_key, payload_hash=digest, payload=raw_payload)
+        db.add(entry)
+        db.commit()
+        self._count("accepted_total")
+        self.notify()
+        return {"id": entry.id, "group_key": group_key, "duplicate": False}
+
+    def _count(self, name: str, value: int = 1) -> None:
+        with self._metrics_lock:
+            self.metrics[name] += value
+
+    def notify(self) -> None:
+        """Разбудить воркеры. Безопасно вызывать из потоков threadpool"""
+        call_soon_in_loop(self._loop, self._wakeup.set)
+
+    @staticmethod
+    def _claim_group() -> Optional[Tuple[str, List[dict]]]:
+        """
+        Забрать все ожидающие доставки одной группы. Захват группы
+        сериализуется advisory-блокировкой транзакции, поэтому группа, уже
+        находящаяся в обработке у другого воркера (или процесса), пропускается.
+        """
+        db = SessionLocal()
+        try:
+            candidates = db.execute(text("""
+                SELECT group_key FROM grafana_webhook_inbox
+                WHERE status = 'pending' AND next_attempt_at <= now()
+                GROUP BY group_key
+                ORDER BY min(received_at)
+                LIMIT 10
+            """)).scalars().all()
+            for group_key in candidates:
+                locked = db.execute(
+                    text("SELECT pg_try_advisory_xact_lock(hashtext('grafana_webhook_inbox'), hashtext(:group_key))"),
+                    {"group_key": group_key},
+                ).scalar()
+                if not locked:
+                    continue
+                rows = db.execute(text("""
+                    UPDATE grafana_webhook_inbox
+                    SET status = 'processing', attempts = attempts + 1, locked_at = now()
+                    WHERE group_key = :group_key AND status = 'pending' AND next_attempt_at <= now()
+                      AND NOT EXISTS (
+                          SELECT 1 FROM grafana_webhook_inbox
+                          WHERE group_key = :group_key AND status = 'processing'
+                      )
+                    RETURNING id, payload, attempts, received_at
+                """), {"group_key": group_key}).mappings().all()
+                if rows:
+                    db.commit()
+                    return group_key, sorted((dict(row) for row in rows), key=lambda row: (row["received_at"], row["id"]))
+            db.commit()
+            return None
+        finally:
+            db.close()
+
+    @staticmethod
+    def _release_stale() -> int:
+        """Вернуть в очередь зависшие вебхуки и удалить старые обработанные"""
+        db = SessionLocal()
+        try:
+            now = datetime.now(timezone.utc)
+            count = db.query(GrafanaWebhookInbox).filter(
+                GrafanaWebhookInbox.status == "processing",
+                GrafanaWebhookInbox.locked_at < now - timedelta(seconds=settings.WEBHOOK_INBOX_LOCK_TIMEOUT)
+            ).update({GrafanaWebhookInbox.status: "pending", GrafanaWebhookInbox.locked_at: None}, synchronize_session=False)
+            db.query(GrafanaWebhookInbox).filter(
+                GrafanaWebhookInbox.status.in_(["done", "coalesced"]),
+                GrafanaWebhookInbox.processed_at < now - timedelta(days=settings.WEBHOOK_INBOX_RETENTION_DAYS)
+            ).delete(synchronize_session=False)
+            db.commit()
+            return count
+        finally:
+            db.close()
+
+    @staticmethod
+    def _process_group(group_key: str, rows: List[dict]) -> Dict:
+        """Обработать объединённую полезную нагрузку группы и отметить доставки"""
+        ids = [row["id"] for row in rows]
+        primary_id = ids[-1]
+        db = SessionLocal()
+        try:
+            try:
+                payload = GrafanaWebhookPayload.model_validate(merge_payloads([row["payload"] for row in rows]))
+                result = GrafanaWebhookProcessor.process(db, payload)
+            except Exception as e:
+                db.rollback()
+                attempts = max(row["attempts"] for row in rows)
+                final = attempts >= settings.WEBHOOK_INBOX_MAX_ATTEMPTS
+                delay = settings.WEBHOOK_INBOX_RETRY_BASE_DELAY * (2 ** (attempts - 1))
+                db.query(GrafanaWebhookInbox).filter(GrafanaWebhookInbox.id.in_(ids)).update({
+                    GrafanaWebhookInbox.status: "failed" if final else "pending",
+                    GrafanaWebhookInbox.last_error: str(e)[:1000],
+                    GrafanaWebhookInbox.locked_at: None,
+                    GrafanaWebhookInbox.next_attempt_at: datetime.now(timezone.utc) + timedelta(seconds=delay),
+                }, synchronize_session=False)
+                db.commit()
+                if final:
+                    logger.critical(f"[SUPERADMIN] Вебхук Grafana groupKey={group_key} не обработан после {attempts} попыток: {e}")
+                else:
+                    logger.error(f"Ошибка обработки вебхука groupKey={group_key} (попытка {attempts}), повтор через {delay}с: {e}", exc_info=True)
+                return {"error": str(e), "final": final}
+
+            now = datetime.now(timezone.utc)
+            db.query(GrafanaWebhookInbox).filter(GrafanaWebhookInbox.id == primary_id).update({
+                GrafanaWebhookInbox.status: "done",
+                GrafanaWebhookInbox.result: result,
+                GrafanaWebhookInbox.last_error: None,
+                GrafanaWebhookInbox.locked_at: None,
+                GrafanaWebhookInbox.processed_at: now,
+            }, synchronize_session=False)
+            if len(ids) > 1:
+                # Более ранние доставки группы вошли в объединённую обработку
+                db.query(GrafanaWebhookInbox).filter(GrafanaWebhookInbox.id.in_(ids[:-1])).update({
+                    GrafanaWebhookInbox.status: "coalesced",
+                    GrafanaWebhookInbox.locked_at: None,
+                    GrafanaWebhookInbox.processed_at: now,
+                }, synchronize_session=False)
+            db.commit()
+            return result
+        finally:
+            db.close()
+
+    def _record(self, rows: List[dict], result: Dict, duration: float) -> None:
+        lag = (datetime.now(timezone.utc) - rows[0]["received_at"]).total_seconds()
+        with self._metrics_lock:
+            self._lags.append(lag)
+            self.metrics["batches_total"] += 1
+            self.metrics["last_batch_at"] = time.time()
+            self.metrics["last_batch_duration"] = duration
+            self.metrics["last_lag"] = lag
+            self.metrics["avg_lag"] = sum(self._lags) / len(self._lags)
+            self.metrics["max_lag"] = max(self._lags)
+            if result.get("error"):
+                if result.get("final"):
+                    self.metrics["failed_total"] += len(rows)
+            else:
+                self.metrics["processed_total"] += 1
+                self.metrics["coalesced_total"] += len(rows) - 1
+
+    async def _release_stale_if_due(self) -> None:
+        """
+        Раз в WEBHOOK_INBOX_LOCK_TIMEOUT возвращать в очередь зависшие вебхуки:
+        группа с записью в 'processing' не захватывается, и без этого одна
+        зависшая доставка блокировала бы её до перезапуска
+        """
+        loop = asyncio.get_running_loop()
+        if loop.time() < self._next_release_at:
+            return
+        self._next_release_at = loop.time() + settings.WEBHOOK_INBOX_LOCK_TIMEOUT
+        try:
+            released = await asyncio.to_thread(self._release_stale)
+            if released:
+                logger.warning(f"Возвращено в очередь {released} зависших вебхуков Grafana")
+        except Exception as e:
+            logger.error(f"Не удалось проверить зависшие вебхуки Grafana: {e}")
+
+    async def _worker(self, worker_id: int) -> None:
+        logger.info(f"Воркер вебхуков Grafana {worker_id} запущен")
+        while True:
+            await self._release_stale_if_due()
+            try:
+                claimed = await asyncio.to_thread(self._claim_group)
+            except Exception as e:
+                logger.error(f"Воркер вебхуков {worker_id}: ошибка чтения очереди: {e}")
+                claimed = None
+
+            if claimed:
+                group_key, rows = claimed
+                started = time.perf_counter()
+                try:
+                    result = await asyncio.to_thread(self._process_group, group_key, rows)
+                except Exception as e:
+                    logger.error(f"Воркер вебхуков {worker_id}: ошибка обработки groupKey={group_key}: {e}", exc_info=True)
+                    result = {"error": str(e)}
+                self._record(rows, result, time.perf_counter() - started)
+                continue
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=settings.WEBHOOK_INBOX_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+    async def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._next_release_at = 0.0
+        await self._release_stale_if_due()
+        for worker_id in range(settings.WEBHOOK_INBOX_WORKERS):
+            self._tasks.append(asyncio.create_task(self._worker(worker_id)))
+        self._wakeup.set()
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        logger.info("Воркеры вебхуков Grafana остановлены")
+
+    def get_metrics(self, db: Session) -> Dict:
+        """Метрики воркеров и текущее состояние очереди (глубина, задержка)"""
+        depth = dict(db.query(GrafanaWebhookInbox.status, func.count()).filter(
+            GrafanaWebhookInbox.status.in_(["pending", "processing", "failed"])
+        ).group_by(GrafanaWebhookInbox.status).all())
+        oldest_pending = db.query(func.min(GrafanaWebhookInbox.received_at)).filter(
+            GrafanaWebhookInbox.status == "pending"
+        ).scalar()
+        with self._metrics_lock:
+            metrics = dict(self.metrics)
+        return {
+            **metrics,
+            "pending": depth.get("pending", 0),
+            "processing": depth.get("processing", 0),
+            "failed": depth.get("failed", 0),
+            "oldest_pending_age": (datetime.now(timezone.utc) - oldest_pending).total_seconds() if oldest_pending else 0.0,
+            "workers": len(self._tasks),
+            "open_alerts_registered": open_alert_registry.size(),
+        }
+
+webhook_inbox = WebhookInbox()
@@ -0,0 +1,20 @@
+import asyncio
+from typing import Callable, Optional
+
+def call_soon_in_loop(loop: Optional[asyncio.AbstractEventLoop], callback: Callable, *args) -> bool:
+    """
+    Выполнить callback в event loop приложения из любого потока: в самом loop -
+    сразу, из потоков threadpool и фоновых потоков - через call_soon_threadsafe.
+    False - loop не запущен или уже закрыт.
+    """
+    if loop is None or loop.is_closed():
+        return False
+    try:
+        running_loop = asyncio.get_running_loop()
+    except RuntimeError:
+        running_loop = None
+    if running_loop is loop:
+        callback(*args)
+    else:
+        loop.call_soon_threadsafe(callback, *args)
+    return True
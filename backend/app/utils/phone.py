@@ -0,0 +1,27 @@
+import re
+from typing import Optional
+
+# Правила повторены в SQL миграции e7c8d9f0a1b2 (заполнение devices.phone_e164):
+# только ASCII-цифры, "+" - первый символ после пробельных
+_NON_DIGITS = re.compile(r"[^0-9]")
+_PLUS_PREFIX = re.compile(r"^[ \t\r\n]*\+")
+
+def normalize_phone(phone: Optional[str], default_country_code: str = "7") -> Optional[str]:
+    """
+    Привести номер к формату E.164 (+79991234567).
+
+    Поддерживаются записи вида +7..., 7..., 8... (российский внутренний
+    формат) и 10-значные номера без кода страны, а также пробелы, дефисы и
+    скобки. Возвращает None, если номер нельзя распознать.
+    """
+    if not phone:
+        return None
+    digits = _NON_DIGITS.sub("", phone)
+    international = _PLUS_PREFIX.match(phone) is not None
+    if len(digits) == 11 and digits.startswith("8") and not international:
+        digits = default_country_code + digits[1:]
+    elif len(digits) == 10 and not international:
+        digits = default_country_code + digits
+    if not 10 <= len(digits) <= 15:
+        return None
+    return "+" + digits
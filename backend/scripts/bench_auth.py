@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк пропускной способности авторизованных запросов: параллельно
+вызывает лёгкий эндпоинт с JWT и печатает rps и p50/p95/p99 задержки,
+а также метрики кэша пользователей (/health/user-cache) после прогона.
+
+Сравнение: запустить сервер с USER_CACHE_TTL=0 (кэш выключен) и с
+настройками по умолчанию, прогнать скрипт против обоих.
+
+Запуск:
+    python scripts/bench_auth.py --base-url http://localhost:8000 \\
+        --token <JWT> --concurrency 50 --duration 30
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+
+API_PREFIX = "/api/v1"
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))
+    return values[index]
+
+async def worker(client, args, deadline, latencies, errors):
+    headers = {"Authorization": f"Bearer {args.token}"}
+    while time.monotonic() < deadline:
+        started = time.perf_counter()
+        try:
+            response = await client.request(args.method, f"{API_PREFIX}{args.endpoint}", headers=headers)
+            if response.status_code >= 400:
+                errors.append(response.status_code)
+        except httpx.HTTPError:
+            errors.append(None)
+        latencies.append(time.perf_counter() - started)
+
+async def run(args):
+    latencies = []
+    errors = []
+    deadline = time.monotonic() + args.duration
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=60, limits=limits) as client:
+        await asyncio.gather(*(
+            worker(client, args, deadline, latencies, errors) for _ in range(args.concurrency)
+        ))
+        cache_metrics = None
+        try:
+            response = await client.get(f"{API_PREFIX}/health/user-cache")
+            if response.status_code == 200:
+                cache_metrics = response.json()
+        except httpx.HTTPError:
+            pass
+
+    print(f"endpoint:  {args.method} {args.endpoint}")
+    print(f"requests:  {len(latencies)} (errors: {len(errors)})")
+    print(f"rps:       {len(latencies) / args.duration:.1f}")
+    if latencies:
+        print(
+            f"latency:   p50={percentile(latencies, 50) * 1000:.1f}ms "
+            f"p95={percentile(latencies, 95) * 1000:.1f}ms "
+            f"p99={percentile(latencies, 99) * 1000:.1f}ms "
+            f"max={max(latencies) * 1000:.1f}ms"
+        )
+    if cache_metrics:
+        print(f"user cache: {cache_metrics}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--token", required=True, help="JWT пользователя")
+    parser.add_argument("--endpoint", default="/auth/refresh", help="Авторизованный эндпоинт без обращений к БД")
+    parser.add_argument("--method", default="POST")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--duration", type=int, default=30)
+    asyncio.run(run(parser.parse_args()))
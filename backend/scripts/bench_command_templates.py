@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Микро-бенчмарк проверки параметров и сборки команды: прежняя реализация
+(разбор params_schema, re.match и str.format на каждый вызов) против
+скомпилированного шаблона из CommandTemplateRegistry.
+
+С --db дополнительно сравнивается получение шаблона: запрос Query.get
+против реестра (нужны настроенные переменные POSTGRES_* и хотя бы один
+шаблон в command_templates).
+
+Запуск (из каталога backend):
+    python scripts/bench_command_templates.py --iterations 100000
+"""
+import argparse
+import re
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from app.models.command_template import CommandTemplate
+from app.services.command_template_registry import CompiledTemplate
+
+TEMPLATE = CommandTemplate(
+    id=0,
+    model="bench",
+    category="bench",
+    name="bench",
+    template="#{password}#SET#{channel}#{temperature}#{mode}#",
+    params_schema={
+        "required": ["password", "channel", "temperature"],
+        "properties": {
+            "password": {"type": "string", "pattern": r"^\d{4}$"},
+            "channel": {"type": "integer", "min": 1, "max": 16},
+            "temperature": {"type": "number", "min": -40, "max": 85, "pattern": r"^-?\d+(\.\d+)?$"},
+            "mode": {"type": "string", "pattern": r"^(AUTO|MANUAL)$"},
+        },
+    },
+)
+PARAMS = {"password": "1234", "channel": "7", "temperature": "21.5", "mode": "AUTO"}
+
+def legacy_validate(params, schema):
+    """Прежняя CommandService.validate_params"""
+    errors = {}
+    required_params = set(schema.get("required", []))
+    for param_name, param_definition in schema.get("properties", {}).items():
+        value = params.get(param_name)
+        if param_name in required_params and value is None:
+            errors.setdefault(param_name, []).append("Parameter is required")
+            continue
+        if value is None:
+            continue
+        if param_definition.get("type") == "number" or param_definition.get("type") == "integer":
+            try:
+                float(value)
+            except (ValueError, TypeError):
+                errors.setdefault(param_name, []).append("Must be a number")
+        if param_definition.get("pattern") and not re.match(param_definition["pattern"], str(value)):
+            errors.setdefault(param_name, []).append(f"Does not match pattern: {param_definition['pattern']}")
+        if (param_definition.get("type") == "number" or param_definition.get("type") == "integer") and value is not None:
+            try:
+                numeric_value = float(value)
+                if param_definition.get("min") is not None and numeric_value < param_definition["min"]:
+                    errors.setdefault(param_name, []).append(f"Value must be >= {param_definition['min']}")
+                if param_definition.get("max") is not None and numeric_value > param_definition["max"]:
+                    errors.setdefault(param_name, []).append(f"Value must be <= {param_definition['max']}")
+            except (ValueError, TypeError):
+                pass
+    return errors
+
+def legacy_build(template, params):
+    errors = legacy_validate(params, template.params_schema)
+    if errors:
+        return errors
+    return template.template.format(**params)
+
+def compiled_build(compiled, params):
+    errors = compiled.validate(params)
+    if errors:
+        return errors
+    return compiled.render(params)
+
+def report(name, seconds, iterations, baseline=None):
+    per_call = seconds / iterations * 1e6
+    speedup = f"  x{baseline / seconds:.1f}" if baseline else ""
+    print(f"{name:<28} {per_call:>8.2f} мкс/вызов{speedup}")
+
+def bench_lookup(iterations):
+    from app.core.database import SessionLocal
+    from app.services.command_template_registry import command_template_registry
+
+    db = SessionLocal()
+    try:
+        template = db.query(CommandTemplate).first()
+        if template is None:
+            print("В command_templates нет шаблонов - сравнение получения шаблона пропущено")
+            return
+        template_id = template.id
+        command_template_registry.get(db, template_id)
+        lookups = max(iterations // 100, 100)
+        query_time = timeit.timeit(lambda: (db.expire_all(), db.query(CommandTemplate).get(template_id)), number=lookups)
+        registry_time = timeit.timeit(lambda: command_template_registry.get(db, template_id), number=lookups)
+        report("Query.get", query_time, lookups)
+        report("registry.get", registry_time, lookups, query_time)
+    finally:
+        db.close()
+
+def main(args):
+    compiled = CompiledTemplate(TEMPLATE)
+    assert legacy_build(TEMPLATE, PARAMS) == compiled_build(compiled, PARAMS)
+    invalid = {"password": "12", "channel": "x", "temperature": "120"}
+    assert legacy_validate(invalid, TEMPLATE.params_schema) == compiled.validate(invalid)
+
+    print(f"Итераций: {args.iterations}")
+    legacy_time = timeit.timeit(lambda: legacy_build(TEMPLATE, PARAMS), number=args.iterations)
+    compiled_time = timeit.timeit(lambda: compiled_build(compiled, PARAMS), number=args.iterations)
+    report("validate+format (прежняя)", legacy_time, args.iterations)
+    report("validate+render (реестр)", compiled_time, args.iterations, legacy_time)
+    if args.db:
+        bench_lookup(args.iterations)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=100000)
+    parser.add_argument("--db", action="store_true", help="Сравнить также получение шаблона из БД и из реестра")
+    main(parser.parse_args())
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк обработки больших групповых вебхуков Grafana: создаёт N тестовых
+устройств и прогоняет для них циклы firing -> повторный firing -> resolved,
+измеряя время и число SQL-запросов на вебхук.
+
+По умолчанию GrafanaWebhookProcessor вызывается напрямую; с --base-url
+пакеты отправляются на работающий сервер (число запросов тогда не считается).
+
+Запуск (из каталога backend, с настроенными переменными POSTGRES_*):
+    python scripts/bench_grafana_webhook.py --players 200 --rounds 5
+"""
+import argparse
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from sqlalchemy import event
+
+from app.core.database import SessionLocal, engine
+from app.models.alert import Alert
+from app.models.device import Device
+from app.schemas.grafana import GrafanaWebhookPayload
+from app.services.grafana_webhook_processor import GrafanaWebhookProcessor
+from app.services.platform_stats_service import reconcile_platform_stats
+
+BENCH_MARKER = "bench-webhook"
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+def create_devices(players: int) -> list:
+    db = SessionLocal()
+    try:
+        uids = [f"{BENCH_MARKER}-{i}" for i in range(players)]
+        existing = {uid for (uid,) in db.query(Device.grafana_uid).filter(Device.grafana_uid.in_(uids)).all()}
+        db.add_all([
+            Device(name=uid, grafana_uid=uid, send_alert_sms=False)
+            for uid in uids if uid not in existing
+        ])
+        db.commit()
+        return uids
+    finally:
+        db.close()
+
+def build_payload(uids: list, fingerprints: list, status: str) -> dict:
+    now = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f000Z")
+    return {
+        "alerts": [
+            {
+                "status": status,
+                "startsAt": now,
+                "endsAt": now if status == "resolved" else "0001-01-01T00:00:00Z",
+                "fingerprint": fingerprint,
+                "labels": {
+                    "alertname": "BenchWebhookAlert",
+                    "grafana_folder": BENCH_MARKER,
+                    "instance": BENCH_MARKER,
+                    "player_id": uid,
+                    "player_name": uid,
+                    "severity": "warning",
+                },
+            }
+            for uid, fingerprint in zip(uids, fingerprints)
+        ],
+        "commonAnnotations": {"summary": BENCH_MARKER},
+        "groupKey": f"{BENCH_MARKER}-{uuid.uuid4().hex[:8]}",
+        "status": status,
+        "title": "BenchWebhookAlert",
+    }
+
+def replay_direct(payload: dict, counter: QueryCounter) -> tuple:
+    parsed = GrafanaWebhookPayload.model_validate(payload)
+    db = SessionLocal()
+    try:
+        counter.count = 0
+        started = time.perf_counter()
+        GrafanaWebhookProcessor.process(db, parsed)
+        return time.perf_counter() - started, counter.count
+    finally:
+        db.close()
+
+def replay_http(client, payload: dict) -> tuple:
+    started = time.perf_counter()
+    response = client.post("/api/v1/grafana-webhook/", json=payload)
+    response.raise_for_status()
+    return time.perf_counter() - started, None
+
+def cleanup(uids: list) -> None:
+    db = SessionLocal()
+    try:
+        device_ids = [device_id for (device_id,) in db.query(Device.id).filter(Device.grafana_uid.in_(uids)).all()]
+        alerts = db.query(Alert).filter(Alert.device_id.in_(device_ids)).delete(synchronize_session=False)
+        devices = db.query(Device).filter(Device.id.in_(device_ids)).delete(synchronize_session=False)
+        db.commit()
+        print(f"Удалено тестовых алертов: {alerts}, устройств: {devices}")
+    finally:
+        db.close()
+    reconcile_platform_stats()
+
+def main(args) -> None:
+    uids = create_devices(args.players)
+    counter = QueryCounter()
+    event.listen(engine, "before_cursor_execute", counter)
+
+    client = None
+    if args.base_url:
+        import httpx
+        client = httpx.Client(base_url=args.base_url, timeout=120)
+
+    results = {"firing": [], "refiring": [], "resolved": []}
+    try:
+        for _ in range(args.rounds):
+            fingerprints = [uuid.uuid4().hex[:16] for _ in uids]
+            for phase, status in (("firing", "firing"), ("refiring", "firing"), ("resolved", "resolved")):
+                payload = build_payload(uids, fingerprints, status)
+                if client is not None:
+                    results[phase].append(replay_http(client, payload))
+                else:
+                    results[phase].append(replay_direct(payload, counter))
+    finally:
+        event.remove(engine, "before_cursor_execute", counter)
+        if client is not None:
+            client.close()
+        if not args.keep:
+            cleanup(uids)
+
+    print(f"Алертов в вебхуке: {args.players}, циклов: {args.rounds}")
+    print(f"{'phase':<10} {'mean,ms':>9} {'max,ms':>9} {'alerts/s':>9} {'queries':>8}")
+    for phase, values in results.items():
+        timings = [elapsed for elapsed, _ in values]
+        queries = [count for _, count in values if count is not None]
+        mean = statistics.mean(timings)
+        print(
+            f"{phase:<10} {mean * 1000:>9.1f} {max(timings) * 1000:>9.1f} "
+            f"{args.players / mean:>9.0f} {statistics.mean(queries) if queries else float('nan'):>8.0f}"
+        )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--players", type=int, default=200, help="Алертов (плееров) в одном вебхуке")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--base-url", default=None, help="Отправлять вебхуки на сервер вместо прямого вызова")
+    parser.add_argument("--keep", action="store_true", help="Не удалять созданные записи")
+    main(parser.parse_args())
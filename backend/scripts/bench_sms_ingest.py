@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк пакетного приёма SMS: поднимает локальный заглушечный SMS-шлюз,
+отдающий синтетический ответ /sms на N сообщений, и прогоняет poll_sms_gateway.
+
+Запуск (из каталога backend, с настроенными переменными POSTGRES_*):
+    python scripts/bench_sms_ingest.py --messages 10000
+"""
+import argparse
+import asyncio
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from aiohttp import web
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.device import Device
+from app.models.log import Log
+from app.services.http_client import close_http_session
+from app.services.sms_poller import poll_sms_gateway
+
+BENCH_MARKER = "bench-sms-ingest"
+
+def build_payload(count: int, phones: list) -> dict:
+    """Синтетический ответ шлюза: часть номеров совпадает с устройствами, часть нет"""
+    messages = []
+    for i in range(count):
+        if phones and random.random() < 0.8:
+            phone = "+" + random.choice(phones)
+        else:
+            phone = f"+7999{random.randint(0, 9999999):07d}"
+        messages.append({
+            "from": phone,
+            "message": f"{BENCH_MARKER} #{i}: STATUS OK",
+            "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+        })
+    return {"status": "ok", "sms_messages": messages}
+
+async def run(count: int, port: int) -> None:
+    db = SessionLocal()
+    try:
+        phones = [row.phone for row in db.query(Device.phone).filter(Device.phone.isnot(None)).all()]
+    finally:
+        db.close()
+
+    payload = build_payload(count, phones)
+
+    async def sms_handler(request):
+        return web.json_response(payload)
+
+    app = web.Application()
+    app.router.add_get("/sms", sms_handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", port)
+    await site.start()
+
+    settings.SMS_GATEWAY_URL = f"http://127.0.0.1:{port}"
+    try:
+        started = time.perf_counter()
+        await poll_sms_gateway()
+        elapsed = time.perf_counter() - started
+    finally:
+        await close_http_session()
+        await runner.cleanup()
+
+    print(f"Сообщений: {count}, устройств с телефоном: {len(phones)}")
+    print(f"Время: {elapsed:.3f}с, пропускная способность: {count / elapsed:.0f} SMS/с")
+
+def cleanup() -> None:
+    db = SessionLocal()
+    try:
+        deleted = db.query(Log).filter(
+            Log.level == "sms_in",
+            Log.message.like(f"%{BENCH_MARKER}%")
+        ).delete(synchronize_session=False)
+        db.commit()
+        print(f"Удалено тестовых записей: {deleted}")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=10000)
+    parser.add_argument("--port", type=int, default=18099)
+    parser.add_argument("--keep", action="store_true", help="Не удалять созданные записи")
+    args = parser.parse_args()
+
+    asyncio.run(run(args.messages, args.port))
+    if not args.keep:
+        cleanup()
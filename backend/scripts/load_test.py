@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Нагрузочный тест: параллельный трафик вебхуков Grafana и запросов дашборда.
+Печатает p50/p95/p99 задержки по каждому эндпоинту - запускается до и после
+изменений, чтобы сравнить, как запросы мешают друг другу в одном воркере.
+
+Запуск:
+    python scripts/load_test.py --base-url http://localhost:8000 \\
+        --token <JWT> --concurrency 20 --duration 30
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timezone
+
+import httpx
+
+API_PREFIX = "/api/v1"
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))
+    return values[index]
+
+def webhook_payload(players: int) -> dict:
+    now = datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+    alerts = []
+    for _ in range(players):
+        player_id = f"load-test-{random.randint(1, 500)}"
+        alerts.append({
+            "status": random.choice(["firing", "resolved"]),
+            "startsAt": now,
+            "endsAt": "0001-01-01T00:00:00Z",
+            "fingerprint": uuid.uuid4().hex[:16],
+            "labels": {
+                "alertname": "LoadTestAlert",
+                "grafana_folder": "load-test",
+                "instance": "load-test",
+                "player_id": player_id,
+                "player_name": player_id,
+                "severity": "warning",
+            },
+        })
+    return {
+        "alerts": alerts,
+        "commonAnnotations": {"summary": "load test"},
+        "groupKey": f"load-test-{uuid.uuid4().hex[:8]}",
+        "status": "firing",
+        "title": "LoadTestAlert",
+    }
+
+async def worker(client, kind, args, deadline, latencies, errors):
+    headers = {"Authorization": f"Bearer {args.token}"} if args.token else {}
+    while time.monotonic() < deadline:
+        started = time.perf_counter()
+        try:
+            if kind == "webhook":
+                response = await client.post(f"{API_PREFIX}/grafana-webhook/", json=webhook_payload(args.players))
+            else:
+                response = await client.get(f"{API_PREFIX}/stats/dashboard", headers=headers)
+            if response.status_code >= 400:
+                errors[kind] += 1
+        except httpx.HTTPError:
+            errors[kind] += 1
+        latencies[kind].append(time.perf_counter() - started)
+
+async def run(args):
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    deadline = time.monotonic() + args.duration
+    limits = httpx.Limits(max_connections=args.concurrency * 2)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=60, limits=limits) as client:
+        tasks = []
+        for i in range(args.concurrency):
+            kind = "webhook" if i % 2 == 0 else "dashboard"
+            tasks.append(asyncio.create_task(worker(client, kind, args, deadline, latencies, errors)))
+        await asyncio.gather(*tasks)
+
+    print(f"{'endpoint':<10} {'requests':>8} {'errors':>6} {'rps':>7} {'p50,ms':>8} {'p95,ms':>8} {'p99,ms':>8} {'max,ms':>8}")
+    for kind in ("webhook", "dashboard"):
+        values = latencies[kind]
+        if not values:
+            continue
+        print(
+            f"{kind:<10} {len(values):>8} {errors[kind]:>6} {len(values) / args.duration:>7.1f} "
+            f"{percentile(values, 50) * 1000:>8.1f} {percentile(values, 95) * 1000:>8.1f} "
+            f"{percentile(values, 99) * 1000:>8.1f} {max(values) * 1000:>8.1f}"
+        )
+    all_values = [v for values in latencies.values() for v in values]
+    if all_values:
+        print(f"mean latency: {statistics.mean(all_values) * 1000:.1f} ms")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--token", default=None, help="JWT для /stats/dashboard")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--duration", type=int, default=30)
+    parser.add_argument("--players", type=int, default=5, help="Алертов в одном вебхуке")
+    asyncio.run(run(parser.parse_args()))
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Обслуживание месячных секций таблицы logs вне приложения (cron, ручной
+запуск): создание секций наперёд, выгрузка устаревших секций в
+LOGS_ARCHIVE_DIR и их удаление (или отсоединение).
+
+С --dry-run только выводит существующие секции и те, что будут выведены
+из БД по LOGS_RETENTION_MONTHS.
+
+Запуск (из каталога backend, с настроенными переменными POSTGRES_*):
+    python scripts/logs_partitions.py --dry-run
+    python scripts/logs_partitions.py
+"""
+import argparse
+import json
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.services.log_partitions import LogPartitionService, run_log_maintenance
+
+def dry_run():
+    today = datetime.now(timezone.utc).date()
+    db = SessionLocal()
+    try:
+        partitions = LogPartitionService.list_partitions(db)
+        expired = set(LogPartitionService.expired_partitions(db, today))
+    finally:
+        db.close()
+    action = settings.LOGS_EXPIRED_PARTITION_ACTION
+    if action == "drop" and not LogPartitionService.archive_persisted():
+        action = "detach (drop отключён: архив не на смонтированном томе)"
+    retention = f"{settings.LOGS_RETENTION_MONTHS} мес." if settings.LOGS_RETENTION_MONTHS > 0 else "без ограничения"
+    print(f"Хранение: {retention}, архив: {settings.LOGS_ARCHIVE_DIR or 'нет'}, устаревшие секции: {action}")
+    for month in partitions:
+        mark = "  -> будет выведена" if month in expired else ""
+        print(f"{LogPartitionService.partition_name(month)}{mark}")
+
+def main(args):
+    if args.dry_run:
+        dry_run()
+        return
+    result = run_log_maintenance()
+    if result is None:
+        print("Обслуживание не выполнено: занято другим процессом или ошибка (см. лог)")
+        sys.exit(1)
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dry-run", action="store_true", help="Только показать секции и план вывода из БД")
+    main(parser.parse_args())
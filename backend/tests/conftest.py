@@ -0,0 +1,10 @@
+import os
+
+# Settings требует параметры подключения к БД; модульные тесты к БД не подключаются
+# (движок SQLAlchemy создаётся при импорте, но соединение не открывает)
+os.environ.setdefault("POSTGRES_HOST", "localhost")
+os.environ.setdefault("POSTGRES_DB", "remosa_test")
+os.environ.setdefault("POSTGRES_USER", "remosa")
+os.environ.setdefault("POSTGRES_PASSWORD", "remosa")
+os.environ.setdefault("SECRET_KEY", "test-secret-key")
+os.environ.setdefault("JWT_SECRET_KEY", "test-jwt-secret-key")
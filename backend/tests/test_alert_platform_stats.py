@@ -0,0 +1,91 @@
+from collections import defaultdict
+from datetime import datetime, timezone
+
+import pytest
+
+from app.api.v1 import alerts
+from app.schemas.alert import AlertCreate
+from app.services.platform_stats_service import PlatformStatsService
+
+DEVICE_PLATFORMS = {1: 10, 2: 20}
+CREATED_AT = datetime(2026, 10, 17, 12, 0, tzinfo=timezone.utc)
+
+class _Query:
+    def __init__(self, db):
+        self.db = db
+
+    def filter(self, *args):
+        return self
+
+    def first(self):
+        return self.db.stored
+
+class _DeviceQuery:
+    def filter(self, *args):
+        return self
+
+    def first(self):
+        return object()
+
+class _Session:
+    """Сессия эндпоинтов алертов без БД: хранит один алерт"""
+
+    def __init__(self):
+        self.stored = None
+
+    def query(self, model):
+        return _Query(self)
+
+    def add(self, alert):
+        self.stored = alert
+
+    def flush(self):
+        self.stored.id = self.stored.id or 1
+        self.stored.created_at = self.stored.created_at or CREATED_AT
+
+    def refresh(self, alert):
+        self.flush()
+
+    def commit(self):
+        pass
+
+    def delete(self, alert):
+        self.stored = None
+
+@pytest.fixture
+def stats(monkeypatch):
+    counters = defaultdict(lambda: {"firing": 0, "resolved": 0, "latest_alert_at": None})
+
+    def apply(db, platform_id, devices=0, firing=0, resolved=0, alert_at=None):
+        counters[platform_id]["firing"] += firing
+        counters[platform_id]["resolved"] += resolved
+        if alert_at is not None:
+            counters[platform_id]["latest_alert_at"] = alert_at
+
+    monkeypatch.setattr(PlatformStatsService, "apply", staticmethod(apply))
+    monkeypatch.setattr(PlatformStatsService, "platform_of_device", staticmethod(lambda db, device_id: DEVICE_PLATFORMS.get(device_id, 0)))
+    return counters
+
+def _alert_in(**fields):
+    data = {"device_id": None, "alert_name": "HighLoad", "alert_type": "cpu", "message": "load", "status": "firing"}
+    data.update(fields)
+    return AlertCreate(**data)
+
+def test_counters_follow_alert_lifecycle(stats):
+    db = _Session()
+    alert = alerts.create_alert(_alert_in(), db=db, current_user=None)
+    assert stats[0] == {"firing": 1, "resolved": 0, "latest_alert_at": CREATED_AT}
+
+    alerts.update_alert(alert.id, _alert_in(status="resolved"), db=db, current_user=None)
+    assert stats[0] == {"firing": 0, "resolved": 1, "latest_alert_at": CREATED_AT}
+
+    alerts.delete_alert(alert.id, db=db, current_user=None)
+    assert stats[0]["firing"] == 0
+    assert stats[0]["resolved"] == 0
+
+def test_update_moving_alert_to_other_platform(stats, monkeypatch):
+    db = _Session()
+    monkeypatch.setattr(db, "query", lambda model: _Query(db) if model is alerts.Alert else _DeviceQuery())
+    alert = alerts.create_alert(_alert_in(device_id=1), db=db, current_user=None)
+    alerts.update_alert(alert.id, _alert_in(device_id=2), db=db, current_user=None)
+    assert (stats[10]["firing"], stats[20]["firing"]) == (0, 1)
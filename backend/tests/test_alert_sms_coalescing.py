@@ -0,0 +1,83 @@
+import pytest
+
+from app.core.config import settings
+from app.services.alert_sms_coalescing import ALERT_SMS_PREFIX, AlertSMSCoalescing
+
+def test_single_text_is_unchanged():
+    assert AlertSMSCoalescing.merge_texts(["АЛЕРТ! CPU: high"]) == "АЛЕРТ! CPU: high"
+
+def test_duplicates_collapse_to_one_text():
+    assert AlertSMSCoalescing.merge_texts(["АЛЕРТ! CPU: high"] * 3) == "АЛЕРТ! CPU: high"
+
+def test_texts_are_merged_without_prefix():
+    merged = AlertSMSCoalescing.merge_texts([ALERT_SMS_PREFIX + "CPU: high", ALERT_SMS_PREFIX + "Disk: full", "custom"])
+    assert merged == "АЛЕРТЫ (3): CPU: high; Disk: full; custom"
+
+def test_count_includes_duplicates():
+    merged = AlertSMSCoalescing.merge_texts(["АЛЕРТ! a", "АЛЕРТ! b", "АЛЕРТ! a"])
+    assert merged == "АЛЕРТЫ (3): a; b"
+
+def test_truncated_to_max_length(monkeypatch):
+    monkeypatch.setattr(settings, "ALERT_SMS_MAX_LENGTH", 40)
+    texts = [ALERT_SMS_PREFIX + f"alert number {index}" for index in range(5)]
+    merged = AlertSMSCoalescing.merge_texts(texts)
+    assert merged == "АЛЕРТЫ (5): alert number 0 … (+4)"
+    assert len(merged) <= 40
+
+def test_long_first_part_is_truncated(monkeypatch):
+    monkeypatch.setattr(settings, "ALERT_SMS_MAX_LENGTH", 40)
+    merged = AlertSMSCoalescing.merge_texts([ALERT_SMS_PREFIX + "x" * 100, ALERT_SMS_PREFIX + "y"])
+    assert merged == "АЛЕРТЫ (2): " + "x" * 20 + "…" + " … (+1)"
+    assert len(merged) == 40
+
+def test_suffix_space_is_reserved(monkeypatch):
+    monkeypatch.setattr(settings, "ALERT_SMS_MAX_LENGTH", 30)
+    # Вторая часть поместилась бы сама, но не вместе с " … (+1)" для третьей
+    merged = AlertSMSCoalescing.merge_texts(["АЛЕРТ! aaaaaaa", "АЛЕРТ! bbbbbbb", "АЛЕРТ! ccc"])
+    assert merged == "АЛЕРТЫ (3): aaaaaaa … (+2)"
+
+@pytest.mark.parametrize("max_length", [10, 20, 40, 60, 100, 480])
+@pytest.mark.parametrize("part_length", [1, 10, 50, 600])
+def test_merged_text_never_exceeds_max_length(monkeypatch, max_length, part_length):
+    monkeypatch.setattr(settings, "ALERT_SMS_MAX_LENGTH", max_length)
+    texts = [ALERT_SMS_PREFIX + f"{index}:" + "x" * part_length for index in range(20)]
+    merged = AlertSMSCoalescing.merge_texts(texts)
+    assert len(merged) <= max_length
+
+class _FlapQuery:
+    def __init__(self, rows):
+        self.rows = rows
+        self.criteria = []
+
+    def filter(self, *criteria):
+        self.criteria.extend(criteria)
+        return self
+
+    def group_by(self, *columns):
+        return self
+
+    def all(self):
+        return self.rows
+
+class _FlapSession:
+    def __init__(self, rows):
+        self.query_obj = _FlapQuery(rows)
+
+    def query(self, *columns):
+        return self.query_obj
+
+def test_flapping_counted_by_server_receive_time(monkeypatch):
+    from sqlalchemy.dialects import postgresql
+
+    monkeypatch.setattr(settings, "ALERT_FLAP_THRESHOLD", 3)
+    db = _FlapSession([("CPU", 1, 3), ("Disk", 1, 2)])
+    assert AlertSMSCoalescing.flapping_keys(db, {("CPU", 1), ("Disk", 1)}) == {("CPU", 1): 3}
+
+    sql = " ".join(str(criterion.compile(dialect=postgresql.dialect())) for criterion in db.query_obj.criteria)
+    # Окно отсчитывается от времени записи в БД, а не от startsAt (created_at)
+    assert "alerts.received_at >= now()" in sql
+    assert "created_at" not in sql
+
+def test_flapping_disabled(monkeypatch):
+    monkeypatch.setattr(settings, "ALERT_FLAP_THRESHOLD", 0)
+    assert AlertSMSCoalescing.flapping_keys(_FlapSession([("CPU", 1, 10)]), {("CPU", 1)}) == {}
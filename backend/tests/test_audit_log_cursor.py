@@ -0,0 +1,19 @@
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+
+from app.services.audit_log_service import AuditLogService, _escape_like
+
+def test_cursor_round_trip():
+    timestamp = datetime(2026, 10, 17, 14, 32, 7, 518204, tzinfo=timezone(timedelta(hours=3)))
+    cursor = AuditLogService.encode_cursor(SimpleNamespace(timestamp=timestamp, id=7))
+    assert AuditLogService.decode_cursor(cursor) == (timestamp, 7)
+
+@pytest.mark.parametrize("cursor", ["", "garbage", "MjAyNi0xMC0xN3x4"])
+def test_invalid_cursor(cursor):
+    with pytest.raises(ValueError):
+        AuditLogService.decode_cursor(cursor)
+
+def test_escape_like():
+    assert _escape_like("100%_done\\") == "100\\%\\_done\\\\"
@@ -0,0 +1,116 @@
+import re
+from types import SimpleNamespace
+
+import pytest
+
+from app.services.cache_invalidation import cache_invalidation
+from app.services.command_template_registry import CommandTemplateRegistry, CompiledTemplate, command_template_registry
+
+def _legacy_validate(params, schema):
+    """Проверка параметров до реестра шаблонов (CommandService.validate_params)"""
+    errors = {}
+    required_params = set(schema.get("required", []))
+    for param_name, param_definition in schema.get("properties", {}).items():
+        value = params.get(param_name)
+        if param_name in required_params and value is None:
+            errors.setdefault(param_name, []).append("Parameter is required")
+            continue
+        if value is None:
+            continue
+        numeric = param_definition.get("type") in ("number", "integer")
+        if numeric:
+            try:
+                float(value)
+            except (ValueError, TypeError):
+                errors.setdefault(param_name, []).append("Must be a number")
+        if param_definition.get("pattern") and not re.match(param_definition["pattern"], str(value)):
+            errors.setdefault(param_name, []).append(f"Does not match pattern: {param_definition['pattern']}")
+        if numeric:
+            try:
+                numeric_value = float(value)
+                if param_definition.get("min") is not None and numeric_value < param_definition["min"]:
+                    errors.setdefault(param_name, []).append(f"Value must be >= {param_definition['min']}")
+                if param_definition.get("max") is not None and numeric_value > param_definition["max"]:
+                    errors.setdefault(param_name, []).append(f"Value must be <= {param_definition['max']}")
+            except (ValueError, TypeError):
+                pass
+    return errors
+
+SCHEMA = {
+    "required": ["interval", "phone"],
+    "properties": {
+        "interval": {"type": "integer", "min": 10, "max": 3600},
+        "phone": {"type": "string", "pattern": r"^\+?\d{10,15}$"},
+        "level": {"type": "number", "pattern": r"^\d+$"},
+        "name": {"type": "string"},
+    },
+}
+
+def _template(template="SET {interval} {phone}", params_schema=SCHEMA):
+    return CompiledTemplate(SimpleNamespace(id=1, model="m", name="n", template=template, params_schema=params_schema))
+
+@pytest.mark.parametrize("params", [
+    {"interval": "60", "phone": "+79991234567"},
+    {"interval": "5", "phone": "+79991234567"},
+    {"interval": "7200", "phone": "123"},
+    {"interval": "abc", "phone": "+79991234567"},
+    {"phone": "+79991234567"},
+    {},
+    {"interval": "60", "phone": "+79991234567", "level": "1.5"},
+    {"interval": "60", "phone": "+79991234567", "level": "x"},
+    {"interval": 60, "phone": 79991234567, "name": "any"},
+])
+def test_validate_matches_legacy(params):
+    assert _template().validate(params) == _legacy_validate(params, SCHEMA)
+
+def test_invalid_pattern_in_schema_is_reported():
+    schema = {"properties": {"code": {"pattern": "("}}}
+    errors = _template("{code}", schema).validate({"code": "1"})
+    assert errors["code"][0].startswith("Invalid pattern in template")
+
+def test_empty_schema():
+    assert _template("PING", None).validate({"anything": "1"}) == {}
+
+@pytest.mark.parametrize("template, params", [
+    ("SET {interval} {phone}", {"interval": "60", "phone": "+79991234567"}),
+    ("PING", {}),
+    ("{a}{b}{a}", {"a": 1, "b": "x"}),
+    ("{{literal}} {a}", {"a": "v"}),
+    ("N{num:03d}", {"num": 7}),
+    ("R{value!r}", {"value": "x"}),
+    ("F{value:>5}", {"value": "ab"}),
+    ("{a} extra", {"a": "1", "unused": "2"}),
+])
+def test_render_matches_str_format(template, params):
+    assert _template(template).render(params) == template.format(**params)
+
+@pytest.mark.parametrize("template", ["SET {interval}", "N{num:03d}"])
+def test_render_missing_param_raises_key_error(template):
+    with pytest.raises(KeyError):
+        _template(template).render({})
+
+def _registry_template(template_id):
+    return SimpleNamespace(id=template_id, model="m", name=f"t{template_id}", template="CMD {x}", params_schema={})
+
+def test_invalidate_publishes_to_other_workers(monkeypatch):
+    published = []
+    monkeypatch.setattr(cache_invalidation, "publish", lambda cache, key=None: published.append((cache, key)))
+    registry = CommandTemplateRegistry(ttl=60)
+    registry._templates = {1: CompiledTemplate(_registry_template(1)), 2: CompiledTemplate(_registry_template(2))}
+    registry.invalidate(1)
+    registry.invalidate()
+    assert set(registry._templates) == {2}
+    assert registry._expires_at == 0.0
+    assert published == [("command_templates", 1), ("command_templates", None)]
+
+def test_notification_from_other_worker_resets_registry(monkeypatch):
+    published = []
+    monkeypatch.setattr(cache_invalidation, "publish", lambda cache, key=None: published.append((cache, key)))
+    monkeypatch.setattr(command_template_registry, "_templates", {5: CompiledTemplate(_registry_template(5))})
+    monkeypatch.setattr(command_template_registry, "_expires_at", float("inf"))
+    cache_invalidation._handle('{"origin": "other", "cache": "command_templates", "key": "5"}')
+    assert 5 not in command_template_registry._templates
+    cache_invalidation._handle('{"origin": "other", "cache": "command_templates", "key": null}')
+    assert command_template_registry._expires_at == 0.0
+    # Полученное уведомление не рассылается повторно
+    assert published == []
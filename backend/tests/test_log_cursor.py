@@ -0,0 +1,25 @@
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+
+from app.services.log import LogService
+
+def test_cursor_round_trip():
+    created_at = datetime(2026, 10, 17, 14, 32, 7, 518204, tzinfo=timezone.utc)
+    cursor = LogService.encode_cursor(SimpleNamespace(created_at=created_at, id=42))
+    assert LogService.decode_cursor(cursor) == (created_at, 42)
+
+def test_cursor_without_timezone():
+    created_at = datetime(2026, 1, 1, 0, 0)
+    cursor = LogService.encode_cursor(SimpleNamespace(created_at=created_at, id=1))
+    assert LogService.decode_cursor(cursor) == (created_at, 1)
+
+def test_cursor_is_url_safe():
+    cursor = LogService.encode_cursor(SimpleNamespace(created_at=datetime(2026, 12, 31, 23, 59, 59), id=999999))
+    assert all(char.isalnum() or char in "-_=" for char in cursor)
+
+@pytest.mark.parametrize("cursor", ["", "not-a-cursor", "MjAyNi0xMC0xNw==", "bm90LWEtZGF0ZXwx"])
+def test_invalid_cursor(cursor):
+    with pytest.raises(ValueError):
+        LogService.decode_cursor(cursor)
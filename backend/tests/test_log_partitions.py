@@ -0,0 +1,133 @@
+from datetime import date
+from pathlib import Path
+
+import pytest
+
+from app.core.config import settings
+from app.services import log_partitions
+from app.services.log_partitions import LogPartitionService, add_months, is_on_mount, month_start
+
+@pytest.mark.parametrize("month, months, expected", [
+    (date(2026, 10, 1), 0, date(2026, 10, 1)),
+    (date(2026, 10, 1), 2, date(2026, 12, 1)),
+    (date(2026, 11, 1), 2, date(2027, 1, 1)),
+    (date(2026, 1, 1), -1, date(2025, 12, 1)),
+    (date(2026, 10, 1), -12, date(2025, 10, 1)),
+    (date(2026, 10, 1), -22, date(2024, 12, 1)),
+])
+def test_add_months(month, months, expected):
+    assert add_months(month, months) == expected
+
+def test_month_start():
+    assert month_start(date(2026, 2, 28)) == date(2026, 2, 1)
+
+def test_partition_name():
+    assert LogPartitionService.partition_name(date(2026, 3, 1)) == "logs_p2026_03"
+
+@pytest.fixture
+def partitions(monkeypatch):
+    months = [date(2025, month, 1) for month in range(1, 13)] + [date(2026, month, 1) for month in range(1, 13)]
+    monkeypatch.setattr(LogPartitionService, "list_partitions", staticmethod(lambda db: months))
+    return months
+
+def test_retention_disabled_by_default(partitions):
+    assert settings.LOGS_RETENTION_MONTHS == 0
+    assert LogPartitionService.expired_partitions(None, date(2026, 10, 17)) == []
+
+def test_expired_partitions_keep_full_months(monkeypatch, partitions):
+    monkeypatch.setattr(settings, "LOGS_RETENTION_MONTHS", 12)
+    expired = LogPartitionService.expired_partitions(None, date(2026, 10, 17))
+    # Хранятся 12 полных месяцев до октября 2026 и текущий месяц: с октября 2025
+    assert expired == [date(2025, month, 1) for month in range(1, 10)]
+
+class _Result:
+    def __init__(self, value=None, rowcount=0):
+        self.value = value
+        self.rowcount = rowcount
+
+    def scalar(self):
+        return self.value
+
+class _RecordingSession:
+    """Сессия без БД: записывает SQL; stranded - месяцы со строками в секции по умолчанию"""
+
+    def __init__(self, stranded=(), failing=()):
+        self.statements = []
+        self.stranded = set(stranded)
+        self.failing = set(failing)
+        self.rollbacks = 0
+
+    def execute(self, statement, params=None):
+        sql = " ".join(str(statement).split())
+        self.statements.append(sql)
+        if params and params.get("start") in self.failing and sql.startswith("SELECT EXISTS"):
+            raise RuntimeError("updated partition constraint for default partition would be violated")
+        if sql.startswith("SELECT EXISTS"):
+            return _Result(params["start"] in self.stranded)
+        if sql.startswith("WITH moved"):
+            return _Result(rowcount=3)
+        return _Result()
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        self.rollbacks += 1
+
+def _expire(monkeypatch, action, archive_dir, on_mount):
+    monkeypatch.setattr(settings, "LOGS_EXPIRED_PARTITION_ACTION", action)
+    monkeypatch.setattr(settings, "LOGS_ARCHIVE_DIR", archive_dir)
+    monkeypatch.setattr(log_partitions, "is_on_mount", lambda path: on_mount)
+    monkeypatch.setattr(LogPartitionService, "archive_partition", staticmethod(lambda db, month: Path(archive_dir) / "a.csv.gz"))
+    db = _RecordingSession()
+    return LogPartitionService.expire_partition(db, date(2025, 1, 1)), db.statements
+
+def test_drop_with_archive_on_volume(monkeypatch, tmp_path):
+    result, statements = _expire(monkeypatch, "drop", str(tmp_path), on_mount=True)
+    assert result["dropped"] is True
+    assert statements == ["ALTER TABLE logs DETACH PARTITION logs_p2025_01", "DROP TABLE logs_p2025_01"]
+
+def test_drop_refused_when_archive_not_on_volume(monkeypatch, tmp_path):
+    result, statements = _expire(monkeypatch, "drop", str(tmp_path), on_mount=False)
+    assert result["dropped"] is False
+    assert result["archive"] is not None
+    assert statements == ["ALTER TABLE logs DETACH PARTITION logs_p2025_01"]
+
+def test_drop_refused_without_archive_dir(monkeypatch):
+    result, statements = _expire(monkeypatch, "drop", "", on_mount=True)
+    assert result == {"partition": "logs_p2025_01", "archive": None, "dropped": False}
+    assert statements == ["ALTER TABLE logs DETACH PARTITION logs_p2025_01"]
+
+def test_drop_allowed_without_mount_check(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "LOGS_ARCHIVE_REQUIRE_MOUNT", False)
+    result, _ = _expire(monkeypatch, "drop", str(tmp_path), on_mount=False)
+    assert result["dropped"] is True
+
+def test_is_on_mount():
+    assert is_on_mount(Path("/proc/self")) is True
+    assert is_on_mount(Path("/")) is False
+
+def test_create_partition_without_stranded_rows():
+    db = _RecordingSession()
+    assert LogPartitionService.create_partition(db, date(2026, 10, 1)) == "logs_p2026_10"
+    assert db.statements[1] == (
+        "CREATE TABLE IF NOT EXISTS logs_p2026_10 PARTITION OF logs FOR VALUES FROM ('2026-10-01') TO ('2026-11-01')"
+    )
+    assert not any("DETACH" in statement for statement in db.statements)
+
+def test_create_partition_moves_rows_out_of_default():
+    db = _RecordingSession(stranded=[date(2026, 10, 1)])
+    LogPartitionService.create_partition(db, date(2026, 10, 1))
+    steps = [statement.split(" ")[0] + " " + statement.split(" ")[1] for statement in db.statements[2:]]
+    assert steps == ["ALTER TABLE", "CREATE TABLE", "WITH moved", "ALTER TABLE"]
+    assert db.statements[2] == "ALTER TABLE logs DETACH PARTITION logs_default"
+    assert "DELETE FROM logs_default" in db.statements[4] and "INSERT INTO logs_p2026_10" in db.statements[4]
+    assert db.statements[5] == "ALTER TABLE logs ATTACH PARTITION logs_default DEFAULT"
+
+def test_ensure_partitions_continues_after_failed_month(monkeypatch):
+    monkeypatch.setattr(settings, "LOGS_PARTITIONS_AHEAD", 2)
+    monkeypatch.setattr(LogPartitionService, "list_partitions", staticmethod(lambda db: []))
+    db = _RecordingSession(failing=[date(2026, 10, 1)])
+    created = LogPartitionService.ensure_partitions(db, date(2026, 10, 17))
+    assert created == ["logs_p2026_11", "logs_p2026_12"]
+    assert db.rollbacks == 1
@@ -0,0 +1,68 @@
+import importlib.util
+import os
+from pathlib import Path
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from app.utils.phone import normalize_phone
+
+MIGRATION = Path(__file__).resolve().parents[1] / "alembic" / "versions" / "e7c8d9f0a1b2_add_devices_phone_e164.py"
+
+# Нормализованные номера различны: при совпадении миграция оставляет NULL у всех, кроме первого
+CASES = [
+    ("+7 (999) 123-45-67", "+79991234567"),
+    ("89991234566", "+79991234566"),
+    ("8 999 123 45 68", "+79991234568"),
+    ("79991234569", "+79991234569"),
+    ("9991234560", "+79991234560"),
+    ("+9991234561", "+9991234561"),
+    ("+89991234562", "+89991234562"),
+    (" \t+7 999 1234563", "+79991234563"),
+    ("+44 20 7946 0958", "+442079460958"),
+    ("12345", None),
+    ("+1234567890123456", None),
+    ("٨٩٩٩١٢٣٤٥٦٧", None),
+    ("", None),
+    (None, None),
+]
+
+@pytest.mark.parametrize("phone, expected", CASES)
+def test_normalize_phone(phone, expected):
+    assert normalize_phone(phone) == expected
+
+def test_default_country_code():
+    assert normalize_phone("89991234567", default_country_code="375") == "+3759991234567"
+    assert normalize_phone("9991234567", default_country_code="375") == "+3759991234567"
+
+def _migration_fill_sql() -> str:
+    """SQL заполнения devices.phone_e164 из миграции e7c8d9f0a1b2"""
+    statements = []
+
+    class _Op:
+        def execute(self, sql):
+            statements.append(sql)
+
+        def __getattr__(self, name):
+            return lambda *args, **kwargs: None
+
+    spec = importlib.util.spec_from_file_location("migration_e7c8d9f0a1b2", MIGRATION)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    module.op = _Op()
+    module.upgrade()
+    assert len(statements) == 1
+    return statements[0]
+
+@pytest.mark.skipif(not os.getenv("TEST_DATABASE_URL"), reason="нужен Postgres: TEST_DATABASE_URL")
+def test_migration_sql_matches_normalize_phone():
+    engine = create_engine(os.environ["TEST_DATABASE_URL"])
+    with engine.connect() as conn:
+        # Временная таблица перекрывает devices в search_path
+        conn.execute(text("CREATE TEMP TABLE devices (id serial PRIMARY KEY, phone text, phone_e164 varchar(16))"))
+        for phone, _ in CASES:
+            conn.execute(text("INSERT INTO devices (phone) VALUES (:phone)"), {"phone": phone})
+        conn.execute(text(_migration_fill_sql()))
+        rows = conn.execute(text("SELECT phone, phone_e164 FROM devices ORDER BY id")).all()
+        conn.rollback()
+    assert [(phone, e164) for phone, e164 in rows] == [(phone, normalize_phone(phone)) for phone, _ in CASES]
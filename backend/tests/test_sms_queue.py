@@ -0,0 +1,62 @@
+import asyncio
+
+import pytest
+
+from app.services import sms_queue as sms_queue_module
+from app.services.sms_queue import COMPLETE_RETRY_DELAYS, SMSQueue
+
+class _Gateway:
+    async def send_command(self, phone, text):
+        return "OK"
+
+def _message():
+    return {
+        "id": 7, "phone": "+79990000000", "text": "STATUS", "attempts": 1,
+        "log_id": None, "alert_id": None, "device_id": 1, "platform_id": 1, "user_id": None, "job_id": None,
+    }
+
+@pytest.fixture
+def queue(monkeypatch):
+    calls = {"complete": 0, "mark_sent": [], "sleeps": []}
+
+    async def fake_sleep(delay):
+        calls["sleeps"].append(delay)
+
+    monkeypatch.setattr(sms_queue_module, "get_sms_gateway", lambda: _Gateway())
+    monkeypatch.setattr(sms_queue_module.asyncio, "sleep", fake_sleep)
+    monkeypatch.setattr(SMSQueue, "_mark_sent", staticmethod(lambda message_id, response: calls["mark_sent"].append((message_id, response))))
+    return SMSQueue(), calls
+
+def _complete_failing(calls, failures):
+    def complete(message, success, response, error):
+        calls["complete"] += 1
+        if calls["complete"] <= failures:
+            raise RuntimeError("database is unavailable")
+    return staticmethod(complete)
+
+def test_complete_retried_after_transient_error(monkeypatch, queue):
+    sms_queue, calls = queue
+    monkeypatch.setattr(SMSQueue, "_complete", _complete_failing(calls, 1))
+    asyncio.run(sms_queue._process(_message()))
+    assert calls["complete"] == 2
+    assert calls["sleeps"] == [COMPLETE_RETRY_DELAYS[0]]
+    assert calls["mark_sent"] == []
+
+def test_sent_status_written_when_complete_keeps_failing(monkeypatch, queue):
+    sms_queue, calls = queue
+    monkeypatch.setattr(SMSQueue, "_complete", _complete_failing(calls, 100))
+    asyncio.run(sms_queue._process(_message()))
+    assert calls["complete"] == len(COMPLETE_RETRY_DELAYS) + 1
+    assert calls["sleeps"] == list(COMPLETE_RETRY_DELAYS)
+    # Успешная отправка не должна вернуться в очередь
+    assert calls["mark_sent"] == [(7, "OK")]
+
+def test_mark_sent_failure_does_not_raise(monkeypatch, queue):
+    sms_queue, calls = queue
+    monkeypatch.setattr(SMSQueue, "_complete", _complete_failing(calls, 100))
+
+    def failing_mark_sent(message_id, response):
+        raise RuntimeError("database is unavailable")
+
+    monkeypatch.setattr(SMSQueue, "_mark_sent", staticmethod(failing_mark_sent))
+    asyncio.run(sms_queue._process(_message()))
@@ -0,0 +1,87 @@
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.services.sms_quota import SMSQuotaService, _TokenBucket
+
+@pytest.fixture
+def buckets(monkeypatch):
+    monkeypatch.setattr(settings, "SMS_RATE_LIMIT_PER_MINUTE", 10)
+    monkeypatch.setattr(SMSQuotaService, "_buckets", {})
+    return SMSQuotaService._buckets
+
+def test_period_start_month(monkeypatch):
+    monkeypatch.setattr(settings, "SMS_QUOTA_PERIOD", "month")
+    now = datetime(2026, 10, 17, 14, 32, 7, tzinfo=timezone.utc)
+    assert SMSQuotaService.period_start(now) == datetime(2026, 10, 1, tzinfo=timezone.utc)
+
+def test_period_start_day(monkeypatch):
+    monkeypatch.setattr(settings, "SMS_QUOTA_PERIOD", "day")
+    now = datetime(2026, 10, 17, 14, 32, 7, tzinfo=timezone.utc)
+    assert SMSQuotaService.period_start(now) == datetime(2026, 10, 17, tzinfo=timezone.utc)
+
+def test_period_rolls_over_at_month_boundary(monkeypatch):
+    monkeypatch.setattr(settings, "SMS_QUOTA_PERIOD", "month")
+    last = SMSQuotaService.period_start(datetime(2026, 10, 31, 23, 59, 59, tzinfo=timezone.utc))
+    first = SMSQuotaService.period_start(datetime(2026, 11, 1, 0, 0, 0, tzinfo=timezone.utc))
+    assert first > last
+    assert first == datetime(2026, 11, 1, tzinfo=timezone.utc)
+
+def test_token_bucket_partial_grant():
+    bucket = _TokenBucket(rate_per_minute=5)
+    assert bucket.take(3) == 3
+    assert bucket.take(3) == 2
+    assert bucket.take(1) == 0
+
+def test_token_bucket_give_back_is_capped():
+    bucket = _TokenBucket(rate_per_minute=5)
+    bucket.take(2)
+    bucket.give_back(10)
+    assert bucket.tokens == 5
+
+def test_token_bucket_refill():
+    bucket = _TokenBucket(rate_per_minute=60)
+    assert bucket.take(60) == 60
+    bucket.updated_at -= 2
+    assert bucket.take(10) == 2
+
+def test_take_tokens_without_rate_limit(monkeypatch):
+    monkeypatch.setattr(settings, "SMS_RATE_LIMIT_PER_MINUTE", 0)
+    assert SMSQuotaService._take_tokens(1, 1000) == 1000
+
+def test_take_tokens_per_platform(buckets):
+    assert SMSQuotaService._take_tokens(1, 8) == 8
+    assert SMSQuotaService._take_tokens(1, 8) == 2
+    assert SMSQuotaService._take_tokens(2, 8) == 8
+
+def _session():
+    db = Session(create_engine("sqlite://"))
+    db.execute(text("SELECT 1"))
+    return db
+
+def test_tokens_return_on_rollback(buckets):
+    db = _session()
+    SMSQuotaService._track_tokens(db, 1, SMSQuotaService._take_tokens(1, 6))
+    SMSQuotaService._track_tokens(db, 2, SMSQuotaService._take_tokens(2, 4))
+    db.rollback()
+    assert buckets[1].tokens == pytest.approx(10, abs=0.1)
+    assert buckets[2].tokens == pytest.approx(10, abs=0.1)
+
+def test_tokens_kept_on_commit(buckets):
+    db = _session()
+    SMSQuotaService._track_tokens(db, 1, SMSQuotaService._take_tokens(1, 6))
+    db.commit()
+    db.execute(text("SELECT 1"))
+    db.rollback()
+    assert buckets[1].tokens == pytest.approx(4, abs=0.1)
+
+def test_savepoint_rollback_does_not_return_tokens(buckets):
+    db = _session()
+    SMSQuotaService._track_tokens(db, 1, SMSQuotaService._take_tokens(1, 6))
+    db.begin_nested().rollback()
+    assert buckets[1].tokens == pytest.approx(4, abs=0.1)
+    db.close()
+    assert buckets[1].tokens == pytest.approx(10, abs=0.1)
@@ -0,0 +1,75 @@
+import json
+
+from app.services.cache_invalidation import CacheInvalidation
+from app.services.user_cache import UserCache
+
+def _snapshot(user_id, token_version=0, **fields):
+    return {"id": user_id, "token_version": token_version, **fields}
+
+def test_get_returns_snapshot_for_matching_token_version():
+    cache = UserCache(ttl=60, max_size=10)
+    cache.set(_snapshot(1, email="a@example.com"))
+    assert cache.get(1, 0)["email"] == "a@example.com"
+    assert cache.get(1, 1) is None
+    assert cache.get_metrics()["hits"] == 1
+    assert cache.get_metrics()["misses"] == 1
+
+def test_expired_entry_is_a_miss():
+    cache = UserCache(ttl=60, max_size=10)
+    cache.set(_snapshot(1))
+    expires_at, snapshot = cache._entries[(1, 0)]
+    cache._entries[(1, 0)] = (expires_at - 120, snapshot)
+    assert cache.get(1, 0) is None
+    assert (1, 0) not in cache._entries
+
+def test_disabled_cache_stores_nothing():
+    cache = UserCache(ttl=0, max_size=10)
+    cache.set(_snapshot(1))
+    assert cache.get(1, 0) is None
+    assert cache.get_metrics()["size"] == 0
+
+def test_lru_eviction():
+    cache = UserCache(ttl=60, max_size=2)
+    cache.set(_snapshot(1))
+    cache.set(_snapshot(2))
+    cache.get(1, 0)
+    cache.set(_snapshot(3))
+    assert cache.get(2, 0) is None
+    assert cache.get(1, 0) is not None
+    assert cache.get(3, 0) is not None
+
+def test_invalidate_removes_all_token_versions():
+    cache = UserCache(ttl=60, max_size=10)
+    cache.set(_snapshot(1, 0))
+    cache.set(_snapshot(1, 1))
+    cache.set(_snapshot(2, 0))
+    cache.invalidate(1)
+    assert cache.get(1, 0) is None
+    assert cache.get(1, 1) is None
+    assert cache.get(2, 0) is not None
+
+def _invalidation_with_recorder():
+    invalidation = CacheInvalidation(channel="test")
+    received = []
+    invalidation.register("user", received.append)
+    return invalidation, received
+
+def test_invalidation_applies_messages_from_other_processes():
+    invalidation, received = _invalidation_with_recorder()
+    invalidation._handle(json.dumps({"origin": "other", "cache": "user", "key": "5"}))
+    invalidation._handle(json.dumps({"origin": "other", "cache": "user", "key": None}))
+    assert received == ["5", None]
+    assert invalidation.get_metrics()["received"] == 2
+
+def test_invalidation_skips_own_and_foreign_messages():
+    invalidation, received = _invalidation_with_recorder()
+    invalidation._handle(json.dumps({"origin": invalidation.origin, "cache": "user", "key": "5"}))
+    invalidation._handle(json.dumps({"origin": "other", "cache": "platform_roles", "key": "5"}))
+    invalidation._handle("not json")
+    assert received == []
+
+def test_invalidation_handler_error_does_not_stop_other_handlers():
+    invalidation, received = _invalidation_with_recorder()
+    invalidation._handlers["user"].insert(0, lambda key: 1 / 0)
+    invalidation._handle(json.dumps({"origin": "other", "cache": "user", "key": "7"}))
+    assert received == ["7"]
@@ -0,0 +1,35 @@
+from app.services.webhook_inbox import merge_payloads, payload_hash
+
+def _alert(status, fingerprint=None, alertname="HighLoad", player_id="p1"):
+    alert = {"status": status, "labels": {"alertname": alertname, "player_id": player_id}}
+    if fingerprint:
+        alert["fingerprint"] = fingerprint
+    return alert
+
+def test_single_payload_is_unchanged():
+    payload = {"title": "t", "alerts": [_alert("firing", "a")]}
+    assert merge_payloads([payload]) == payload
+
+def test_last_state_of_each_alert_wins():
+    first = {"title": "first", "alerts": [_alert("firing", "a"), _alert("firing", "b")]}
+    second = {"title": "second", "alerts": [_alert("resolved", "a")]}
+    merged = merge_payloads([first, second])
+    assert merged["title"] == "second"
+    assert [(alert["fingerprint"], alert["status"]) for alert in merged["alerts"]] == [("b", "firing"), ("a", "resolved")]
+
+def test_alerts_without_fingerprint_are_keyed_by_labels():
+    first = {"alerts": [_alert("firing", player_id="p1"), _alert("firing", player_id="p2")]}
+    second = {"alerts": [_alert("resolved", player_id="p1")]}
+    merged = merge_payloads([first, second])
+    assert [(alert["labels"]["player_id"], alert["status"]) for alert in merged["alerts"]] == [("p2", "firing"), ("p1", "resolved")]
+
+def test_payloads_are_not_modified():
+    first = {"alerts": [_alert("firing", "a")]}
+    second = {"alerts": [_alert("resolved", "a")]}
+    merge_payloads([first, second])
+    assert second["alerts"][0]["status"] == "resolved"
+    assert len(second["alerts"]) == 1
+
+def test_payload_hash_ignores_key_order():
+    assert payload_hash({"a": 1, "b": [1, 2]}) == payload_hash({"b": [1, 2], "a": 1})
+    assert payload_hash({"a": 1}) != payload_hash({"a": 2})
@@ -1,6 +1,7 @@
-import React, { useEffect, useState } from 'react';
+import React, { useCallback, useEffect, useMemo, useState } from 'react';
 import { Card, Spin, Alert, Table, Tag, Typography, Input, DatePicker, Button, Space, Select } from 'antd';
 import { useApi } from '../lib/useApi';
+import apiClient from '../lib/api';
 import { User } from '../types';
 import { DownloadOutlined } from '@ant-design/icons';
 import { useAuth } from '../lib/useAuth';
@@ -19,6 +20,9 @@ interface AuditLog {
     user?: User;
 }
 
+// Записей на одну страницу API /audit-logs
+const PAGE_SIZE = 100;
+
 export const AuditLogsPage: React.FC = () => {
     const { get } = useApi();
     const { isSuperAdmin, currentPlatform } = useAuth();
@@ -26,6 +30,9 @@ export const AuditLogsPage: React.FC = () => {
     const [loading, setLoading] = useState(true);
     const [error, setError] = useState<string | null>(null);
     const [users, setUsers] = useState<User[]>([]);
+    const [nextCursor, setNextCursor] = useState<string | null>(null);
+    const [loadingMore, setLoadingMore] = useState(false);
+    const [exporting, setExporting] = useState(false);
     
     const [selectedUserId, setSelectedUserId] = useState<number | undefined>(undefined);
     const [actionFilter, setActionFilter] = useState<string>('');
@@ -43,38 +50,44 @@ export const AuditLogsPage: React.FC = () => {
         fetchUsers();
     }, [get]);
 
+    const buildParams = useCallback(() => {
+        const params: Record<string, string> = {};
+        if (selectedUserId) {
+            params.user_id = selectedUserId.toString();
+        }
+        if (actionFilter) {
+            params.action = actionFilter;
+        }
+        if (dateRange && dateRange[0] && dateRange[1]) {
+            params.start_date = dateRange[0].toISOString();
+            params.end_date = dateRange[1].toISOString();
+        }
+        if (!isSuperAdmin && currentPlatform?.id) {
+            params.platform_id = String(currentPlatform.id);
+        }
+        return params;
+    }, [selectedUserId, actionFilter, dateRange, isSuperAdmin, currentPlatform]);
+
+    // API отдаёт журнал страницами: курсор следующей страницы приходит в заголовке X-Next-Cursor
+    const fetchLogsPage = useCallback(async (cursor?: string) => {
+        const params: Record<string, string> = { ...buildParams(), limit: String(PAGE_SIZE) };
+        if (cursor) {
+            params.cursor = cursor;
+        }
+        const response = await apiClient.get('/audit-logs/', { params });
+        return {
+            items: Array.isArray(response.data) ? response.data as AuditLog[] : [],
+            next: (response.headers['x-next-cursor'] as string | undefined) || null,
+        };
+    }, [buildParams]);
+
     useEffect(() => {
         const fetchAuditLogs = async () => {
             setLoading(true);
             try {
-                let url = `/audit-logs/`;
-                const params = new URLSearchParams();
-
-                if (selectedUserId) {
-                    params.append('user_id', selectedUserId.toString());
-                }
-                if (actionFilter) {
-                    params.append('action', actionFilter);
-                }
-                if (dateRange && dateRange[0] && dateRange[1]) {
-                    params.append('start_date', dateRange[0].toISOString());
-                    params.append('end_date', dateRange[1].toISOString());
-                }
-                if (!isSuperAdmin && currentPlatform?.id) {
-                    params.append('platform_id', String(currentPlatform.id));
-                }
-
-                if (params.toString()) {
-                    url = `${url}?${params.toString()}`;
-                }
-                
-                const data: AuditLog[] = await get(url);
-                const logsWithUsers = data.map(log => ({
-                    ...log,
-                    user: users.find(u => u.id === log.user_id)
-                }));
-                
-                setAuditLogs(logsWithUsers);
+                const page = await fetchLogsPage();
+                setAuditLogs(page.items);
+                setNextCursor(page.next);
                 setError(null);
             } catch (err) {
                 console.error('Ошибка при загрузке логов аудита:', err);
@@ -84,32 +97,52 @@ export const AuditLogsPage: React.FC = () => {
             }
         };
 
-        if (users.length > 0) {
-            fetchAuditLogs();
-        } else if (!loading && users.length === 0) {
-             fetchAuditLogs();
+        fetchAuditLogs();
+    }, [fetchLogsPage]);
+
+    const handleLoadMore = async () => {
+        if (!nextCursor) {
+            return;
+        }
+        setLoadingMore(true);
+        try {
+            const page = await fetchLogsPage(nextCursor);
+            setAuditLogs(prev => [...prev, ...page.items]);
+            setNextCursor(page.next);
+        } catch (err) {
+            console.error('Ошибка при загрузке логов аудита:', err);
+        } finally {
+            setLoadingMore(false);
         }
+    };
 
-    }, [selectedUserId, actionFilter, dateRange, get, users, isSuperAdmin, currentPlatform]);
-
-    const handleExport = () => {
-        const headers = ['Время', 'Пользователь', 'Действие', 'Детали', 'IP Адрес'];
-        const csvRows = auditLogs.map((log: AuditLog) => [
-            `"${new Date(log.timestamp).toLocaleString('ru-RU')}"`,
-            `"${log.user ? log.user.email : 'Система'}"`,
-            `"${log.action}"`,
-            `"${log.details || '-'}"`,
-            `"${log.ip_address || '-'}"`,
-        ].join(','));
-
-        const csvContent = [headers.join(','), ...csvRows].join('\n');
-        const blob = new Blob([csvContent], { type: 'text/csv;charset=utf-8;' });
-        const link = document.createElement('a');
-        link.href = URL.createObjectURL(blob);
-        link.setAttribute('download', 'audit_logs.csv');
-        document.body.appendChild(link);
-        link.click();
-        document.body.removeChild(link);
+    // Пользователь записи берётся из списка для фильтра: журнал отдаёт только user_id
+    const logsWithUsers = useMemo(() => auditLogs.map(log => ({
+        ...log,
+        user: users.find(u => u.id === log.user_id)
+    })), [auditLogs, users]);
+
+    // Экспорт всех записей по фильтрам, а не только загруженных страниц: CSV формирует сервер (format=csv)
+    const handleExport = async () => {
+        setExporting(true);
+        try {
+            const response = await apiClient.get('/audit-logs/', {
+                params: { ...buildParams(), format: 'csv' },
+                responseType: 'blob',
+                timeout: 0,
+            });
+            const link = document.createElement('a');
+            link.href = URL.createObjectURL(response.data);
+            link.setAttribute('download', 'audit_logs.csv');
+            document.body.appendChild(link);
+            link.click();
+            document.body.removeChild(link);
+            URL.revokeObjectURL(link.href);
+        } catch (err) {
+            console.error('Ошибка при экспорте журнала аудита:', err);
+        } finally {
+            setExporting(false);
+        }
     };
 
     const logColumns = [
@@ -202,18 +235,23 @@ export const AuditLogsPage: React.FC = () => {
                     showTime 
                     onChange={(dates: any) => setDateRange(dates)}
                 />
-                <Button type="primary" icon={<DownloadOutlined />} onClick={handleExport}>
+                <Button type="primary" icon={<DownloadOutlined />} onClick={handleExport} loading={exporting}>
                     Экспорт CSV
                 </Button>
             </Space>
             <Table 
-                dataSource={auditLogs} 
+                dataSource={logsWithUsers} 
                 columns={logColumns} 
                 loading={loading} 
                 rowKey="id" 
                 pagination={{ pageSize: 15 }} 
                 className="min-w-full dark:bg-gray-800 rounded-lg" 
             />
+            {nextCursor && (
+                <Button onClick={handleLoadMore} loading={loadingMore} style={{ marginTop: 16 }}>
+                    Загрузить ещё
+                </Button>
+            )}
         </Card>
     );
 }; 
\ No newline at end of file
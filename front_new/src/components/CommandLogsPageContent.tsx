@@ -1,8 +1,8 @@
-import React, { useEffect, useState } from 'react';
+import React, { useCallback, useEffect, useState } from 'react';
 import { Card, Spin, Alert, Table, Tag, Typography, Select, DatePicker, Button, Space } from 'antd';
 import { useApi } from '../lib/useApi';
 import { CommandLog, Device } from '../types';
-import { api } from '../lib/api';
+import apiClient, { api } from '../lib/api';
 import { DownloadOutlined } from '@ant-design/icons';
 import { useAuth } from '../lib/useAuth';
 
@@ -10,6 +10,9 @@ const { Title } = Typography;
 const { Option } = Select;
 const { RangePicker } = DatePicker;
 
+// Записей на одну страницу API /logs
+const PAGE_SIZE = 100;
+
 // Переименовано в CommandLogsPageContent
 export const CommandLogsPageContent: React.FC = () => {
   const { get } = useApi();
@@ -21,6 +24,9 @@ export const CommandLogsPageContent: React.FC = () => {
   const [selectedDeviceId, setSelectedDeviceId] = useState<string | undefined>(undefined);
   const [selectedLevel, setSelectedLevel] = useState<string | undefined>(undefined);
   const [dateRange, setDateRange] = useState<[any, any] | null>(null);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const [exporting, setExporting] = useState(false);
 
   useEffect(() => {
     const fetchDevicesList = async () => {
@@ -48,30 +54,44 @@ export const CommandLogsPageContent: React.FC = () => {
     }
   }, [isSuperAdmin, currentPlatform, get]);
 
+  const buildParams = useCallback(() => {
+    const params: Record<string, string> = {};
+    if (selectedDeviceId) {
+      params.device_id = selectedDeviceId;
+    }
+    if (selectedLevel) {
+      params.level = selectedLevel;
+    }
+    if (dateRange && dateRange[0] && dateRange[1]) {
+      params.start_date = dateRange[0].toISOString();
+      params.end_date = dateRange[1].toISOString();
+    }
+    if (!isSuperAdmin && currentPlatform?.id) {
+      params.platform_id = String(currentPlatform.id);
+    }
+    return params;
+  }, [selectedDeviceId, selectedLevel, dateRange, isSuperAdmin, currentPlatform]);
+
+  // API отдаёт журнал страницами: курсор следующей страницы приходит в заголовке X-Next-Cursor
+  const fetchLogsPage = useCallback(async (cursor?: string) => {
+    const params: Record<string, string> = { ...buildParams(), limit: String(PAGE_SIZE) };
+    if (cursor) {
+      params.cursor = cursor;
+    }
+    const response = await apiClient.get('/logs/', { params });
+    return {
+      items: Array.isArray(response.data) ? response.data as CommandLog[] : [],
+      next: (response.headers['x-next-cursor'] as string | undefined) || null,
+    };
+  }, [buildParams]);
+
   useEffect(() => {
     const fetchCommandLogs = async () => {
         setLoading(true);
         try {
-            let url = `/logs/`;
-            const params = new URLSearchParams();
-            if (selectedDeviceId) {
-                params.append('device_id', selectedDeviceId);
-            }
-            if (selectedLevel) {
-                params.append('level', selectedLevel);
-            }
-            if (dateRange && dateRange[0] && dateRange[1]) {
-                params.append('start_date', dateRange[0].toISOString());
-                params.append('end_date', dateRange[1].toISOString());
-            }
-            if (!isSuperAdmin && currentPlatform?.id) {
-                params.append('platform_id', String(currentPlatform.id));
-            }
-            if (params.toString()) {
-                url = `${url}?${params.toString()}`;
-            }
-            const data = await get(url);
-            setCommandLogs(Array.isArray(data) ? data : []);
+            const page = await fetchLogsPage();
+            setCommandLogs(page.items);
+            setNextCursor(page.next);
             setError(null);
         } catch (err) {
             console.error('Ошибка при загрузке логов команд:', err);
@@ -82,28 +102,62 @@ export const CommandLogsPageContent: React.FC = () => {
     };
     
     fetchCommandLogs();
-  }, [selectedDeviceId, selectedLevel, dateRange, get, isSuperAdmin, currentPlatform]);
-
-  const handleExport = () => {
-    const headers = ['Время', 'Устройство', 'Команда', 'Сообщение', 'Ответ', 'Статус', 'Уровень'];
-    const csvRows = commandLogs.map((log: CommandLog) => [
-      `"${new Date(log.created_at).toLocaleString()}"`,
-      `"${log.device_id}"`,
-      `"${log.command || '-'}"`,
-      `"${log.message}"`,
-      `"${log.response || '-'}"`,
-      `"${log.status || '-'}"`,
-      `"${log.level}"`,
-    ].join(','));
-
-    const csvContent = [headers.join(','), ...csvRows].join('\n');
-    const blob = new Blob([csvContent], { type: 'text/csv;charset=utf-8;' });
-    const link = document.createElement('a');
-    link.href = URL.createObjectURL(blob);
-    link.setAttribute('download', 'command_logs.csv');
-    document.body.appendChild(link);
-    link.click();
-    document.body.removeChild(link);
+  }, [fetchLogsPage]);
+
+  const handleLoadMore = async () => {
+    if (!nextCursor) {
+      return;
+    }
+    setLoadingMore(true);
+    try {
+      const page = await fetchLogsPage(nextCursor);
+      setCommandLogs(prev => [...prev, ...page.items]);
+      setNextCursor(page.next);
+    } catch (err) {
+      console.error('Ошибка при загрузке логов команд:', err);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
+  // Экспорт всех записей по фильтрам, а не только загруженных страниц: потоковая выгрузка format=ndjson
+  const handleExport = async () => {
+    setExporting(true);
+    try {
+      const response = await apiClient.get('/logs/', {
+        params: { ...buildParams(), format: 'ndjson' },
+        responseType: 'text',
+        timeout: 0,
+      });
+      const logs: CommandLog[] = String(response.data)
+        .split('\n')
+        .filter((line: string) => line.trim())
+        .map((line: string) => JSON.parse(line));
+
+      const headers = ['Время', 'Устройство', 'Команда', 'Сообщение', 'Ответ', 'Статус', 'Уровень'];
+      const csvRows = logs.map((log: CommandLog) => [
+        `"${new Date(log.created_at).toLocaleString()}"`,
+        `"${log.device_id}"`,
+        `"${log.command || '-'}"`,
+        `"${log.message}"`,
+        `"${log.response || '-'}"`,
+        `"${log.status || '-'}"`,
+        `"${log.level}"`,
+      ].join(','));
+
+      const csvContent = [headers.join(','), ...csvRows].join('\n');
+      const blob = new Blob([csvContent], { type: 'text/csv;charset=utf-8;' });
+      const link = document.createElement('a');
+      link.href = URL.createObjectURL(blob);
+      link.setAttribute('download', 'command_logs.csv');
+      document.body.appendChild(link);
+      link.click();
+      document.body.removeChild(link);
+    } catch (err) {
+      console.error('Ошибка при экспорте логов команд:', err);
+    } finally {
+      setExporting(false);
+    }
   };
 
   const logColumns = [
@@ -188,7 +242,7 @@ export const CommandLogsPageContent: React.FC = () => {
           showTime 
           onChange={(dates: any) => setDateRange(dates)}
         />
-        <Button type="primary" icon={<DownloadOutlined />} onClick={handleExport}>
+        <Button type="primary" icon={<DownloadOutlined />} onClick={handleExport} loading={exporting}>
           Экспорт CSV
         </Button>
       </Space>
@@ -200,6 +254,11 @@ export const CommandLogsPageContent: React.FC = () => {
         pagination={{ pageSize: 10 }} 
         className="min-w-full dark:bg-gray-800 rounded-lg" 
       />
+      {nextCursor && (
+        <Button onClick={handleLoadMore} loading={loadingMore} style={{ marginTop: 16 }}>
+          Загрузить ещё
+        </Button>
+      )}
     </>
   );
 }; 
\ No newline at end of file